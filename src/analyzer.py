@@ -1,25 +1,218 @@
 import ast
-import collections
 
-try:
-    from radon.complexity import cc_visit
-    from radon.metrics import mi_visit
-except ImportError:
-    cc_visit = None
-    mi_visit = None
+from ast_parser import ParsedSource
+from clones import CloneIndex, fingerprint
+from ast_engine import ClassDetail, FunctionDetail, FusedVisitor, NodeCounts
+from import_graph import extract_imports
+from incremental import analyze_incremental
+from metrics_table import rate_quality
+from perf_smells import find_smells
+from guard import STAGE_TIMEOUT, StageTimeout, watchdog
+from profiling import NULL_PROFILE
+from pylint_runner import default_runner, PylintTimeout
 
-try:
-    from pylint import epylint as lint
-except ImportError:
-    lint = None
+# Bump whenever the produced results change, so cached results are invalidated.
+ANALYZER_VERSION = "1.7"
 
 
-class CodeAnalyzer(ast.NodeVisitor):
-    def __init__(self, code, file_path=None):
+# radon is imported on first use so callers that never need it (e.g. the CLI
+# with --no-radon) don't pay for importing it.
+_radon = None
+
+
+def load_radon():
+    # (cc_visit(tree), mi_visit(parsed, multi)); both None without radon
+    global _radon
+    if _radon is None:
+        try:
+            from radon.complexity import cc_visit_ast
+            from radon.metrics import h_visit_ast, mi_compute
+            from radon.visitors import ComplexityVisitor
+        except ImportError:
+            _radon = (None, None)
+        else:
+            def mi_visit(parsed, multi):
+                # radon.metrics.mi_visit on the shared tree and raw metrics
+                # instead of parsing the source again
+                raw = parsed.raw
+                comment_lines = raw.comments + (raw.multi if multi else 0)
+                comments = comment_lines / float(raw.sloc) * 100 if raw.sloc != 0 else 0
+                return mi_compute(
+                    h_visit_ast(parsed.tree).total.volume,
+                    ComplexityVisitor.from_ast(parsed.tree).total_complexity,
+                    raw.lloc,
+                    comments,
+                )
+
+            _radon = (cc_visit_ast, mi_visit)
+    return _radon
+
+
+# -----------------------------------------------------
+# analysis stages and profiles
+# -----------------------------------------------------
+
+# In run order: a stage only depends on stages before it.
+STAGES = ("structure", "maintainability", "pylint", "insights", "clones", "performance")
+
+STAGE_REQUIRES = {
+    "insights": ("structure",),
+}
+
+# "fast": counts, nesting, complexity and details from the single engine
+# pass; "complexity" adds radon's maintainability index, the insights,
+# duplicate code and performance smell detection; "full" also runs pylint.
+ANALYSIS_PROFILES = {
+    "fast": ("structure",),
+    "complexity": ("structure", "maintainability", "insights", "clones", "performance"),
+    "full": STAGES,
+}
+
+
+def resolve_stages(spec=None):
+    """Stages to run for ``spec``, with their dependencies, in run order.
+
+    ``spec`` is a profile name, a comma-separated string or an iterable of
+    stage names; None means the full profile.
+    """
+    if spec is None:
+        spec = "full"
+    if isinstance(spec, str):
+        spec = ANALYSIS_PROFILES.get(spec) or [s.strip() for s in spec.split(",") if s.strip()]
+
+    wanted = set()
+    todo = list(spec)
+    while todo:
+        name = todo.pop()
+        if name not in STAGES:
+            raise ValueError(f"unknown analysis stage or profile: {name}")
+        if name not in wanted:
+            wanted.add(name)
+            todo.extend(STAGE_REQUIRES.get(name, ()))
+
+    return tuple(s for s in STAGES if s in wanted)
+
+
+class _StageOutput:
+    """An analyzer attribute produced by a stage, kept in the ``_<name>`` slot.
+
+    Reading it while the tree is still held runs the stage first if it has
+    not run yet, so outputs nobody asked for are never computed.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        # the slot's own descriptor; a missing slot fails here, at import
+        self.slot = owner.__dict__[f"_{name}"]
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        if self.stage not in obj.completed and obj.tree is not None:
+            obj.require(self.stage)
+        return self.slot.__get__(obj, owner)
+
+    def __set__(self, obj, value):
+        self.slot.__set__(obj, value)
+
+
+class CodeAnalyzer:
+    # One analyzer per analyzed file: slots instead of a per-instance
+    # __dict__. That rules out subclassing ast.NodeVisitor (no __slots__),
+    # so the legacy visitor path borrows its methods.
+    __slots__ = (
+        "code", "file_path", "tree", "stages", "completed", "stage_timeouts", "cut_off",
+        "parsed", "pylint_runner", "use_radon", "fused", "plugins", "incremental",
+        "previous", "snapshot", "reused_definitions", "release_tree", "profile",
+        "lines", "error", "error_type", "error_line", "error_msg",
+        # storage of the stage outputs below
+        "_functions", "_classes", "_imports", "_node_counts", "_avg_complexity",
+        "_max_nesting", "_function_details", "_class_details", "_complexity_map",
+        "_plugin_metrics", "_import_refs", "_maintainability", "_suggestions",
+        "_pylint_timed_out", "_top_nodes", "_ast_insights", "_clones",
+        "_clone_fingerprints", "_performance_findings",
+    )
+
+    generic_visit = ast.NodeVisitor.generic_visit
+
+    functions = _StageOutput("structure")
+    classes = _StageOutput("structure")
+    imports = _StageOutput("structure")
+    node_counts = _StageOutput("structure")
+    avg_complexity = _StageOutput("structure")
+    max_nesting = _StageOutput("structure")
+    function_details = _StageOutput("structure")
+    class_details = _StageOutput("structure")
+    complexity_map = _StageOutput("structure")
+    plugin_metrics = _StageOutput("structure")
+    import_refs = _StageOutput("structure")
+    maintainability = _StageOutput("maintainability")
+    suggestions = _StageOutput("pylint")
+    pylint_timed_out = _StageOutput("pylint")
+    top_nodes = _StageOutput("insights")
+    ast_insights = _StageOutput("insights")
+    clones = _StageOutput("clones")
+    clone_fingerprints = _StageOutput("clones")
+    performance_findings = _StageOutput("performance")
+
+    def __init__(self, code, file_path=None, plugins=None, fused=True,
+                 pylint_runner=None, use_radon=True, incremental=False,
+                 previous=None, release_tree=False, profile=None, parsed=None,
+                 stages=None, stage_timeouts=None):
         self.code = code
         self.file_path = file_path
         self.tree = None
 
+        # stages: an analysis profile name or stage names (see resolve_stages);
+        # analyze() runs these, any other stage runs when its output is read
+        self.stages = resolve_stages(stages)
+        self.completed = []
+
+        # stage_timeouts: seconds per stage ({name: seconds}, or one number
+        # for all); a stage that overruns, runs out of memory or recurses too
+        # deep is cut off and listed in self.cut_off with the reason, and the
+        # stages depending on it are skipped. pylint keeps its own timeout.
+        if stage_timeouts is None:
+            stage_timeouts = STAGE_TIMEOUT
+        if not isinstance(stage_timeouts, dict):
+            stage_timeouts = {s: stage_timeouts for s in STAGES if s != "pylint"}
+        self.stage_timeouts = stage_timeouts
+        self.cut_off = {}
+
+        # parsed: a ParsedSource of code whose tree (and radon raw metrics)
+        # are reused instead of parsing again
+        self.parsed = parsed if parsed is not None else ParsedSource(code)
+        self.pylint_runner = pylint_runner or default_runner()
+
+        # use_radon=False skips the maintainability index (the only stage that
+        # still needs radon on the fused path)
+        self.use_radon = use_radon
+        if not use_radon:
+            self.stages = tuple(s for s in self.stages if s != "maintainability")
+
+        # fused=True runs the single-pass engine; False keeps the original
+        # visitor / recursion / ast.walk / radon stages (used for parity checks)
+        self.fused = fused
+        self.plugins = plugins or []
+
+        # incremental=True reuses per-definition results from `previous`
+        # (the snapshot of an earlier version) and leaves a new one in
+        # self.snapshot
+        self.incremental = incremental
+        self.previous = previous
+        self.snapshot = None
+        self.reused_definitions = 0
+
+        # release_tree=True drops the tree, source and previous snapshot once
+        # analyze() is done, so only the (small) results stay referenced
+        self.release_tree = release_tree
+
+        # profile (a profiling.StageProfile) records time per analysis stage
+        self.profile = profile or NULL_PROFILE
+
         self.lines = 0
         self.functions = 0
         self.classes = 0
@@ -30,8 +223,7 @@ class CodeAnalyzer(ast.NodeVisitor):
         self.error_line = None
         self.error_msg = None
 
-        self.nodes = []
-        self.node_counts = collections.Counter()
+        self.node_counts = NodeCounts()
 
         self.avg_complexity = None
         self.maintainability = None
@@ -40,6 +232,7 @@ class CodeAnalyzer(ast.NodeVisitor):
         self.function_details = []
         self.class_details = []
         self.suggestions = []
+        self.pylint_timed_out = False
 
         self.complexity_map = {}
 
@@ -47,35 +240,143 @@ class CodeAnalyzer(ast.NodeVisitor):
         self.top_nodes = {}
         self.ast_insights = []
 
+        self.plugin_metrics = {}
+
+        # duplicated statement subtrees (clones.CloneIndex.groups) and the
+        # fingerprints they were found from, for cross-file detection
+        self.clones = []
+        self.clone_fingerprints = []
+
+        # located performance anti-patterns (perf_smells.find_smells)
+        self.performance_findings = []
+
+        # import statements as import_graph.extract_imports records
+        self.import_refs = []
+
     # -----------------------------------------------------
 
     def analyze(self):
-        try:
-            self.tree = ast.parse(self.code)
-        except SyntaxError as e:
+        stage = self.profile.stage
+
+        with stage("analyzer.parse"):
+            self.tree = self.parsed.parse()
+
+        if self.tree is None:
+            e = self.parsed.error
             self.error = e
             self.error_type = e.msg
             self.error_line = e.lineno
             self.error_msg = e.text
+            self._release()
             return
 
-        self.lines = len(self.code.splitlines())
+        self.lines = self.parsed.lines
+
+        self.require(*self.stages)
+        self._release()
+
+    def require(self, *stages):
+        """Run ``stages`` and the stages they depend on, each at most once."""
+        for name in resolve_stages(stages):
+            if name in self.completed:
+                continue
+            if self.tree is None:
+                raise RuntimeError(f"stage {name!r} needs the tree, which was released")
+            # marked first: the stage reads its own outputs while it runs
+            self.completed.append(name)
+            if any(d in self.cut_off for d in STAGE_REQUIRES.get(name, ())):
+                self.cut_off[name] = "skipped"
+                continue
+            try:
+                with watchdog.guard(self.stage_timeouts.get(name)):
+                    getattr(self, f"_stage_{name}")()
+            except StageTimeout:
+                self.cut_off[name] = "timeout"
+            except MemoryError:
+                self.cut_off[name] = "memory"
+            except RecursionError:
+                self.cut_off[name] = "recursion"
+
+    def _stage_structure(self):
+        stage = self.profile.stage
+        if self.fused:
+            with stage("analyzer.engine"):
+                self._run_engine()
+        else:
+            with stage("analyzer.visit"):
+                self.visit(self.tree)
+            with stage("analyzer.nesting"):
+                self._compute_nesting(self.tree, 0)
+            with stage("analyzer.complexity"):
+                self._analyze_complexity()
+            with stage("analyzer.details"):
+                self._build_details()
+        with stage("analyzer.imports"):
+            self.import_refs = extract_imports(self.tree)
+
+    def _stage_maintainability(self):
+        with self.profile.stage("analyzer.maintainability"):
+            self._analyze_maintainability()
+
+    def _stage_pylint(self):
+        with self.profile.stage("analyzer.pylint"):
+            self._analyze_pylint()
+
+    def _stage_insights(self):
+        with self.profile.stage("analyzer.insights"):
+            self._extract_top_nodes()
+            self._generate_ast_insights()
+
+    def _stage_clones(self):
+        with self.profile.stage("analyzer.clones"):
+            self.clone_fingerprints = fingerprint(self.tree)
+            index = CloneIndex()
+            index.add(None, self.clone_fingerprints)
+            self.clones = index.groups()
+
+    def _stage_performance(self):
+        with self.profile.stage("analyzer.performance"):
+            self.performance_findings = find_smells(self.tree)
+
+    def _release(self):
+        if self.release_tree:
+            self.tree = None
+            self.code = None
+            self.parsed = None
+            self.previous = None
+
+    # -----------------------------------------------------
 
-        self.visit(self.tree)
-        self._compute_nesting(self.tree, 0)
-        self._analyze_complexity()
-        self._build_details()
-        self._analyze_pylint()
-        self._extract_top_nodes()
-        self._generate_ast_insights()
+    def _run_engine(self):
+        # plugins need to see every node, and a lone "\r" line ending would
+        # make the line-based segment keys disagree with the parser
+        if self.incremental and not self.plugins and "\r" not in self.code:
+            engine, self.snapshot = analyze_incremental(
+                self.tree, self.code, self.previous
+            )
+            self.reused_definitions = engine.reused
+        else:
+            engine = FusedVisitor(self.plugins).run(self.tree)
+
+        self.node_counts = engine.node_counts
+        self.functions = engine.functions
+        self.classes = engine.classes
+        self.imports = engine.imports
+        self.max_nesting = engine.max_nesting
+
+        self.complexity_map = engine.complexity_map
+        self.avg_complexity = engine.avg_complexity
+
+        self.function_details = engine.function_details
+        self.class_details = engine.class_details
+
+        self.plugin_metrics = engine.plugin_results
 
     # -----------------------------------------------------
 
     def visit(self, node):
-        node_type = type(node).__name__
-        self.nodes.append(node_type)
-        self.node_counts[node_type] += 1
-        super().visit(node)
+        self.node_counts.add(type(node))
+        ast.NodeVisitor.visit(self, node)
 
     def visit_FunctionDef(self, node):
         self.functions += 1
@@ -109,19 +410,26 @@ class CodeAnalyzer(ast.NodeVisitor):
             ast.ClassDef,
         )
 
-        if isinstance(node, block_types):
-            depth += 1
-            self.max_nesting = max(self.max_nesting, depth)
+        # explicit stack: no recursion limit however deep the tree is
+        max_nesting = self.max_nesting
+        stack = [(node, depth)]
+        while stack:
+            node, depth = stack.pop()
+            if isinstance(node, block_types):
+                depth += 1
+                if depth > max_nesting:
+                    max_nesting = depth
+            stack.extend((child, depth) for child in ast.iter_child_nodes(node))
 
-        for child in ast.iter_child_nodes(node):
-            self._compute_nesting(child, depth)
+        self.max_nesting = max_nesting
 
     # -----------------------------------------------------
 
     def _analyze_complexity(self):
+        cc_visit, _ = load_radon()
         if cc_visit:
             try:
-                blocks = cc_visit(self.code)
+                blocks = cc_visit(self.tree)
                 values = []
 
                 for b in blocks:
@@ -131,12 +439,21 @@ class CodeAnalyzer(ast.NodeVisitor):
                 if values:
                     self.avg_complexity = sum(values) / len(values)
 
+            except (RecursionError, MemoryError):
+                raise
             except Exception:
                 pass
 
+    def _analyze_maintainability(self):
+        if not self.use_radon:
+            return
+
+        _, mi_visit = load_radon()
         if mi_visit:
             try:
-                self.maintainability = mi_visit(self.code, False)
+                self.maintainability = mi_visit(self.parsed, False)
+            except (RecursionError, MemoryError):
+                raise
             except Exception:
                 pass
 
@@ -152,68 +469,26 @@ class CodeAnalyzer(ast.NodeVisitor):
         for node in ast.walk(self.tree):
 
             if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                end_line = getattr(node, "end_lineno", node.lineno)
-                loc = end_line - node.lineno + 1
-                args = [a.arg for a in node.args.args]
                 complexity = self.complexity_map.get((node.name, node.lineno))
-
-                functions.append({
-                    "name": node.name,
-                    "line": node.lineno,
-                    "end_line": end_line,
-                    "loc": loc,
-                    "args": args,
-                    "complexity": complexity,
-                })
+                functions.append(FunctionDetail.from_node(node, complexity))
 
             if isinstance(node, ast.ClassDef):
-                end_line = getattr(node, "end_lineno", node.lineno)
-                loc = end_line - node.lineno + 1
+                classes.append(ClassDetail.from_node(node))
 
-                methods = [
-                    n for n in node.body
-                    if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))
-                ]
-
-                classes.append({
-                    "name": node.name,
-                    "line": node.lineno,
-                    "end_line": end_line,
-                    "loc": loc,
-                    "methods_count": len(methods),
-                })
-
-        self.function_details = sorted(functions, key=lambda x: x["line"])
-        self.class_details = sorted(classes, key=lambda x: x["line"])
+        self.function_details = sorted(functions, key=lambda x: x.line)
+        self.class_details = sorted(classes, key=lambda x: x.line)
 
     # -----------------------------------------------------
 
     def _analyze_pylint(self):
-        if lint is None or not self.file_path:
+        if not self.pylint_runner.available or not self.file_path:
             return
 
         try:
-            pout, _ = lint.py_run(self.file_path, return_std=True)
-            text = pout.getvalue()
-            results = []
-
-            for line in text.splitlines():
-                if ":" not in line:
-                    continue
-                parts = line.split(":", 4)
-                if len(parts) < 5:
-                    continue
-
-                path, lineno, col, msg_id, msg = parts
-                entry = {
-                    "line": int(lineno) if lineno.strip().isdigit() else None,
-                    "code": msg_id.strip(),
-                    "message": msg.strip(),
-                }
-                results.append(entry)
-
-            self.suggestions = results
-
+            self.suggestions = self.pylint_runner.run(self.file_path)
+        except PylintTimeout:
+            self.pylint_timed_out = True
+            self.cut_off["pylint"] = "timeout"
         except Exception:
             pass
 
@@ -288,20 +563,5 @@ class CodeAnalyzer(ast.NodeVisitor):
     # -----------------------------------------------------
 
     def calculate_quality_score(self):
-        score = 100
-
-        # Complexity impact
-        if self.avg_complexity is not None:
-            score -= min(40, self.avg_complexity * 5)
-
-        # Maintainability impact
-        if self.maintainability is not None:
-            if self.maintainability < 50:
-                score -= 25
-            elif self.maintainability < 70:
-                score -= 10
-
-        # Nesting depth impact
-        score -= min(20, self.max_nesting * 4)
-
-        return max(0, min(100, int(score)))
\ No newline at end of file
+        # same rules as the results' quality_percent (metrics_table)
+        return rate_quality(self.maintainability, self.avg_complexity, self.max_nesting)[0]
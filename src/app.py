@@ -1,9 +1,26 @@
-from flask import Flask, render_template, request, send_file
+from flask import Flask, render_template, request, send_file, jsonify, url_for
+from flask import Response, stream_with_context, stream_template
+import io
 import os
-from fileRead import preprocess_python_file
-from ast_parser import ASTParser
-from analyzer import CodeAnalyzer
-from report_generator import generate_report
+import json
+import tempfile
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.utils import secure_filename
+from batch import BatchRunner, BatchError, ProjectSummary, file_row
+from batch import iter_zip_sources, iter_dir_sources
+from jobs import JobQueue, QueueFull, DONE, FAILED
+from analyzer import resolve_stages
+from fileRead import read_file
+from pipeline import analyze_file, analyze_source
+from profiling import StageMetrics, StageProfile, run_profiled
+from report_generator import generate_report, generate_project_report, report_key
+from report_generator import JINJA_OPTIONS, precompile_templates
+from result_cache import ResultCache, PageStore
+from report_store import ENCODINGS, ReportStore
+from incremental import SnapshotStore
+from history import HistoryStore
+from ingest import MAX_UPLOAD_BYTES, UploadTooLarge, copy_limited, spool_upload
 
 base_dir = os.path.dirname(__file__)
 
@@ -13,12 +30,119 @@ app = Flask(
     static_folder=os.path.join(base_dir, "static"),
 )
 
+# Flask's template environment shares the report environment's options and
+# on-disk bytecode cache; both are filled at import, before any request.
+app.jinja_options = {**app.jinja_options, **JINJA_OPTIONS}
+precompile_templates(app.jinja_env)
+precompile_templates()
+
 UPLOAD_FOLDER = os.path.join(base_dir, "uploads")
 REPORT_FOLDER = os.path.join(base_dir, "reports")
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(REPORT_FOLDER, exist_ok=True)
 
+# Repeat uploads of identical sources are served from here.
+# RESULT_CACHE_DISK=0 keeps the cache in memory only.
+result_cache = ResultCache(
+    max_entries=int(os.environ.get("RESULT_CACHE_ENTRIES", 256)),
+    max_bytes=int(os.environ.get("RESULT_CACHE_BYTES", 64 * 1024 * 1024)),
+    disk_dir=(
+        os.path.join(REPORT_FOLDER, ".cache")
+        if os.environ.get("RESULT_CACHE_DISK", "1") != "0" else None
+    ),
+    disk_max_bytes=int(os.environ.get("RESULT_CACHE_DISK_BYTES", 512 * 1024 * 1024)),
+)
+
+# Rendered reports, stored once per distinct content with precompressed
+# copies and removed past REPORT_STORE_MAX_BYTES / REPORT_STORE_MAX_AGE_DAYS.
+REPORT_STORE_DIR = os.environ.get("REPORT_STORE_DIR", os.path.join(REPORT_FOLDER, "store"))
+report_store = ReportStore(REPORT_STORE_DIR)
+
+# Reports never change under their key; clients may keep them this long.
+REPORT_CACHE_SECONDS = int(os.environ.get("REPORT_CACHE_SECONDS", 7 * 86400))
+
+# Per-definition results of the last version of each uploaded file name, so
+# an edited re-upload only re-walks the definitions that changed.
+snapshot_store = SnapshotStore(max_entries=int(os.environ.get("SNAPSHOT_ENTRIES", 128)))
+
+# The results page renders the first TABLE_PAGE_SIZE rows of each large
+# table; the rest is kept here and fetched from /results/<id>/<section>.
+TABLE_PAGE_SIZE = int(os.environ.get("TABLE_PAGE_SIZE", 50))
+PAGED_SECTIONS = ("classes", "functions", "suggestions")
+result_pages = PageStore(max_entries=int(os.environ.get("RESULT_PAGE_ENTRIES", 64)))
+
+# Stage timings of every analysis served by this process, for /metrics.
+stage_metrics = StageMetrics()
+
+# PROFILE_MEMORY=1 records per-stage peak memory (tracemalloc; slow).
+# PROFILE_REQUESTS=1 lets a request ask for a cProfile dump with ?profile=1.
+PROFILE_MEMORY = os.environ.get("PROFILE_MEMORY") == "1"
+PROFILE_REQUESTS = os.environ.get("PROFILE_REQUESTS") == "1"
+
+# Metrics and details of every analysis, for /history, /trends and
+# /top-functions. HISTORY_DB= (empty) turns recording off.
+HISTORY_DB = os.environ.get("HISTORY_DB", os.path.join(REPORT_FOLDER, "history.sqlite3"))
+history_store = HistoryStore(HISTORY_DB) if HISTORY_DB else None
+
+# Background analysis for /jobs. The process pool starts on first use.
+job_queue = JobQueue(
+    workers=int(os.environ.get("JOB_WORKERS", 0)) or None,
+    metrics=stage_metrics,
+    history=history_store,
+    max_pending=int(os.environ.get("JOB_MAX_PENDING", 0)) or None,
+    cache_dir=result_cache.disk_dir,
+    reports=report_store,
+)
+
+# Project-wide analysis for /batch.
+batch_runner = BatchRunner(
+    workers=int(os.environ.get("BATCH_WORKERS", 0)) or None,
+    cache_dir=result_cache.disk_dir,
+)
+
+# Server-side directories /batch may read from (os.pathsep separated).
+# Empty means only uploaded zip archives are accepted.
+BATCH_ROOTS = [
+    os.path.realpath(p)
+    for p in os.environ.get("BATCH_ROOTS", "").split(os.pathsep) if p
+]
+
+
+def render_results(results, report_file):
+    # streamed, and with only the first page of every large table
+    context = dict(results)
+    sections = {}
+    for name in PAGED_SECTIONS:
+        rows = results.get(name) or []
+        context[name] = rows[:TABLE_PAGE_SIZE]
+        context[f"{name}_total"] = len(rows)
+        if len(rows) > TABLE_PAGE_SIZE:
+            sections[name] = rows
+
+    result_id = uuid.uuid4().hex
+    if sections:
+        result_pages.put(result_id, sections)
+
+    return Response(stream_template(
+        "results.html", report_file=report_file, result_id=result_id,
+        page_size=TABLE_PAGE_SIZE, **context,
+    ))
+
+
+def store_report(render, name, key=None):
+    # render(path) writes the report; returns its "<key>/<name>" report file
+    report_file = report_store.write(render, secure_filename(name) or "report.html", key)
+    report_store.maybe_prune()
+    return report_file
+
+
+def limit_request_body():
+    # refuse a body far past the upload limit before werkzeug buffers it; the
+    # exact limit is enforced while spooling
+    if MAX_UPLOAD_BYTES:
+        request.max_content_length = MAX_UPLOAD_BYTES + 64 * 1024
+
 
 @app.route("/")
 def upload_page():
@@ -27,139 +151,406 @@ def upload_page():
 
 @app.route("/upload", methods=["POST"])
 def upload_file():
+    limit_request_body()
     file = request.files.get("file")
 
     if not file or file.filename == "" or not file.filename.endswith(".py"):
         return render_template("upload.html", error="Please upload a valid .py file.")
 
-    file_path = os.path.join(UPLOAD_FOLDER, file.filename)
-    file.save(file_path)
-
-    processed = preprocess_python_file(file_path)
-    code = processed["cleaned_code"]
-
-    parser = ASTParser(code)
-    parser.get_tree()
-
-    analyzer = CodeAnalyzer(code, file_path=file_path)
-    analyzer.analyze()
-
-    # --------------------------
-    # METRICS
-    # --------------------------
-    metrics = {
-        "total_lines": analyzer.lines,
-        "functions": analyzer.functions,
-        "classes": analyzer.classes,
-        "imports": analyzer.imports,
-        "avg_complexity": analyzer.avg_complexity,
-        "maintainability": analyzer.maintainability,
-        "max_nesting": analyzer.max_nesting,
-    }
-
-    syntax = {
-        "error": analyzer.error is not None,
-        "error_type": analyzer.error_type,
-        "line": analyzer.error_line,
-        "msg": analyzer.error_msg or "",
-    }
-
-    summary = (
-        f"This Python file contains {metrics['total_lines']} lines, "
-        f"{metrics['classes']} classes, {metrics['functions']} functions, "
-        f"and {metrics['imports']} imports."
-    )
-
-    # --------------------------
-    # QUALITY SCORE SYSTEM
-    # --------------------------
-    score = 0
-
-    # Maintainability score
-    if metrics["maintainability"]:
-        if metrics["maintainability"] >= 80:
-            score += 40
-        elif metrics["maintainability"] >= 60:
-            score += 30
-        elif metrics["maintainability"] >= 40:
-            score += 20
-        else:
-            score += 10
-
-    # Complexity score (lower is better)
-    if metrics["avg_complexity"]:
-        if metrics["avg_complexity"] <= 3:
-            score += 40
-        elif metrics["avg_complexity"] <= 6:
-            score += 30
-        elif metrics["avg_complexity"] <= 10:
-            score += 20
+    try:
+        upload = spool_upload(file.stream, file.filename, UPLOAD_FOLDER)
+    except UploadTooLarge as e:
+        return render_template("upload.html", error=str(e)), 413
+
+    profile = StageProfile(trace_memory=PROFILE_MEMORY)
+    cprofile = None
+
+    try:
+        if PROFILE_REQUESTS and request.values.get("profile") == "1":
+            # a profiled run always does the full analysis
+            dump_name = f"{os.path.splitext(secure_filename(file.filename))[0]}_{uuid.uuid4().hex}.prof"
+            results, top = run_profiled(
+                lambda: analyze_file(upload.path, file.filename, profile=profile),
+                os.path.join(REPORT_FOLDER, dump_name),
+            )
+            cprofile = {"file": dump_name, "top": top}
         else:
-            score += 10
-
-    # Nesting score (lower is better)
-    nesting = metrics["max_nesting"]
-    if nesting <= 2:
-        score += 20
-    elif nesting <= 4:
-        score += 15
-    elif nesting <= 6:
-        score += 10
-    else:
-        score += 5
-
-    quality_percent = min(score, 100)
-
-    if quality_percent >= 80:
-        quality_label = "Excellent Code Quality"
-        quality_color = "green"
-    elif quality_percent >= 50:
-        quality_label = "Moderate Code Quality"
-        quality_color = "yellow"
-    else:
-        quality_label = "Needs Improvement"
-        quality_color = "red"
-
-    # --------------------------
-    # RESULTS PACKAGE
-    # (✨ Added: top_nodes + ast_insights)
-    # --------------------------
-    results = {
-        "file_name": file.filename,
-        "summary": summary,
-        "metrics": metrics,
-        "syntax": syntax,
-        "classes": analyzer.class_details,
-        "functions": analyzer.function_details,
-        "suggestions": analyzer.suggestions,
-        "nodes": dict(analyzer.node_counts),
-
-        # NEW — AST Node Summary + Insights
-        "top_nodes": analyzer.top_nodes,
-        "ast_insights": analyzer.ast_insights,
-
-        # Quality Score
-        "quality_percent": quality_percent,
-        "quality_label": quality_label,
-        "quality_color": quality_color,
-    }
+            results = analyze_file(
+                upload.path, file.filename, cache=result_cache, snapshots=snapshot_store,
+                profile=profile, source_hash=upload.sha256,
+            )
+    finally:
+        upload.remove()
 
     # --------------------------
     # GENERATE REPORT FILE
     # --------------------------
     report_name = f"{os.path.splitext(file.filename)[0]}_report.html"
-    report_path = os.path.join(REPORT_FOLDER, report_name)
-    generate_report(results, output_path=report_path)
-
-    return render_template("results.html", report_file=report_name, **results)
-
+    with profile.stage("report"):
+        report_file = store_report(
+            lambda path: generate_report(results, output_path=path), report_name,
+            report_key(results),
+        )
+
+    results["profile"] = profile.to_dict()
+    if cprofile:
+        results["profile"]["cprofile"] = cprofile
+    stage_metrics.observe(results["profile"])
+    if history_store is not None:
+        results["analysis_id"] = history_store.record(results, content_hash=upload.sha256)
+
+    return render_results(results, report_file)
+
+
+# --------------------------
+# JSON API
+# --------------------------
+def _flag(name, default):
+    # query string only: request.values would parse (and use up) a raw body
+    value = request.args.get(name)
+    if value is None:
+        return default
+    return value.lower() not in ("0", "false", "no", "off")
+
+
+@app.route("/api/analyze", methods=["POST"])
+def api_analyze():
+    """Analyze a multipart file, a JSON body {"source", "file_name"} or the
+    raw request body (name from ?file_name=) and return the results as JSON.
+
+    ?stages= picks an analysis profile (fast, complexity, full) or stages,
+    ?lint=0 skips pylint, ?radon=0 the maintainability index, ?report=1
+    also writes the HTML report, ?fields=metrics,functions trims the reply
+    (clone_fingerprints is only sent when listed there).
+    """
+    limit_request_body()
+    lint = _flag("lint", True)
+    use_radon = _flag("radon", True)
+    report = _flag("report", False)
+    try:
+        stages = resolve_stages(request.args.get("stages"))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    # request.files is only touched for multipart bodies, so any other body
+    # is still unread in request.stream
+    file = request.files.get("file") if request.mimetype == "multipart/form-data" else None
+    raw = False
+    if file and file.filename:
+        file_name, stream = file.filename, file.stream
+    elif request.is_json:
+        body = request.get_json(silent=True) or {}
+        if not isinstance(body.get("source"), str):
+            return jsonify(error="The JSON body needs a \"source\" string."), 400
+        file_name = body.get("file_name") or "source.py"
+        stream = io.BytesIO(body["source"].encode("utf-8"))
+    else:
+        file_name = request.args.get("file_name") or "source.py"
+        stream = request.stream
+        raw = True
+
+    if not file_name.endswith(".py"):
+        return jsonify(error="Only .py sources can be analyzed."), 400
+
+    try:
+        upload = spool_upload(stream, file_name, UPLOAD_FOLDER)
+    except UploadTooLarge as e:
+        return jsonify(error=str(e)), 413
+    if raw and not upload.size:
+        upload.remove()
+        return jsonify(error="No source: send a multipart file, a JSON body or the raw source."), 400
+
+    profile = StageProfile(trace_memory=PROFILE_MEMORY)
+    try:
+        with profile.stage("read"):
+            source = read_file(upload.path)
+        results = analyze_source(
+            source, file_name, file_path=upload.path if lint else None,
+            cache=result_cache, use_radon=use_radon, profile=profile,
+            source_hash=upload.sha256, stages=stages,
+        )
+    finally:
+        upload.remove()
+
+    if report:
+        report_name = f"{os.path.splitext(secure_filename(file_name) or 'source.py')[0]}_report.html"
+        with profile.stage("report"):
+            report_file = store_report(
+                lambda path: generate_report(results, output_path=path), report_name,
+                report_key(results),
+            )
+        results["report_url"] = url_for("download_report", filename=report_file)
+
+    results["profile"] = profile.to_dict()
+    stage_metrics.observe(results["profile"])
+    if history_store is not None:
+        results["analysis_id"] = history_store.record(results, content_hash=upload.sha256)
+
+    fields = [f for f in request.args.get("fields", "").split(",") if f]
+    if fields:
+        results = {k: results[k] for k in fields if k in results}
+    else:
+        # only needed for cross-file duplicate detection, and bulky
+        results.pop("clone_fingerprints", None)
+    return Response(json.dumps(results, separators=(",", ":")), mimetype="application/json")
+
+
+@app.route("/results/<result_id>/<section>")
+def result_page(result_id, section):
+    offset = max(0, request.args.get("offset", 0, type=int))
+    limit = min(max(1, request.args.get("limit", TABLE_PAGE_SIZE, type=int)), 1000)
+    page = result_pages.page(result_id, section, offset, limit)
+    if page is None:
+        return jsonify(error="Unknown or expired result"), 404
+    return jsonify(page)
+
+
+# --------------------------
+# BACKGROUND JOBS
+# --------------------------
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    limit_request_body()
+    file = request.files.get("file")
 
-@app.route("/download-report/<filename>")
+    if not file or file.filename == "" or not file.filename.endswith(".py"):
+        return jsonify(error="Please upload a valid .py file."), 400
+
+    # queued jobs outlive the request; the spooled upload is the job's own
+    try:
+        upload = spool_upload(file.stream, file.filename, UPLOAD_FOLDER)
+    except UploadTooLarge as e:
+        return jsonify(error=str(e)), 413
+
+    safe_name = secure_filename(file.filename) or "upload.py"
+    report_name = f"{os.path.splitext(safe_name)[0]}_report.html"
+
+    try:
+        job = job_queue.submit(
+            upload.path, file.filename, report_name, source_hash=upload.sha256,
+        )
+    except QueueFull:
+        upload.remove()
+        response = jsonify(error="Analysis queue is full, retry later.")
+        response.headers["Retry-After"] = "5"
+        return response, 503
+
+    data = job.to_dict()
+    data["status_url"] = url_for("job_status", job_id=job.id)
+    return jsonify(data), 202
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify(error="Unknown job"), 404
+    return jsonify(job.to_dict())
+
+
+@app.route("/jobs/<job_id>/result")
+def job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify(error="Unknown job"), 404
+    if job.status == FAILED:
+        return jsonify(job.to_dict()), 500
+    if job.status != DONE:
+        return jsonify(job.to_dict()), 202
+    return jsonify(job.results)
+
+
+@app.route("/jobs/<job_id>/report")
+def job_report(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return "Job not found", 404
+    if job.status == FAILED:
+        return f"Analysis failed: {job.error}", 500
+    if job.status != DONE:
+        return "Analysis still running", 202
+    return render_results(job.results, job.report_name)
+
+
+# --------------------------
+# PROJECT / BATCH ANALYSIS
+# --------------------------
+def _allowed_batch_dir(path):
+    real = os.path.realpath(path)
+    return any(real == root or real.startswith(root + os.sep) for root in BATCH_ROOTS)
+
+
+@app.route("/batch", methods=["POST"])
+def batch_analyze():
+    limit_request_body()
+    archive = request.files.get("file")
+    directory = request.form.get("directory", "").strip()
+    lint = request.form.get("lint") == "1"
+
+    if archive and archive.filename:
+        if not archive.filename.endswith(".zip"):
+            return jsonify(error="Please upload a .zip archive."), 400
+        project_name = os.path.splitext(archive.filename)[0]
+        # the upload is closed once this view returns, but the response
+        # below keeps reading members from it
+        spool = tempfile.TemporaryFile()
+        try:
+            copy_limited(archive.stream, spool)
+        except UploadTooLarge as e:
+            spool.close()
+            return jsonify(error=str(e)), 413
+        spool.seek(0)
+        sources = iter_zip_sources(spool)
+    elif directory:
+        if not _allowed_batch_dir(directory):
+            return jsonify(error="Directory is not inside an allowed batch root."), 403
+        if not os.path.isdir(directory):
+            return jsonify(error="Directory not found."), 404
+        project_name = os.path.basename(os.path.normpath(directory))
+        sources = iter_dir_sources(directory)
+    else:
+        return jsonify(error="Upload a .zip archive or give a directory."), 400
+
+    report_name = f"{secure_filename(project_name) or 'project'}_project_report.html"
+
+    # one NDJSON line per file as it finishes, then the project summary
+    def generate():
+        summary = ProjectSummary(project_name)
+        try:
+            for results in batch_runner.run(sources, lint=lint):
+                stage_metrics.observe(results.get("profile"))
+                # failed members have no metrics; they'd skew /trends
+                if history_store is not None and "error" not in results:
+                    history_store.record(results, content_hash=results.get("content_hash"))
+                summary.add(results)
+                yield json.dumps({"type": "file", **file_row(results)}) + "\n"
+        except BatchError as e:
+            yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+            return
+        except BrokenProcessPool:
+            # a worker died mid-run (the memory cap, OOM); the next batch gets
+            # a new pool
+            yield json.dumps({"type": "error", "error": "An analysis worker died; the batch was aborted."}) + "\n"
+            return
+
+        data = summary.to_dict()
+        report_file = store_report(lambda path: generate_project_report(data, path), report_name)
+        yield json.dumps({
+            "type": "summary",
+            "totals": data["totals"],
+            "hotspots": data["hotspots"],
+            "distribution": data["distribution"],
+            "outliers": data["outliers"],
+            "import_graph": data["import_graph"],
+            "clones": data["clones"],
+            "report_file": report_file,
+            "report_url": url_for("download_report", filename=report_file),
+        }) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+# --------------------------
+# ANALYSIS HISTORY
+# --------------------------
+def _history_disabled():
+    return jsonify(error="History is disabled."), 404
+
+
+@app.route("/history")
+def history():
+    if history_store is None:
+        return _history_disabled()
+    return jsonify(history_store.history(
+        file_name=request.args.get("file"),
+        content_hash=request.args.get("hash"),
+        before=request.args.get("before", type=float),
+        limit=min(max(1, request.args.get("limit", 50, type=int)), 1000),
+    ))
+
+
+@app.route("/history/<int:analysis_id>")
+def history_entry(analysis_id):
+    if history_store is None:
+        return _history_disabled()
+    data = history_store.get(analysis_id)
+    if data is None:
+        return jsonify(error="Unknown analysis"), 404
+    return jsonify(data)
+
+
+@app.route("/trends")
+def trends():
+    if history_store is None:
+        return _history_disabled()
+    file_name = request.args.get("file")
+    if not file_name:
+        return jsonify(error="Give a file name with ?file=."), 400
+    return jsonify(history_store.trends(
+        file_name,
+        since=request.args.get("since", type=float),
+        bucket=request.args.get("bucket", type=int),
+    ))
+
+
+@app.route("/top-functions")
+def top_functions():
+    if history_store is None:
+        return _history_disabled()
+    return jsonify(history_store.top_functions(
+        n=min(max(1, request.args.get("n", 10, type=int)), 1000),
+        file_name=request.args.get("file"),
+    ))
+
+
+@app.route("/jobs-stats")
+def jobs_stats():
+    return jsonify(job_queue.stats())
+
+
+@app.route("/metrics")
+def metrics():
+    # ?format=prometheus for the text exposition format
+    if request.args.get("format") == "prometheus":
+        return Response(stage_metrics.prometheus(), mimetype="text/plain; version=0.0.4")
+    return jsonify(stage_metrics.snapshot())
+
+
+@app.route("/cache-stats")
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+
+@app.route("/download-report/<path:filename>")
 def download_report(filename):
-    path = os.path.join(REPORT_FOLDER, filename)
-    if not os.path.exists(path):
+    key, sep, name = filename.partition("/")
+    if not sep:
+        # cProfile dumps, and reports written before the report store
+        path = os.path.join(REPORT_FOLDER, filename)
+        if not os.path.isfile(path):
+            return "Report not found", 404
+        return send_file(path, as_attachment=True)
+
+    accept = [e for e in ENCODINGS if request.accept_encodings[e] > 0]
+    found = report_store.lookup(key, accept)
+    if found is None:
         return "Report not found", 404
-    return send_file(path, as_attachment=True)
+    path, encoding = found
+
+    # one ETag per stored variant; If-None-Match and Range are answered by
+    # send_file
+    response = send_file(
+        path, mimetype="text/html", as_attachment=True,
+        download_name=secure_filename(name) or "report.html",
+        etag=f"{key}-{encoding}" if encoding else key,
+        max_age=REPORT_CACHE_SECONDS,
+    )
+    response.cache_control.public = False
+    response.cache_control.private = True
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
 
 
 if __name__ == "__main__":
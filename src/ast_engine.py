@@ -0,0 +1,472 @@
+import array
+import ast
+
+# Statements that open a new nesting level (same set the analyzer always used).
+NESTING_TYPES = frozenset((
+    ast.If,
+    ast.For,
+    ast.While,
+    ast.With,
+    ast.Try,
+    ast.FunctionDef,
+    ast.AsyncFunctionDef,
+    ast.ClassDef,
+))
+
+FUNCTION_TYPES = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+# Children of these nodes are never visited by the counting visitor.
+_LEAF_TYPES = frozenset((ast.Import, ast.ImportFrom))
+
+# Fields of a definition that radon does not score.
+_DEF_BODY = "body"
+
+_MODULE, _FUNCTION, _CLASS = 0, 1, 2
+
+
+# -----------------------------------------------------
+# node-type table
+# -----------------------------------------------------
+
+# Every ast node class gets a small integer id; results keep their counts in
+# an array indexed by that id instead of a dict of type-name strings.
+NODE_TYPES = sorted(
+    (c for c in vars(ast).values() if isinstance(c, type) and issubclass(c, ast.AST)),
+    key=lambda c: c.__name__,
+)
+NODE_INDEX = {c: i for i, c in enumerate(NODE_TYPES)}
+_NAME_INDEX = {c.__name__: i for i, c in enumerate(NODE_TYPES)}
+
+
+def intern_node_type(cls):
+    """Id for ``cls``; node classes unknown at import time are appended."""
+    index = NODE_INDEX.get(cls)
+    if index is None:
+        index = len(NODE_TYPES)
+        NODE_TYPES.append(cls)
+        NODE_INDEX[cls] = index
+        _NAME_INDEX.setdefault(cls.__name__, index)
+    return index
+
+
+class NodeCounts:
+    """Array-backed node-type counter.
+
+    Reads like the Counter it replaces (``get``, ``[name]``, ``items``,
+    ``dict(counts)``) and iterates in first-seen order, which is the order
+    the report lists node types in.
+    """
+
+    __slots__ = ("counts", "order")
+
+    def __init__(self):
+        self.counts = array.array("L", [0]) * len(NODE_TYPES)
+        self.order = array.array("H")
+
+    def _grow(self, index):
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+
+    def add_id(self, index, n=1):
+        self._grow(index)
+        if not self.counts[index]:
+            self.order.append(index)
+        self.counts[index] += n
+
+    def add(self, cls, n=1):
+        self.add_id(intern_node_type(cls), n)
+
+    def get(self, name, default=0):
+        index = _NAME_INDEX.get(name)
+        if index is None or index >= len(self.counts) or not self.counts[index]:
+            return default
+        return self.counts[index]
+
+    def __getitem__(self, name):
+        return self.get(name, 0)
+
+    def __contains__(self, name):
+        return bool(self.get(name))
+
+    def __len__(self):
+        return len(self.order)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        return [NODE_TYPES[i].__name__ for i in self.order]
+
+    def items(self):
+        return [(NODE_TYPES[i].__name__, self.counts[i]) for i in self.order]
+
+    def total(self):
+        return sum(self.counts)
+
+
+# -----------------------------------------------------
+# detail records
+# -----------------------------------------------------
+
+class FunctionDetail:
+    __slots__ = ("name", "line", "end_line", "loc", "args", "complexity")
+
+    def __init__(self, name, line, end_line, args, complexity=None):
+        self.name = name
+        self.line = line
+        self.end_line = end_line
+        self.loc = end_line - line + 1
+        self.args = tuple(args)
+        self.complexity = complexity
+
+    @classmethod
+    def from_node(cls, node, complexity=None):
+        end_line = getattr(node, "end_lineno", node.lineno)
+        return cls(node.name, node.lineno, end_line, [a.arg for a in node.args.args], complexity)
+
+    def shifted(self, delta):
+        return FunctionDetail(self.name, self.line + delta, self.end_line + delta,
+                              self.args, self.complexity)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "line": self.line,
+            "end_line": self.end_line,
+            "loc": self.loc,
+            "args": list(self.args),
+            "complexity": self.complexity,
+        }
+
+    def __eq__(self, other):
+        return isinstance(other, FunctionDetail) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"FunctionDetail({self.name!r}, line={self.line})"
+
+
+class ClassDetail:
+    __slots__ = ("name", "line", "end_line", "loc", "methods_count")
+
+    def __init__(self, name, line, end_line, methods_count):
+        self.name = name
+        self.line = line
+        self.end_line = end_line
+        self.loc = end_line - line + 1
+        self.methods_count = methods_count
+
+    @classmethod
+    def from_node(cls, node):
+        end_line = getattr(node, "end_lineno", node.lineno)
+        methods = sum(1 for n in node.body if isinstance(n, FUNCTION_TYPES))
+        return cls(node.name, node.lineno, end_line, methods)
+
+    def shifted(self, delta):
+        return ClassDetail(self.name, self.line + delta, self.end_line + delta,
+                           self.methods_count)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "line": self.line,
+            "end_line": self.end_line,
+            "loc": self.loc,
+            "methods_count": self.methods_count,
+        }
+
+    def __eq__(self, other):
+        return isinstance(other, ClassDetail) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"ClassDetail({self.name!r}, line={self.line})"
+
+
+class MetricPlugin:
+    """Extra per-node metric computed during the fused traversal.
+
+    Subclasses set ``name`` and implement ``visit``; ``visit`` receives every
+    node together with its nesting depth. ``result`` is stored in
+    ``FusedVisitor.plugin_results[name]`` once the walk is over.
+    """
+
+    name = None
+
+    def visit(self, node, depth):
+        pass
+
+    def result(self):
+        return None
+
+
+class _Scope:
+    __slots__ = ("kind", "node", "complexity", "is_block", "methods", "prebuilt")
+
+    def __init__(self, kind, node, complexity, is_block):
+        self.kind = kind
+        self.node = node
+        self.complexity = complexity
+        self.is_block = is_block
+        self.methods = []
+        # radon block group taken from a reused class summary
+        self.prebuilt = None
+
+
+def _match_complexity(node):
+    has_wildcard = any(
+        getattr(case.pattern, "pattern", False) is None for case in node.cases
+    )
+    return max(0, len(node.cases) - has_wildcard)
+
+
+# Cyclomatic complexity contributed by a single node (radon's rules).
+_COMPLEXITY = {
+    ast.If: lambda n: 1,
+    ast.IfExp: lambda n: 1,
+    ast.For: lambda n: bool(n.orelse) + 1,
+    ast.AsyncFor: lambda n: bool(n.orelse) + 1,
+    ast.While: lambda n: bool(n.orelse) + 1,
+    ast.Try: lambda n: len(n.handlers) + bool(n.orelse),
+    ast.BoolOp: lambda n: len(n.values) - 1,
+    ast.comprehension: lambda n: len(n.ifs) + 1,
+}
+if hasattr(ast, "Match"):
+    _COMPLEXITY[ast.Match] = _match_complexity
+
+
+class FusedVisitor:
+    """Single iterative pass computing everything CodeAnalyzer needs.
+
+    One walk over the tree produces node counts, definition counts, maximum
+    nesting depth, function/class details and radon-compatible cyclomatic
+    complexity blocks, plus whatever the registered plugins collect.
+
+    ``run(tree, reuse)`` accepts precomputed results for definition nodes
+    (``{node: (summary, first_line)}``, see incremental.py); those subtrees
+    are merged in without being walked. Plugins never see reused nodes.
+    """
+
+    def __init__(self, plugins=None):
+        self.plugins = list(plugins or [])
+
+        self.node_counts = NodeCounts()
+        self.functions = 0
+        self.classes = 0
+        self.imports = 0
+        self.max_nesting = 0
+
+        self.function_details = []
+        self.class_details = []
+
+        # (name, lineno, complexity) in the order radon's cc_visit returns them
+        self.blocks = []
+        self.function_blocks = []
+        self.class_blocks = []
+        self.complexity_map = {}
+        self.avg_complexity = None
+
+        self.plugin_results = {}
+
+    # -----------------------------------------------------
+
+    def run(self, tree, reuse=None):
+        # a plain dict keyed by class is the cheapest counter for the walk
+        # itself; it is packed into a NodeCounts once the walk is done
+        counts = {}
+        functions = []
+        classes = []
+        block_functions = []
+        block_classes = []
+        reused_functions = []
+        reused_classes = []
+        reuse_get = reuse.get if reuse else None
+        plugins = self.plugins
+        max_nesting = 0
+        n_functions = n_classes = n_imports = 0
+
+        module = _Scope(_MODULE, tree, 0, False)
+        stack = [(tree, 0, module)]
+        pop = stack.pop
+        push = stack.append
+        AST = ast.AST
+
+        while stack:
+            node, depth, scope = pop()
+            cls = type(node)
+
+            if reuse_get is not None:
+                hit = reuse_get(node)
+                if hit is not None:
+                    summary, start = hit
+                    reused = summary.node_counts
+                    for i in reused.order:
+                        key = NODE_TYPES[i]
+                        counts[key] = counts.get(key, 0) + reused.counts[i]
+                    if depth + summary.max_nesting > max_nesting:
+                        max_nesting = depth + summary.max_nesting
+                    n_functions += summary.functions
+                    n_classes += summary.classes
+                    n_imports += summary.imports
+                    reused_functions.extend(
+                        d.shifted(start) for d in summary.function_details
+                    )
+                    reused_classes.extend(
+                        d.shifted(start) for d in summary.class_details
+                    )
+
+                    if cls is ast.ClassDef:
+                        if scope is not None and scope.kind == _MODULE:
+                            body_scope = _Scope(_CLASS, node, 0, True)
+                            body_scope.prebuilt = [
+                                (n, line + start, c) for n, line, c in summary.class_blocks[0]
+                            ]
+                            block_classes.append(body_scope)
+                    elif scope is not None:
+                        body_scope = _Scope(
+                            _FUNCTION, node, summary.function_blocks[0][2],
+                            scope.kind == _MODULE or (scope.kind == _CLASS and scope.is_block),
+                        )
+                        if scope.kind == _CLASS:
+                            scope.methods.append(body_scope)
+                        elif scope.kind == _MODULE:
+                            block_functions.append(body_scope)
+                    continue
+
+            counts[cls] = counts.get(cls, 0) + 1
+
+            if cls in NESTING_TYPES:
+                depth += 1
+                if depth > max_nesting:
+                    max_nesting = depth
+
+            for plugin in plugins:
+                plugin.visit(node, depth)
+
+            if cls in _LEAF_TYPES:
+                n_imports += 1
+                continue
+
+            child_scope = scope
+            body_scope = None
+
+            if cls is ast.FunctionDef or cls is ast.AsyncFunctionDef:
+                n_functions += 1
+                is_block = scope is not None and (
+                    scope.kind == _MODULE
+                    or (scope.kind == _CLASS and scope.is_block)
+                )
+                body_scope = _Scope(_FUNCTION, node, 1, is_block)
+                if scope is not None:
+                    if scope.kind == _CLASS:
+                        scope.methods.append(body_scope)
+                    elif scope.kind == _MODULE:
+                        block_functions.append(body_scope)
+                functions.append(node)
+                child_scope = None
+
+            elif cls is ast.ClassDef:
+                n_classes += 1
+                is_block = scope is not None and scope.kind == _MODULE
+                body_scope = _Scope(_CLASS, node, 1, is_block)
+                if is_block:
+                    block_classes.append(body_scope)
+                classes.append(node)
+                child_scope = None
+
+            elif scope is not None:
+                if cls is ast.Assert:
+                    scope.complexity += 1
+                    child_scope = None
+                else:
+                    score = _COMPLEXITY.get(cls)
+                    if score is not None:
+                        scope.complexity += score(node)
+
+            children = []
+            for field in node._fields:
+                value = getattr(node, field, None)
+                field_scope = body_scope if (body_scope is not None and field == _DEF_BODY) else child_scope
+                if isinstance(value, list):
+                    for item in value:
+                        if isinstance(item, AST):
+                            children.append((item, depth, field_scope))
+                elif isinstance(value, AST):
+                    children.append((value, depth, field_scope))
+
+            for child in reversed(children):
+                push(child)
+
+        node_counts = NodeCounts()
+        for key, n in counts.items():
+            node_counts.add(key, n)
+        self.node_counts = node_counts
+        self.functions = n_functions
+        self.classes = n_classes
+        self.imports = n_imports
+        self.max_nesting = max_nesting
+
+        self._collect_blocks(block_functions, block_classes)
+        self._collect_details(functions, classes, reused_functions, reused_classes)
+
+        for plugin in plugins:
+            self.plugin_results[plugin.name] = plugin.result()
+
+        return self
+
+    # -----------------------------------------------------
+
+    def _collect_blocks(self, block_functions, block_classes):
+        # kept apart so results of separate runs can be merged in radon order
+        self.function_blocks = [
+            (f.node.name, f.node.lineno, f.complexity) for f in block_functions
+        ]
+        self.class_blocks = []
+
+        for c in block_classes:
+            if c.prebuilt is not None:
+                self.class_blocks.append(c.prebuilt)
+                continue
+
+            real = c.complexity + sum(m.complexity for m in c.methods)
+            if c.methods:
+                n = len(c.methods)
+                complexity = int(real / float(n)) + (n > 1)
+            else:
+                complexity = real
+            group = [(c.node.name, c.node.lineno, complexity)]
+            group.extend((m.node.name, m.node.lineno, m.complexity) for m in c.methods)
+            self.class_blocks.append(group)
+
+        self._set_blocks()
+
+    def _set_blocks(self):
+        blocks = list(self.function_blocks)
+        for group in self.class_blocks:
+            blocks.extend(group)
+
+        self.complexity_map = {}
+        for name, lineno, complexity in blocks:
+            self.complexity_map[(name, lineno)] = complexity
+
+        self.avg_complexity = None
+        if blocks:
+            self.avg_complexity = sum(b[2] for b in blocks) / len(blocks)
+
+        self.blocks = blocks
+
+    def _collect_details(self, functions, classes, reused_functions=(),
+                         reused_classes=()):
+        complexity_map = self.complexity_map
+        function_details = [
+            FunctionDetail.from_node(node, complexity_map.get((node.name, node.lineno)))
+            for node in functions
+        ]
+        class_details = [ClassDetail.from_node(node) for node in classes]
+
+        # a reused function's complexity depends on where it now sits
+        for detail in reused_functions:
+            detail.complexity = complexity_map.get((detail.name, detail.line))
+            function_details.append(detail)
+        class_details.extend(reused_classes)
+
+        self.function_details = sorted(function_details, key=lambda x: x.line)
+        self.class_details = sorted(class_details, key=lambda x: x.line)
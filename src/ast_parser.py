@@ -1,15 +1,95 @@
 import ast
+import io
+import tokenize
+
+
+class ParsedSource:
+    """Parse products of one source, computed at most once and shared by
+    every stage (ASTParser, CodeAnalyzer, the radon metrics).
+
+    Each product is built on first access: ``tree`` (raises SyntaxError, see
+    also ``parse()``), ``tokens``, ``line_offsets`` and ``raw`` (radon's raw
+    metrics, None when radon is not installed). Stages must not modify the
+    tree.
+    """
+
+    def __init__(self, code, tree=None):
+        # tree: an already parsed tree of code, if the caller has one
+        self.code = code
+        self.error = None
+        self._tree = tree
+        self._tokens = None
+        self._line_offsets = None
+        self._raw = None
+
+    def parse(self):
+        # the tree, or None with self.error set
+        if self._tree is None and self.error is None:
+            try:
+                self._tree = ast.parse(self.code)
+            except SyntaxError as e:
+                # keep the exception but not its traceback (and the frames in it)
+                self.error = e.with_traceback(None)
+            except (RecursionError, MemoryError):
+                # e.g. a very long operator chain; reported like a syntax error
+                self.error = SyntaxError("source is nested too deeply to parse")
+        return self._tree
+
+    @property
+    def tree(self):
+        tree = self.parse()
+        if tree is None:
+            raise self.error
+        return tree
+
+    @property
+    def lines(self):
+        return len(self.code.splitlines())
+
+    @property
+    def tokens(self):
+        if self._tokens is None:
+            self._tokens = list(
+                tokenize.generate_tokens(io.StringIO(self.code).readline)
+            )
+        return self._tokens
+
+    @property
+    def line_offsets(self):
+        # line_offsets[n - 1] is the offset of line n in self.code
+        if self._line_offsets is None:
+            offsets = [0]
+            find = self.code.find
+            pos = find("\n")
+            while pos >= 0:
+                offsets.append(pos + 1)
+                pos = find("\n", pos + 1)
+            self._line_offsets = offsets
+        return self._line_offsets
+
+    @property
+    def raw(self):
+        if self._raw is None:
+            try:
+                from radon.raw import analyze
+            except ImportError:
+                return None
+            self._raw = analyze(self.code)
+        return self._raw
+
 
 class ASTParser:
     def __init__(self, code):
-        self.code = code
+        # code may also be a ParsedSource to share its tree
+        self.parsed = code if isinstance(code, ParsedSource) else ParsedSource(code)
+        self.code = self.parsed.code
         self.tree = None
 
     def parse(self):
-        self.tree = ast.parse(self.code)
+        self.tree = self.parsed.tree
         return self.tree
 
     def get_tree(self):
         if self.tree is None:
             self.parse()
-        return self.tree
\ No newline at end of file
+        return self.tree
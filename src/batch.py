@@ -0,0 +1,338 @@
+import hashlib
+import heapq
+import multiprocessing
+import os
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from import_graph import ImportGraph
+
+MAX_MEMBER_BYTES = 5 * 1024 * 1024
+SKIP_DIRS = {"__pycache__", ".git", ".hg", ".svn", ".tox", ".nox", ".venv", "venv",
+             "node_modules", ".mypy_cache", ".pytest_cache"}
+
+
+class BatchError(Exception):
+    pass
+
+
+# -----------------------------------------------------
+# sources: (name, data, path) where exactly one of data / path is set
+# -----------------------------------------------------
+
+def iter_zip_sources(fileobj, max_member_bytes=MAX_MEMBER_BYTES):
+    """Yield the .py members of a zip archive one at a time.
+
+    Members are decompressed straight into memory as they are handed out;
+    nothing is extracted to disk.
+    """
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile as e:
+        raise BatchError(f"Not a valid zip archive: {e}")
+
+    with archive, fileobj:
+        for info in archive.infolist():
+            if info.is_dir() or not info.filename.endswith(".py"):
+                continue
+            if info.file_size > max_member_bytes:
+                yield info.filename, None, None
+                continue
+            with archive.open(info) as member:
+                data = member.read(max_member_bytes + 1)
+            yield info.filename, data, None
+
+
+def iter_dir_sources(root, max_member_bytes=MAX_MEMBER_BYTES):
+    root = os.path.abspath(root)
+    if not os.path.isdir(root):
+        raise BatchError(f"Not a directory: {root}")
+
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+        for name in sorted(filenames):
+            if not name.endswith(".py"):
+                continue
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, root)
+            try:
+                too_big = os.path.getsize(path) > max_member_bytes
+            except OSError:
+                continue
+            if too_big:
+                yield rel, None, None
+            else:
+                yield rel, None, path
+
+
+# -----------------------------------------------------
+# worker side
+# -----------------------------------------------------
+
+_worker_cache = None
+
+
+def _init_worker(cache_dir=None):
+    global _worker_cache
+    from guard import limit_memory
+    from pipeline import analyze_source  # noqa: F401
+
+    limit_memory()
+    if cache_dir:
+        from result_cache import ResultCache
+        _worker_cache = ResultCache(max_entries=64, disk_dir=cache_dir)
+
+
+def analyze_member(name, data, path, lint, use_radon=True,
+                   max_member_bytes=MAX_MEMBER_BYTES, stages=None, cache=None, snapshots=None):
+    # cache (a ResultCache; the worker's own in a pool) keys results by
+    # content, so re-running a project only re-parses the files that changed;
+    # snapshots (a SnapshotStore) makes re-analysis of an edited file incremental.
+    # The results carry the SHA-256 of the member's bytes as "content_hash".
+    from fileRead import read_file, decode_source
+    from pipeline import analyze_source
+
+    if data is None and path is None:
+        return {"file_name": name, "error": f"File larger than {max_member_bytes} bytes"}
+    if data is not None and len(data) > max_member_bytes:
+        return {"file_name": name, "error": f"File larger than {max_member_bytes} bytes"}
+
+    tmp_path = None
+    try:
+        if path:
+            source = read_file(path)
+            with open(path, "rb") as f:
+                content_hash = hashlib.file_digest(f, "sha256").hexdigest()
+        else:
+            source = decode_source(data)
+            content_hash = hashlib.sha256(data).hexdigest()
+
+        lint_path = None
+        if lint:
+            if path:
+                lint_path = path
+            else:
+                fd, tmp_path = tempfile.mkstemp(suffix=".py")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                lint_path = tmp_path
+
+        results = analyze_source(source, name, file_path=lint_path, use_radon=use_radon,
+                                 stages=stages, cache=cache or _worker_cache,
+                                 snapshots=snapshots, source_hash=content_hash)
+        results["content_hash"] = content_hash
+        return results
+
+    except Exception as e:
+        return {"file_name": name, "error": f"{type(e).__name__}: {e}"}
+
+    finally:
+        if tmp_path:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+# -----------------------------------------------------
+# parent side
+# -----------------------------------------------------
+
+class BatchRunner:
+    """Fans per-file analysis out over a shared process pool.
+
+    ``run`` keeps at most ``workers * inflight_factor`` files in flight, so
+    memory stays bounded however many files the source iterator yields, and
+    yields each file's results as soon as it finishes.
+    """
+
+    def __init__(self, workers=None, inflight_factor=4, mp_context="spawn", cache_dir=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_inflight = self.workers * inflight_factor
+        self.mp_context = mp_context
+        # cache_dir: disk tier of the workers' result caches (shared by all)
+        self.cache_dir = cache_dir
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(self.mp_context),
+                    initializer=_init_worker,
+                    initargs=(self.cache_dir,),
+                )
+            return self._executor
+
+    def run(self, sources, lint=False, use_radon=True, stages=None):
+        """Yield each file's results. A worker that dies (e.g. killed at the
+        memory cap) breaks the pool: BrokenProcessPool is raised and the next
+        run starts a new pool."""
+        executor = self._get_executor()
+        inflight = set()
+
+        try:
+            for name, data, path in sources:
+                if len(inflight) >= self.max_inflight:
+                    done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                inflight.add(executor.submit(
+                    analyze_member, name, data, path, lint, use_radon,
+                    MAX_MEMBER_BYTES, stages,
+                ))
+
+            while inflight:
+                done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        except BrokenProcessPool:
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False)
+            raise
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+# -----------------------------------------------------
+# project-level aggregation
+# -----------------------------------------------------
+
+def file_row(results):
+    if "error" in results:
+        return {"file_name": results["file_name"], "error": results["error"]}
+
+    metrics = results["metrics"]
+    return {
+        "file_name": results["file_name"],
+        "total_lines": metrics["total_lines"],
+        "functions": metrics["functions"],
+        "classes": metrics["classes"],
+        "imports": metrics["imports"],
+        "avg_complexity": metrics["avg_complexity"],
+        "maintainability": metrics["maintainability"],
+        "max_nesting": metrics["max_nesting"],
+        "syntax_error": results["syntax"]["error"],
+        "quality_percent": results["quality_percent"],
+    }
+
+
+class ProjectSummary:
+    """Running totals over a batch; keeps only one row per file, the
+    ``hotspot_count`` most complex functions, each file's imports (for the
+    project's import graph) and its subtree fingerprints (for duplicate code
+    across files). Per-file and per-function metrics go into columnar
+    tables, so the totals, scores and distributions are computed over whole
+    columns at the end."""
+
+    def __init__(self, name, hotspot_count=20, outlier_count=20):
+        # numpy is only imported once a summary is wanted
+        from clones import CloneIndex
+        from metrics_table import FUNCTION_COLUMNS, MetricsTable
+
+        self.name = name
+        self.hotspot_count = hotspot_count
+        self.outlier_count = outlier_count
+
+        self.files = 0
+        self.failed = 0
+
+        self.rows = []
+        self.table = MetricsTable()
+        self.function_table = MetricsTable(FUNCTION_COLUMNS)
+        self._names = []
+        self._hotspots = []
+        self._seq = 0
+        self.import_graph = ImportGraph()
+        self.clone_index = CloneIndex()
+
+    def add(self, results):
+        row = file_row(results)
+        self.rows.append(row)
+        self.files += 1
+
+        if "error" in row:
+            self.failed += 1
+            return row
+
+        self.table.append(row)
+        self._names.append(row["file_name"])
+        self.import_graph.add(row["file_name"], results.get("import_refs") or [])
+        self.clone_index.add(row["file_name"], results.get("clone_fingerprints") or [])
+
+        functions = results.get("functions", [])
+        self.function_table.extend(functions)
+        for f in functions:
+            if f.get("complexity") is None:
+                continue
+            self._seq += 1
+            entry = (f["complexity"], -self._seq, {
+                "file_name": row["file_name"],
+                "name": f["name"],
+                "line": f["line"],
+                "loc": f["loc"],
+                "complexity": f["complexity"],
+            })
+            if len(self._hotspots) < self.hotspot_count:
+                heapq.heappush(self._hotspots, entry)
+            elif entry[:2] > self._hotspots[0][:2]:
+                heapq.heapreplace(self._hotspots, entry)
+
+        return row
+
+    def hotspots(self):
+        return [e[2] for e in sorted(self._hotspots, key=lambda e: e[:2], reverse=True)]
+
+    def outliers(self):
+        """Files far outside the project's usual complexity, maintainability
+        and nesting (see MetricsTable.outliers), worst first."""
+        found = {}
+        for column, high in (("avg_complexity", True), ("maintainability", False),
+                             ("max_nesting", True)):
+            values = self.table.column(column)
+            found[column] = [
+                {"file_name": self._names[i], "value": values[i].item()}
+                for i in self.table.outliers(column, high=high)[:self.outlier_count]
+            ]
+        return found
+
+    def to_dict(self):
+        table = self.table
+        analyzed = len(table)
+        return {
+            "project_name": self.name,
+            "totals": {
+                "files": self.files,
+                "analyzed": analyzed,
+                "failed": self.failed,
+                "syntax_errors": int(table.column("syntax_error").sum()),
+                "total_lines": int(table.column("total_lines").sum()),
+                "functions": int(table.column("functions").sum()),
+                "classes": int(table.column("classes").sum()),
+                "imports": int(table.column("imports").sum()),
+                "max_nesting": int(table.column("max_nesting").max()) if analyzed else 0,
+                "avg_complexity": table.mean("avg_complexity"),
+                "avg_maintainability": table.mean("maintainability"),
+                "avg_quality": float(table.scores().mean()) if analyzed else None,
+            },
+            "hotspots": self.hotspots(),
+            "distribution": {
+                **table.distribution(),
+                "function_complexity": self.function_table.distribution(("complexity",))["complexity"],
+            },
+            "outliers": self.outliers(),
+            "import_graph": self.import_graph.to_dict(),
+            "clones": self.clone_index.to_dict(),
+            "files": sorted(self.rows, key=lambda r: r["file_name"]),
+        }
@@ -0,0 +1,302 @@
+import argparse
+import ast
+import io
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+from synthetic import generate_source
+
+# Times each pipeline stage on synthetic sources of increasing size and
+# compares the medians against a stored baseline:
+#
+#   python benchmark.py --sizes 100,1000,10000 -o bench.json
+#   python benchmark.py --baseline bench.json --threshold 0.2
+#
+# Exits with 1 when a stage got slower than the threshold allows.
+
+STAGES = (
+    "clean_code",
+    "clean_code_legacy",
+    "ast.parse",
+    "CodeAnalyzer.visit",
+    "_compute_nesting",
+    "_analyze_complexity",
+    "_build_details",
+    "fused_engine",
+    "generate_report",
+    "upload",
+)
+
+
+def legacy_clean_code(code):
+    # the regex cleaner clean_code replaced, kept as a speed baseline only:
+    # it also cuts "#" inside strings and drops every triple-quoted string
+    code_no_comments = re.sub(r"#.*", "", code)
+    code_no_docstrings = re.sub(r'(""".*?"""|\'\'\'.*?\'\'\')', "", code_no_comments, flags=re.DOTALL)
+    return "\n".join([line for line in code_no_docstrings.splitlines() if line.strip()])
+
+
+def _timed(func, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def _fresh_analyzer(code, tree=None):
+    # shares the tree but not the (lazily computed) radon raw metrics
+    from analyzer import CodeAnalyzer, STAGES as ANALYZER_STAGES
+    from ast_parser import ParsedSource
+
+    tree = tree if tree is not None else ast.parse(code)
+    analyzer = CodeAnalyzer(code, fused=False, parsed=ParsedSource(code, tree))
+    # the stage methods are timed one by one, so reading an output must not
+    # run its whole stage
+    analyzer.completed = list(ANALYZER_STAGES)
+    analyzer.tree = tree
+    analyzer.lines = len(code.splitlines())
+    return analyzer
+
+
+def bench_size(source, stages, repeat, client=None):
+    """Return {stage: [seconds, ...]} for one synthetic source."""
+    from fileRead import clean_code
+    from ast_engine import FusedVisitor
+    from pipeline import build_results
+    from report_generator import generate_report
+
+    code = clean_code(source)
+    tree = ast.parse(code)
+    out = {}
+
+    if "clean_code" in stages:
+        out["clean_code"] = _timed(lambda: clean_code(source), repeat)
+
+    if "clean_code_legacy" in stages:
+        out["clean_code_legacy"] = _timed(lambda: legacy_clean_code(source), repeat)
+
+    if "ast.parse" in stages:
+        out["ast.parse"] = _timed(lambda: ast.parse(code), repeat)
+
+    if "CodeAnalyzer.visit" in stages:
+        # each run gets a new analyzer so counts don't accumulate
+        runs = []
+        for _ in range(repeat):
+            analyzer = _fresh_analyzer(code, tree)
+            runs += _timed(lambda: analyzer.visit(tree), 1)
+        out["CodeAnalyzer.visit"] = runs
+
+    if "_compute_nesting" in stages:
+        analyzer = _fresh_analyzer(code, tree)
+        out["_compute_nesting"] = _timed(lambda: analyzer._compute_nesting(tree, 0), repeat)
+
+    if "_analyze_complexity" in stages:
+        runs = []
+        for _ in range(repeat):
+            analyzer = _fresh_analyzer(code, tree)
+            runs += _timed(analyzer._analyze_complexity, 1)
+        out["_analyze_complexity"] = runs
+
+    if "_build_details" in stages:
+        analyzer = _fresh_analyzer(code, tree)
+        analyzer._analyze_complexity()
+        out["_build_details"] = _timed(analyzer._build_details, repeat)
+
+    if "fused_engine" in stages:
+        out["fused_engine"] = _timed(lambda: FusedVisitor().run(tree), repeat)
+
+    if "generate_report" in stages:
+        from analyzer import CodeAnalyzer
+
+        analyzer = CodeAnalyzer(code)
+        analyzer.analyze()
+        results = build_results("benchmark.py", analyzer)
+        fd, path = tempfile.mkstemp(suffix=".html")
+        os.close(fd)
+        try:
+            out["generate_report"] = _timed(lambda: generate_report(results, path), repeat)
+        finally:
+            os.remove(path)
+
+    if "upload" in stages and client is not None:
+        out["upload"] = _timed(lambda: _upload(client, source), repeat)
+
+    return out
+
+
+def _upload(client, source):
+    # a new name and content per request: the result cache and the
+    # incremental snapshots would otherwise turn every repeat into a hit
+    token = uuid.uuid4().hex
+    name = f"bench_{token}.py"
+    data = f'{source}_benchmark_run = "{token}"\n'.encode("utf-8")
+    response = client.post(
+        "/upload",
+        data={"file": (io.BytesIO(data), name)},
+        content_type="multipart/form-data",
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"/upload returned {response.status_code}")
+
+
+_scratch = None
+
+
+def _upload_client():
+    # keep benchmark uploads out of the on-disk result cache and the history
+    # database, and their reports in a directory removed on exit
+    global _scratch
+    _scratch = tempfile.TemporaryDirectory(prefix="benchmark-reports-")
+    os.environ["RESULT_CACHE_DISK"] = "0"
+    os.environ["HISTORY_DB"] = ""
+    os.environ["REPORT_STORE_DIR"] = _scratch.name
+    from app import app
+
+    return app.test_client()
+
+
+# -----------------------------------------------------
+
+def run(sizes, stages, repeat, seed=0, nesting=3, branchiness=0.3, err=sys.stderr):
+    from analyzer import ANALYZER_VERSION
+
+    client = _upload_client() if "upload" in stages else None
+    rows = []
+
+    for size in sizes:
+        source = generate_source(size, nesting=nesting, branchiness=branchiness, seed=seed)
+        lines = source.count("\n")
+        print(f"benchmarking {lines} lines ...", file=err)
+
+        for stage, runs in bench_size(source, stages, repeat, client).items():
+            rows.append({
+                "size": size,
+                "lines": lines,
+                "stage": stage,
+                "min": min(runs),
+                "median": statistics.median(runs),
+                "mean": statistics.fmean(runs),
+                "runs": len(runs),
+            })
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "analyzer_version": ANALYZER_VERSION,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": repeat,
+            "seed": seed,
+            "nesting": nesting,
+            "branchiness": branchiness,
+        },
+        "results": rows,
+    }
+
+
+def compare(current, baseline, threshold, min_delta=0.001):
+    """Return comparison rows; ``regression`` is set when a stage's median
+    grew by more than ``threshold`` (a fraction) and by at least
+    ``min_delta`` seconds."""
+    base = {(r["size"], r["stage"]): r for r in baseline["results"]}
+    rows = []
+
+    for r in current["results"]:
+        b = base.get((r["size"], r["stage"]))
+        if b is None:
+            continue
+        ratio = r["median"] / b["median"] if b["median"] else float("inf")
+        rows.append({
+            "size": r["size"],
+            "stage": r["stage"],
+            "baseline": b["median"],
+            "current": r["median"],
+            "ratio": ratio,
+            "regression": (ratio > 1 + threshold
+                           and r["median"] - b["median"] >= min_delta),
+        })
+
+    return rows
+
+
+def print_table(data, comparison=None, out=sys.stdout):
+    if comparison is None:
+        print(f"{'lines':>8}  {'stage':<22}{'median ms':>12}{'ms/1k lines':>14}", file=out)
+        for r in data["results"]:
+            per_k = r["median"] * 1000 / max(1, r["lines"]) * 1000
+            print(f"{r['lines']:>8}  {r['stage']:<22}{r['median'] * 1000:>12.2f}{per_k:>14.3f}",
+                  file=out)
+        return
+
+    print(f"{'size':>8}  {'stage':<22}{'baseline ms':>13}{'current ms':>12}{'ratio':>8}", file=out)
+    for r in comparison:
+        flag = "  REGRESSION" if r["regression"] else ""
+        print(f"{r['size']:>8}  {r['stage']:<22}{r['baseline'] * 1000:>13.2f}"
+              f"{r['current'] * 1000:>12.2f}{r['ratio']:>8.2f}{flag}", file=out)
+
+
+# -----------------------------------------------------
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python benchmark.py",
+        description="Time the analysis pipeline stages on synthetic sources.",
+    )
+    parser.add_argument("--sizes", default="100,1000,10000",
+                        help="comma-separated source sizes in lines (default: 100,1000,10000)")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help="comma-separated stages to time (default: all)")
+    parser.add_argument("-n", "--repeat", type=int, default=5,
+                        help="runs per stage and size (default: 5)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--nesting", type=int, default=3,
+                        help="maximum control-flow depth per function (default: 3)")
+    parser.add_argument("--branchiness", type=float, default=0.3,
+                        help="chance that a statement opens a block (default: 0.3)")
+    parser.add_argument("-o", "--output",
+                        help="write the results as JSON (e.g. to store a baseline)")
+    parser.add_argument("--baseline",
+                        help="JSON file from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown as a fraction of the baseline (default: 0.2)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = sorted(set(stages) - set(STAGES))
+    if unknown:
+        print(f"unknown stage(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+
+    data = run(sizes, stages, args.repeat, args.seed, args.nesting, args.branchiness)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+
+    if not args.baseline:
+        print_table(data)
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    comparison = compare(data, baseline, args.threshold)
+    print_table(data, comparison)
+    return 1 if any(r["regression"] for r in comparison) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import argparse
+import glob
+import json
+import os
+import sys
+
+from batch import BatchRunner, ProjectSummary, analyze_member, file_row, iter_dir_sources
+
+# Only stdlib modules are imported up front. pipeline/radon/pylint/jinja2 are
+# pulled in by the workers (or the report step) when a stage actually needs them.
+
+
+def _is_glob(pattern):
+    return any(c in pattern for c in "*?[")
+
+
+def iter_sources(patterns, err=sys.stderr):
+    seen = set()
+
+    for pattern in patterns:
+        if _is_glob(pattern):
+            matches = sorted(glob.glob(pattern, recursive=True))
+            if not matches:
+                print(f"warning: no match for {pattern}", file=err)
+        else:
+            matches = [pattern]
+
+        for match in matches:
+            if os.path.isdir(match):
+                for rel, data, path in iter_dir_sources(match):
+                    name = os.path.join(match, rel)
+                    if name not in seen:
+                        seen.add(name)
+                        yield name, data, path
+            elif match.endswith(".py") and os.path.isfile(match):
+                if match not in seen:
+                    seen.add(match)
+                    yield match, None, match
+            elif not _is_glob(pattern):
+                print(f"warning: skipping {match} (not a .py file or directory)", file=err)
+
+
+def iter_results(sources, jobs, lint, use_radon, stages=None, cache_dir=None):
+    if jobs == 1:
+        # no pool: avoids process start-up for small runs
+        cache = None
+        if cache_dir:
+            from result_cache import ResultCache
+            cache = ResultCache(max_entries=64, disk_dir=cache_dir)
+        for name, data, path in sources:
+            yield analyze_member(name, data, path, lint, use_radon, stages=stages, cache=cache)
+        return
+
+    runner = BatchRunner(workers=jobs, cache_dir=cache_dir)
+    try:
+        yield from runner.run(sources, lint=lint, use_radon=use_radon, stages=stages)
+    finally:
+        runner.shutdown()
+
+
+def report_name(file_name):
+    stem = os.path.splitext(file_name)[0].strip("./" + os.sep)
+    return stem.replace(os.sep, "__").replace("/", "__") + "_report.html"
+
+
+# -----------------------------------------------------
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python cli.py",
+        description="Analyze Python files and stream one JSON record per file (NDJSON).",
+    )
+    parser.add_argument("paths", nargs="+",
+                        help="files, directories or glob patterns (quote ** globs)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="parallel worker processes (default: 1, no pool)")
+    parser.add_argument("-o", "--output", default="-",
+                        help="NDJSON output file (default: stdout)")
+    parser.add_argument("--lint", action="store_true",
+                        help="run pylint on every file (slow)")
+    parser.add_argument("--no-radon", action="store_true",
+                        help="skip the maintainability index (radon is not imported)")
+    parser.add_argument("--stages", default=None,
+                        help="analysis profile (fast, complexity, full) or comma-separated"
+                             " stages (structure, maintainability, pylint, insights, clones,"
+                             " performance); default: full")
+    parser.add_argument("--cache-dir",
+                        help="keep results here by file content; a re-run only re-analyzes"
+                             " the files that changed")
+    parser.add_argument("--compact", action="store_true",
+                        help="write only the per-file metrics row instead of full results")
+    parser.add_argument("--summary", action="store_true",
+                        help="write a final project summary record")
+    parser.add_argument("--report-dir",
+                        help="also write HTML reports (one per file plus project_report.html)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+
+    if args.stages:
+        from analyzer import resolve_stages
+        try:
+            resolve_stages(args.stages)
+        except ValueError as e:
+            parser.error(str(e))
+
+    generate_report = None
+    if args.report_dir:
+        from report_generator import generate_report, generate_project_report
+        os.makedirs(args.report_dir, exist_ok=True)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    # per-file rows are only retained when a summary or report needs them
+    summary = None
+    if args.summary or args.report_dir:
+        summary = ProjectSummary(os.path.basename(os.path.abspath(args.paths[0])))
+    failed = False
+
+    try:
+        sources = iter_sources(args.paths)
+        for results in iter_results(sources, jobs, args.lint, not args.no_radon,
+                                    args.stages, args.cache_dir):
+            row = summary.add(results) if summary else file_row(results)
+            failed = failed or "error" in row or row["syntax_error"]
+
+            out.write(json.dumps(row if args.compact else results) + "\n")
+            out.flush()
+
+            if generate_report and "error" not in results:
+                generate_report(
+                    results,
+                    output_path=os.path.join(args.report_dir, report_name(results["file_name"])),
+                )
+
+        data = summary.to_dict() if summary else None
+        if args.summary:
+            out.write(json.dumps({
+                "type": "summary",
+                "totals": data["totals"],
+                "hotspots": data["hotspots"],
+                "distribution": data["distribution"],
+                "outliers": data["outliers"],
+                "import_graph": data["import_graph"],
+                "clones": data["clones"],
+            }) + "\n")
+
+        if args.report_dir:
+            generate_project_report(data, os.path.join(args.report_dir, "project_report.html"))
+
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+import ast
+import os
+import zlib
+from array import array
+
+import numpy as np
+
+# Smallest statement subtree considered for clone detection, in AST nodes
+# and in source lines; smaller ones are too common to be worth reporting and
+# would only grow the index.
+CLONE_MIN_NODES = int(os.environ.get("CLONE_MIN_NODES", 30))
+CLONE_MIN_LINES = int(os.environ.get("CLONE_MIN_LINES", 4))
+
+_type_ids = {}
+
+
+def _type_id(cls):
+    # stable across processes, unlike hash() of a str
+    tid = _type_ids.get(cls)
+    if tid is None:
+        tid = _type_ids[cls] = zlib.crc32(cls.__name__.encode("ascii"))
+    return tid
+
+
+def fingerprint(tree, min_nodes=CLONE_MIN_NODES, min_lines=CLONE_MIN_LINES):
+    """Structural hashes of the statement subtrees of ``tree``.
+
+    Identifiers are left out and literals reduced to their type, so two
+    blocks that only differ in names or constants hash alike. Each subtree's
+    hash combines its children's, so the whole tree is hashed in one
+    bottom-up pass. Hashes only combine ints, so they agree across
+    processes.
+
+    Returns rows ``[hash, line, end_line, nodes, parent]`` for the statements
+    of at least ``min_nodes`` nodes and ``min_lines`` lines, in source order;
+    ``parent`` is the row of the nearest enclosing reported statement or -1.
+    """
+    # preorder, with the position of each node's parent
+    order = []
+    parent_of = []
+    stack = [(tree, -1)]
+    while stack:
+        node, parent = stack.pop()
+        position = len(order)
+        order.append(node)
+        parent_of.append(parent)
+        stack.extend((child, position) for child in ast.iter_child_nodes(node))
+
+    info = {}  # node -> (hash, size)
+    AST = ast.AST
+    for node in reversed(order):
+        cls = type(node)
+        parts = [_type_id(cls)]
+        size = 1
+        for field in node._fields:
+            value = getattr(node, field, None)
+            if isinstance(value, AST):
+                h, n = info[value]
+                parts.append(h)
+                size += n
+            elif type(value) is list:
+                items = []
+                for item in value:
+                    if isinstance(item, AST):
+                        h, n = info[item]
+                        items.append(h)
+                        size += n
+                parts.append(hash(tuple(items)))
+            elif cls is ast.Constant and field == "value":
+                parts.append(_type_id(type(value)))
+            else:
+                # identifiers and other plain values
+                parts.append(0)
+        info[node] = (hash(tuple(parts)), size)
+
+    # enclosing[i]: row of the nearest reported statement around order[i]
+    rows = []
+    enclosing = []
+    stmt = ast.stmt
+    for node, parent in zip(order, parent_of):
+        parent_row = enclosing[parent] if parent >= 0 else -1
+        if isinstance(node, stmt):
+            h, size = info[node]
+            line, end_line = node.lineno, node.end_lineno or node.lineno
+            if size >= min_nodes and end_line - line + 1 >= min_lines:
+                rows.append([h, line, end_line, size, parent_row])
+                parent_row = len(rows) - 1
+        enclosing.append(parent_row)
+
+    # preorder is source order except where a child's fields come first;
+    # parents still precede their children after sorting by line
+    order_rows = sorted(range(len(rows)), key=lambda i: (rows[i][1], -rows[i][2]))
+    renumber = {old: new for new, old in enumerate(order_rows)}
+    return [
+        rows[i][:4] + [renumber[rows[i][4]] if rows[i][4] >= 0 else -1]
+        for i in order_rows
+    ]
+
+
+class CloneIndex:
+    """Inverted index from subtree hash to the places it occurs, over one
+    file or a whole batch.
+
+    Fingerprints are kept in flat typed arrays (about 30 bytes each), and
+    groups are found by sorting the hashes, so no pairs are ever compared.
+    """
+
+    def __init__(self):
+        self.file_names = []
+        self.hashes = array("q")
+        self.files = array("I")
+        self.lines = array("I")
+        self.end_lines = array("I")
+        self.sizes = array("I")
+        self.parents = array("q")
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def add(self, file_name, rows):
+        file_id = len(self.file_names)
+        self.file_names.append(file_name)
+        offset = len(self.hashes)
+        for h, line, end_line, size, parent in rows:
+            self.hashes.append(h)
+            self.files.append(file_id)
+            self.lines.append(line)
+            self.end_lines.append(end_line)
+            self.sizes.append(size)
+            self.parents.append(parent + offset if parent >= 0 else -1)
+
+    def groups(self, top=None):
+        """Groups of two or more identical subtrees, largest duplication
+        first. A group is left out when every member sits inside a member
+        of a larger group (the enclosing clone is reported instead)."""
+        n = len(self.hashes)
+        if not n:
+            return []
+
+        hashes = np.frombuffer(self.hashes, dtype=np.int64)
+        parents = np.frombuffer(self.parents, dtype=np.int64)
+        _, inverse, counts = np.unique(hashes, return_inverse=True, return_counts=True)
+        inverse = inverse.ravel()
+
+        duplicated = counts[inverse] >= 2
+        parent_duplicated = np.zeros(n, dtype=bool)
+        has_parent = parents >= 0
+        parent_duplicated[has_parent] = duplicated[parents[has_parent]]
+        maximal = duplicated & ~parent_duplicated
+
+        selected = np.unique(inverse[maximal])
+        if not selected.size:
+            return []
+
+        # members of each hash are contiguous in this order
+        members = np.argsort(inverse, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sizes = np.frombuffer(self.sizes, dtype=np.uint32)
+        first = members[starts[selected]]
+        score = sizes[first].astype(np.int64) * (counts[selected] - 1)
+        ranked = selected[np.argsort(-score, kind="stable")]
+        if top is not None:
+            ranked = ranked[:top]
+
+        result = []
+        for g in ranked:
+            rows = members[starts[g]:starts[g] + counts[g]]
+            instances = []
+            for i in rows:
+                instance = {"line": self.lines[i], "end_line": self.end_lines[i]}
+                name = self.file_names[self.files[i]]
+                if name is not None:
+                    instance["file_name"] = name
+                instances.append(instance)
+            result.append({"nodes": int(sizes[rows[0]]), "instances": instances})
+        return result
+
+    def to_dict(self, top=50):
+        groups = self.groups()
+        return {
+            "fingerprints": len(self),
+            "groups": len(groups),
+            "instances": sum(len(g["instances"]) for g in groups),
+            "duplicated_lines": sum(
+                sum(i["end_line"] - i["line"] + 1 for i in g["instances"][1:]) for g in groups
+            ),
+            "top": groups[:top],
+        }
@@ -0,0 +1,220 @@
+import argparse
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from daemon_client import DEFAULT_SOCKET, ProtocolError, recv_message, send_message
+
+base_dir = os.path.dirname(__file__)
+
+# Same on-disk result cache and history as the web app, so the daemon and
+# the app warm each other's caches.
+CACHE_DIR = os.environ.get("ANALYZER_CACHE_DIR", os.path.join(base_dir, "reports", ".cache"))
+REPORT_DIR = os.path.join(base_dir, "reports")
+HISTORY_DB = os.environ.get("HISTORY_DB", os.path.join(REPORT_DIR, "history.sqlite3"))
+
+
+class AnalysisDaemon:
+    """Resident analyzer: radon, pylint's linter and the report templates
+    are loaded once, and the result cache and per-file snapshots (for
+    incremental re-analysis of an edited file) stay warm between requests.
+
+    ``handle`` answers one protocol request; see serve() for the socket side.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, report_dir=REPORT_DIR, history_db=HISTORY_DB):
+        from guard import limit_memory
+        from history import HistoryStore
+        from incremental import SnapshotStore
+        from profiling import StageMetrics
+        from report_store import ReportStore
+        from result_cache import ResultCache
+
+        limit_memory()
+        self.reports = ReportStore(os.path.join(report_dir, "store"))
+        self.cache = ResultCache(disk_dir=cache_dir or None)
+        self.snapshots = SnapshotStore()
+        self.metrics = StageMetrics()
+        self.history = HistoryStore(history_db) if history_db else None
+        self.started = time.time()
+        self.served = 0
+        self._lock = threading.Lock()
+
+    def preload(self):
+        from analyzer import load_radon
+        from pylint_runner import default_runner
+        from report_generator import precompile_templates
+        import pipeline  # noqa: F401
+
+        load_radon()
+        runner = default_runner()
+        if runner.available:
+            runner._get_linter()
+        precompile_templates()
+
+    # -----------------------------------------------------
+
+    def handle(self, request):
+        op = request.get("op")
+        if op == "analyze":
+            return {"ok": True, "results": self.analyze(request)}
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid(), "uptime": time.time() - self.started}
+        if op == "stats":
+            return {"ok": True, "stats": {
+                "served": self.served,
+                "uptime": time.time() - self.started,
+                "cache": self.cache.stats(),
+                "stages": self.metrics.snapshot(),
+            }}
+        return {"ok": False, "error": f"unknown op {op!r}"}
+
+    def analyze(self, request):
+        from analyzer import resolve_stages
+        from batch import MAX_MEMBER_BYTES, analyze_member
+        from report_generator import generate_report, report_key
+
+        path = request.get("path")
+        source = request.get("source")
+        file_name = request.get("file_name") or path or "source.py"
+        if (path is None) == (source is None):
+            raise ValueError("give exactly one of \"path\" and \"source\"")
+
+        stages = resolve_stages(request.get("stages"))
+        data = source.encode("utf-8", "surrogateescape") if source is not None else None
+        if path is not None and os.path.getsize(path) > MAX_MEMBER_BYTES:
+            return {"file_name": file_name, "error": f"File larger than {MAX_MEMBER_BYTES} bytes"}
+
+        results = analyze_member(
+            file_name, data, path, bool(request.get("lint")), request.get("radon", True),
+            stages=stages, cache=self.cache, snapshots=self.snapshots,
+        )
+        if "error" not in results:
+            self.metrics.observe(results.get("profile"))
+            if self.history is not None:
+                results["analysis_id"] = self.history.record(
+                    results, content_hash=results.get("content_hash"))
+            if request.get("report"):
+                stem = os.path.splitext(os.path.basename(file_name))[0] or "source"
+                report_file = self.reports.write(
+                    lambda path: generate_report(results, output_path=path), f"{stem}_report.html",
+                    report_key(results),
+                )
+                results["report_path"] = self.reports.path(report_file)
+                self.reports.maybe_prune()
+
+        with self._lock:
+            self.served += 1
+
+        fields = request.get("fields")
+        if fields:
+            results = {k: results[k] for k in fields if k in results}
+        return results
+
+
+# -----------------------------------------------------
+# socket side
+# -----------------------------------------------------
+
+class _Handler(socketserver.BaseRequestHandler):
+    # one connection, any number of requests answered in order
+
+    def handle(self):
+        analysis = self.server.analysis
+        while True:
+            try:
+                request = recv_message(self.request)
+            except (ProtocolError, OSError):
+                return
+            if request is None:
+                return
+
+            if request.get("op") == "shutdown":
+                send_message(self.request, {"ok": True})
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+            try:
+                reply = analysis.handle(request)
+            except Exception as e:
+                reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            try:
+                send_message(self.request, reply)
+            except (ProtocolError, OSError):
+                return
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _claim_socket(path):
+    # a socket file left behind by a daemon that died is removed; a live
+    # daemon keeps it
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.remove(path)
+    else:
+        raise RuntimeError(f"a daemon is already listening on {path}")
+    finally:
+        probe.close()
+
+
+def serve(path=DEFAULT_SOCKET, daemon=None):
+    daemon = daemon or AnalysisDaemon()
+    _claim_socket(path)
+
+    # the socket is only usable by the user running the daemon
+    old_umask = os.umask(0o177)
+    try:
+        server = _Server(path, _Handler)
+    finally:
+        os.umask(old_umask)
+    server.analysis = daemon
+    print(f"analysis daemon {os.getpid()} listening on {path}", file=sys.stderr)
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python daemon.py",
+        description="Serve analyses over a Unix socket to daemon_client.py.",
+    )
+    parser.add_argument("--socket", default=DEFAULT_SOCKET,
+                        help=f"socket path (default: {DEFAULT_SOCKET})")
+    parser.add_argument("--cache-dir", default=CACHE_DIR,
+                        help="on-disk result cache; empty keeps it in memory only")
+    parser.add_argument("--no-history", action="store_true",
+                        help="don't record analyses in the history database")
+    args = parser.parse_args(argv)
+
+    daemon = AnalysisDaemon(cache_dir=args.cache_dir,
+                            history_db=None if args.no_history else HISTORY_DB)
+    daemon.preload()
+    try:
+        serve(args.socket, daemon)
+    except RuntimeError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
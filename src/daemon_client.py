@@ -0,0 +1,192 @@
+import argparse
+import json
+import os
+import socket
+import struct
+import sys
+import tempfile
+
+# Thin client of daemon.py. Only stdlib modules are imported, so a call from
+# an editor or a pre-commit hook costs an interpreter start and one round
+# trip; the analysis itself runs in the already warm daemon.
+
+DEFAULT_SOCKET = os.environ.get("ANALYZER_SOCKET") or os.path.join(
+    tempfile.gettempdir(), f"python-code-analyzer-{os.getuid()}.sock"
+)
+
+# A frame is a 4-byte big-endian length followed by that many bytes of
+# compact UTF-8 JSON. Either side drops a connection that announces more.
+HEADER = struct.Struct(">I")
+MAX_FRAME = 64 * 1024 * 1024
+
+# --compact asks the daemon for these result fields only
+COMPACT_FIELDS = ("file_name", "metrics", "syntax", "quality_percent", "quality_label")
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class DaemonError(Exception):
+    pass
+
+
+def send_message(sock, message):
+    payload = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    if len(payload) > MAX_FRAME:
+        raise ProtocolError(f"message of {len(payload)} bytes is over the frame limit")
+    sock.sendall(HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock, size):
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(min(size - len(buf), 1024 * 1024))
+        if not chunk:
+            return None
+        buf += chunk
+    return bytes(buf)
+
+
+def recv_message(sock):
+    """The next message, or None when the peer closed the connection."""
+    header = _recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+    (size,) = HEADER.unpack(header)
+    if size > MAX_FRAME:
+        raise ProtocolError(f"frame of {size} bytes is over the limit")
+    payload = _recv_exact(sock, size)
+    if payload is None:
+        raise ProtocolError("connection closed in the middle of a frame")
+    try:
+        return json.loads(payload)
+    except ValueError as e:
+        raise ProtocolError(f"bad frame: {e}")
+
+
+# -----------------------------------------------------
+
+class DaemonClient:
+    """One connection to the daemon; requests are answered in order and the
+    connection is reused for all of them."""
+
+    def __init__(self, path=DEFAULT_SOCKET, timeout=None):
+        self.path = path
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(path)
+        except OSError:
+            self.sock.close()
+            raise
+
+    def request(self, op, **fields):
+        send_message(self.sock, {"op": op, **fields})
+        reply = recv_message(self.sock)
+        if reply is None:
+            raise ProtocolError("the daemon closed the connection")
+        if not reply.get("ok"):
+            raise DaemonError(reply.get("error") or "request failed")
+        return reply
+
+    def analyze(self, path=None, source=None, file_name=None, **options):
+        """Analyze a file the daemon can read (``path``) or a ``source``
+        string; options: lint, radon, stages, report, fields."""
+        if path is not None:
+            options["path"] = os.path.abspath(path)
+        if source is not None:
+            options["source"] = source
+        return self.request("analyze", file_name=file_name or path, **options)["results"]
+
+    def ping(self):
+        return self.request("ping")
+
+    def stats(self):
+        return self.request("stats")["stats"]
+
+    def shutdown(self):
+        return self.request("shutdown")
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# -----------------------------------------------------
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python daemon_client.py",
+        description="Analyze files with a running analysis daemon (python daemon.py)"
+                    " and write one JSON record per file (NDJSON).",
+    )
+    parser.add_argument("files", nargs="*",
+                        help=".py files; - reads one source from stdin (see --file-name)")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET,
+                        help=f"daemon socket (default: {DEFAULT_SOCKET})")
+    parser.add_argument("--file-name", default="stdin.py",
+                        help="name reported for a source read from stdin")
+    parser.add_argument("--lint", action="store_true", help="also run pylint")
+    parser.add_argument("--stages", default=None,
+                        help="analysis profile (fast, complexity, full) or comma-separated stages")
+    parser.add_argument("--compact", action="store_true",
+                        help="only the metrics, syntax and quality of each file")
+    parser.add_argument("--report", action="store_true",
+                        help="also have the daemon write an HTML report per file")
+    parser.add_argument("--ping", action="store_true", help="check the daemon is up")
+    parser.add_argument("--stats", action="store_true", help="print the daemon's statistics")
+    parser.add_argument("--shutdown", action="store_true", help="stop the daemon")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        client = DaemonClient(args.socket)
+    except OSError as e:
+        print(f"error: no analysis daemon at {args.socket} ({e.strerror or e});"
+              " start one with: python daemon.py", file=sys.stderr)
+        return 2
+
+    options = {"lint": args.lint, "report": args.report}
+    if args.stages:
+        options["stages"] = args.stages
+    if args.compact:
+        options["fields"] = list(COMPACT_FIELDS)
+
+    failed = False
+    with client:
+        try:
+            if args.ping or args.stats or args.shutdown:
+                reply = (client.ping() if args.ping else
+                         client.stats() if args.stats else client.shutdown())
+                print(json.dumps(reply))
+                return 0
+
+            for name in args.files:
+                if name == "-":
+                    results = client.analyze(source=sys.stdin.read(), file_name=args.file_name,
+                                             **options)
+                else:
+                    results = client.analyze(path=name, file_name=name, **options)
+                failed = failed or "error" in results or (results.get("syntax") or {}).get("error")
+                sys.stdout.write(json.dumps(results) + "\n")
+                sys.stdout.flush()
+
+        except (DaemonError, ProtocolError, OSError) as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 2
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
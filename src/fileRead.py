@@ -1,23 +1,200 @@
-﻿import re
+﻿import bisect
+import codecs
+import itertools
+import mmap
+import os
+import re
 from pathlib import Path
 
+# Files at least this big are decoded straight from a memory map instead of
+# being read into a bytes object first.
+MMAP_THRESHOLD = 1024 * 1024
+
+# PEP 263: the cookie must be on one of the first two lines.
+_CODING = re.compile(rb"^[ \t\f]*#.*?coding[:=][ \t]*([-\w.]+)")
+
+
 def read_file(file_path):
     path = Path(file_path)
     if not path.exists() or path.suffix != ".py":
         raise ValueError("Invalid file")
+    with path.open("rb") as file:
+        if os.fstat(file.fileno()).st_size < MMAP_THRESHOLD:
+            return decode_source(file.read())
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return decode_source(data)
+
+def detect_encoding(head):
+    # head: the first bytes of a source; a BOM wins over a coding cookie
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    for line in head.split(b"\n", 2)[:2]:
+        match = _CODING.match(line)
+        if match:
+            try:
+                return codecs.lookup(match.group(1).decode("ascii")).name
+            except LookupError:
+                break
+        # the cookie may only follow a comment or blank line
+        if line.strip() and not line.lstrip().startswith(b"#"):
+            break
+    return "utf-8"
+
+def decode_source(data):
+    # data: bytes or any buffer (e.g. an mmap); decoded without a copy
+    encoding = detect_encoding(bytes(data[:512]))
     try:
-        with path.open("r", encoding="utf-8") as file:
-            content = file.read()
-    except UnicodeDecodeError:
-        with path.open("r", encoding="cp1252") as file:
-            content = file.read()
-    return content
+        content = str(data, encoding)
+    except (UnicodeDecodeError, LookupError):
+        content = str(data, "cp1252", errors="replace")
+    # same newline handling as reading the file in text mode
+    return content.replace("\r\n", "\n").replace("\r", "\n")
+
+# One scanner for everything that can hide a "#" or a quote: comments and
+# string literals (single or triple quoted; prefixes are checked separately).
+# Each match also takes the code before the token, which is only inspected for
+# brackets; a quote that opens no valid string, or the end of the source, ends
+# a match too, so the scan never goes over the same text twice.
+_TOKEN = re.compile(r"""
+    [^\#'"]*
+    (?:
+        (?P<comment>\#[^\n]*)
+      | (?P<string>
+            '(?: ''[^'\\]*(?:(?:\\[\s\S]|'(?!''))[^'\\]*)*'''
+               | [^'\\\n]*(?:\\[\s\S][^'\\\n]*)*' )
+          | "(?: ""[^"\\]*(?:(?:\\[\s\S]|"(?!""))[^"\\]*)*\"\"\"
+               | [^"\\\n]*(?:\\[\s\S][^"\\\n]*)*" )
+        )
+      | ['"]
+      | \Z
+    )
+""", re.VERBOSE)
+
+
+def _bare_string_start(code, start, end):
+    # Start of the statement if the string at start:end is a whole statement
+    # by itself (only indentation before it, nothing but a comment after it,
+    # not a continued line, not an f/bytes string), else -1.
+    s = start
+    while s > 0 and start - s < 2 and code[s - 1] in "rRbBuUfF":
+        s -= 1
+    prefix = code[s:start].lower()
+    if "f" in prefix or "b" in prefix:
+        return -1
+
+    line_start = code.rfind("\n", 0, s) + 1
+    if code[line_start:s].strip():
+        return -1
+    if line_start >= 2 and code[line_start - 2] == "\\":
+        return -1
+
+    line_end = code.find("\n", end)
+    rest = code[end:line_end if line_end >= 0 else len(code)].lstrip(" \t")
+    if rest and not rest.startswith("#"):
+        return -1
+    return s
+
+
+def clean_source(code):
+    """Remove comments and docstrings from ``code``.
+
+    Returns ``(cleaned, line_map)`` where ``line_map[i]`` is the original line
+    number of cleaned line ``i + 1``. Only real comments and bare string
+    statements (docstrings) are removed; strings that are values, and "#"
+    inside them, are kept verbatim. A docstring that was the whole body of a
+    block is replaced by ``pass`` so the cleaned code still parses.
+    """
+    pieces = []
+    gaps = []
+    doc_lines = set()
+    kept_lines = set()
+    pos = 0
+    last = 0
+    depth = 0
+    counted = 0
+    lineno = 1
+
+    for m in _TOKEN.finditer(code):
+        kind = m.lastgroup
+        if kind is None:
+            continue
+        start, end = m.span(kind)
+        gaps.append(code[last:start])
+        last = end
+
+        if kind == "comment":
+            # take the whitespace before the comment with it
+            while start > pos and code[start - 1] in " \t":
+                start -= 1
+            pieces.append(code[pos:start])
+            pos = end
+            continue
+
+        stmt = -1
+        # cheap pre-check: a statement string follows indentation or a prefix
+        if start == 0 or code[start - 1] in " \t\nrRbBuUfF":
+            stmt = _bare_string_start(code, start, end)
+        if stmt >= 0:
+            # brackets are only counted when it matters
+            gap = "".join(gaps)
+            gaps.clear()
+            depth += (gap.count("(") + gap.count("[") + gap.count("{")
+                      - gap.count(")") - gap.count("]") - gap.count("}"))
+            if depth > 0:
+                stmt = -1
+
+        newlines = code.count("\n", start, end)
+        if stmt < 0 and not newlines:
+            continue
+
+        lineno += code.count("\n", counted, start)
+        counted = start
+        if stmt < 0:
+            # lines that start inside a kept string are part of its value
+            kept_lines.update(range(lineno + 1, lineno + newlines + 1))
+            continue
+        doc_lines.add(lineno)
+
+        pieces.append(code[pos:stmt])
+        # keep the line structure; blank lines are dropped below
+        pieces.append("\n" * newlines)
+        pos = end
+
+    pieces.append(code[pos:])
+    lines = "".join(pieces).split("\n")
+
+    line_map = list(itertools.compress(itertools.count(1), map(str.strip, lines)))
+    # blank lines inside a kept string are part of its value
+    blank_kept = [n for n in kept_lines if not lines[n - 1].strip()]
+    if blank_kept:
+        line_map = sorted(line_map + blank_kept)
+
+    # a docstring that was a block's only statement becomes "pass"
+    inserts = {}
+    for doc_line in sorted(doc_lines):
+        i = bisect.bisect(line_map, doc_line)
+        if i == 0 or i in inserts:
+            continue
+        indent = lines[doc_line - 1]
+        if not lines[line_map[i - 1] - 1].rstrip().endswith(":"):
+            continue
+        if i < len(line_map):
+            following = lines[line_map[i] - 1]
+            if len(following) - len(following.lstrip()) >= len(indent):
+                continue
+        inserts[i] = (indent + "pass", doc_line)
+
+    cleaned = [lines[number - 1] for number in line_map]
+    for i in sorted(inserts, reverse=True):
+        text, doc_line = inserts[i]
+        cleaned.insert(i, text)
+        line_map.insert(i, doc_line)
+
+    return "\n".join(cleaned), line_map
+
 
 def clean_code(code):
-    code_no_comments = re.sub(r"#.*", "", code)
-    code_no_docstrings = re.sub(r'(""".*?"""|\'\'\'.*?\'\'\')', "", code_no_comments, flags=re.DOTALL)
-    cleaned_code = "\n".join([line for line in code_no_docstrings.splitlines() if line.strip()])
-    return cleaned_code
+    return clean_source(code)[0]
 
 def preprocess_python_file(file_path):
     code = read_file(file_path)
@@ -0,0 +1,127 @@
+import contextlib
+import ctypes
+import heapq
+import itertools
+import os
+import queue
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Wall-clock limit per analysis stage in seconds (0 turns it off). pylint has
+# its own limit (PylintRunner.timeout).
+STAGE_TIMEOUT = float(os.environ.get("ANALYSIS_STAGE_TIMEOUT", 30))
+
+# Address-space cap for analysis worker processes in MB (0 turns it off).
+MEMORY_LIMIT_MB = int(os.environ.get("ANALYSIS_MEMORY_LIMIT_MB", 2048))
+
+
+class StageTimeout(BaseException):
+    # a BaseException, like KeyboardInterrupt, so the stages' own
+    # "except Exception" handlers don't swallow it
+    pass
+
+
+def _interrupt(thread_id, exc):
+    # raise exc in the thread at its next bytecode boundary; None cancels a
+    # pending one
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(
+        ctypes.c_ulong(thread_id), ctypes.py_object(exc) if exc is not None else None
+    )
+
+
+class _Guarded:
+    __slots__ = ("thread_id", "deadline", "lock", "done", "fired")
+
+    def __init__(self, thread_id, deadline):
+        self.thread_id = thread_id
+        self.deadline = deadline
+        # held by the watchdog from deciding to fire until the exception is
+        # posted, and by the block while it marks itself done, so a timeout
+        # is either posted before the block ends (and then cleared) or not
+        # at all
+        self.lock = threading.Lock()
+        self.done = False
+        self.fired = False
+
+
+class Watchdog:
+    """Interrupts code that runs past its deadline with StageTimeout.
+
+    One daemon thread serves every guarded block in the process. The
+    exception is delivered between bytecodes, so a long call into C (e.g.
+    ast.parse itself) only ends when it returns; the analysis stages that
+    can blow up (tree walks, radon's visitors) are Python code.
+    """
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @contextlib.contextmanager
+    def guard(self, timeout):
+        if not timeout:
+            yield
+            return
+
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="analysis-watchdog", daemon=True
+                    )
+                    self._thread.start()
+
+        entry = _Guarded(threading.get_ident(), time.monotonic() + timeout)
+        self._queue.put(entry)
+        try:
+            yield
+        finally:
+            with entry.lock:
+                entry.done = True
+                if entry.fired:
+                    # fired just as the block finished: drop it if still pending
+                    _interrupt(entry.thread_id, None)
+
+    def _run(self):
+        heap = []
+        seq = itertools.count()
+        while True:
+            timeout = max(0.0, heap[0][0] - time.monotonic()) if heap else None
+            try:
+                entry = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                pass
+            else:
+                heapq.heappush(heap, (entry.deadline, next(seq), entry))
+
+            now = time.monotonic()
+            while heap and heap[0][0] <= now:
+                entry = heapq.heappop(heap)[2]
+                with entry.lock:
+                    if not entry.done:
+                        entry.fired = True
+                        _interrupt(entry.thread_id, StageTimeout)
+
+
+watchdog = Watchdog()
+
+
+def limit_memory(limit_mb=MEMORY_LIMIT_MB):
+    """Cap this process's address space (call it in a worker initializer);
+    allocations past the cap raise MemoryError."""
+    if resource is None or not limit_mb:
+        return
+    limit = limit_mb * 1024 * 1024
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ValueError, OSError):
+        pass
@@ -0,0 +1,253 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from analyzer import ANALYZER_VERSION
+
+# One row per analysis plus its function, class and suggestion rows. The
+# indexes cover the queries below: a file's history, lookups by content
+# hash, time ranges and the most complex functions overall or of one file
+# (functions repeat their analysis's file_name for that index).
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    file_name TEXT NOT NULL,
+    content_hash TEXT,
+    created REAL NOT NULL,
+    analyzer_version TEXT,
+    total_lines INTEGER,
+    functions INTEGER,
+    classes INTEGER,
+    imports INTEGER,
+    avg_complexity REAL,
+    maintainability REAL,
+    max_nesting INTEGER,
+    quality_percent INTEGER,
+    syntax_error INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS analyses_file ON analyses (file_name, created);
+CREATE INDEX IF NOT EXISTS analyses_hash ON analyses (content_hash);
+CREATE INDEX IF NOT EXISTS analyses_created ON analyses (created);
+
+CREATE TABLE IF NOT EXISTS functions (
+    analysis_id INTEGER NOT NULL REFERENCES analyses (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    line INTEGER,
+    end_line INTEGER,
+    loc INTEGER,
+    args TEXT,
+    complexity INTEGER,
+    file_name TEXT
+);
+CREATE INDEX IF NOT EXISTS functions_analysis ON functions (analysis_id);
+CREATE INDEX IF NOT EXISTS functions_complexity ON functions (complexity);
+
+CREATE TABLE IF NOT EXISTS classes (
+    analysis_id INTEGER NOT NULL REFERENCES analyses (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    line INTEGER,
+    end_line INTEGER,
+    loc INTEGER,
+    methods_count INTEGER
+);
+CREATE INDEX IF NOT EXISTS classes_analysis ON classes (analysis_id);
+
+CREATE TABLE IF NOT EXISTS suggestions (
+    analysis_id INTEGER NOT NULL REFERENCES analyses (id) ON DELETE CASCADE,
+    line INTEGER,
+    code TEXT,
+    message TEXT
+);
+CREATE INDEX IF NOT EXISTS suggestions_analysis ON suggestions (analysis_id);
+"""
+
+_SUMMARY_COLUMNS = (
+    "id", "file_name", "content_hash", "created", "analyzer_version",
+    "total_lines", "functions", "classes", "imports", "avg_complexity",
+    "maintainability", "max_nesting", "quality_percent", "syntax_error",
+)
+
+
+def _migrate(db):
+    # databases created before functions had file_name
+    columns = {r[1] for r in db.execute("PRAGMA table_info(functions)")}
+    if "file_name" not in columns:
+        db.execute("ALTER TABLE functions ADD COLUMN file_name TEXT")
+        db.execute(
+            "UPDATE functions SET file_name ="
+            " (SELECT file_name FROM analyses WHERE id = functions.analysis_id)"
+        )
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS functions_file_complexity"
+        " ON functions (file_name, complexity)"
+    )
+
+
+class HistoryStore:
+    """SQLite store of every analysis's metrics and details.
+
+    Each thread gets its own connection; the database runs in WAL mode so
+    readers are never blocked by the thread recording an analysis.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+            _migrate(db)
+
+    def _connect(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA foreign_keys=ON")
+            self._local.db = db
+        return db
+
+    # -----------------------------------------------------
+
+    def record(self, results, content_hash=None, created=None):
+        """Store one results dict (as built by pipeline.build_results) and
+        return its analysis id."""
+        metrics = results.get("metrics") or {}
+        db = self._connect()
+        with db:
+            cur = db.execute(
+                "INSERT INTO analyses (file_name, content_hash, created, analyzer_version,"
+                " total_lines, functions, classes, imports, avg_complexity,"
+                " maintainability, max_nesting, quality_percent, syntax_error)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    results.get("file_name"), content_hash,
+                    created if created is not None else time.time(), ANALYZER_VERSION,
+                    metrics.get("total_lines"), metrics.get("functions"),
+                    metrics.get("classes"), metrics.get("imports"),
+                    metrics.get("avg_complexity"), metrics.get("maintainability"),
+                    metrics.get("max_nesting"), results.get("quality_percent"),
+                    int(bool((results.get("syntax") or {}).get("error"))),
+                ),
+            )
+            analysis_id = cur.lastrowid
+
+            db.executemany(
+                "INSERT INTO functions (analysis_id, name, line, end_line, loc, args,"
+                " complexity, file_name) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(analysis_id, f["name"], f["line"], f["end_line"], f["loc"],
+                  json.dumps(list(f["args"] or [])), f["complexity"],
+                  results.get("file_name"))
+                 for f in results.get("functions") or []],
+            )
+            db.executemany(
+                "INSERT INTO classes VALUES (?, ?, ?, ?, ?, ?)",
+                [(analysis_id, c["name"], c["line"], c["end_line"], c["loc"],
+                  c["methods_count"])
+                 for c in results.get("classes") or []],
+            )
+            db.executemany(
+                "INSERT INTO suggestions VALUES (?, ?, ?, ?)",
+                [(analysis_id, s.get("line"), s.get("code"), s.get("message"))
+                 for s in results.get("suggestions") or []],
+            )
+        return analysis_id
+
+    # -----------------------------------------------------
+    # queries
+    # -----------------------------------------------------
+
+    def history(self, file_name=None, content_hash=None, before=None, limit=50):
+        """Newest analyses first; pass the last row's ``created`` as
+        ``before`` to get the next page."""
+        where, params = [], []
+        if file_name is not None:
+            where.append("file_name = ?")
+            params.append(file_name)
+        if content_hash is not None:
+            where.append("content_hash = ?")
+            params.append(content_hash)
+        if before is not None:
+            where.append("created < ?")
+            params.append(before)
+
+        sql = f"SELECT {', '.join(_SUMMARY_COLUMNS)} FROM analyses"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created DESC LIMIT ?"
+        rows = self._connect().execute(sql, params + [limit]).fetchall()
+        return [dict(r) for r in rows]
+
+    def get(self, analysis_id):
+        db = self._connect()
+        row = db.execute(
+            f"SELECT {', '.join(_SUMMARY_COLUMNS)} FROM analyses WHERE id = ?",
+            (analysis_id,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        data = dict(row)
+        data["functions"] = [
+            {**dict(r), "args": json.loads(r["args"])}
+            for r in db.execute(
+                "SELECT name, line, end_line, loc, args, complexity FROM functions"
+                " WHERE analysis_id = ? ORDER BY line", (analysis_id,))
+        ]
+        data["classes"] = [dict(r) for r in db.execute(
+            "SELECT name, line, end_line, loc, methods_count FROM classes"
+            " WHERE analysis_id = ? ORDER BY line", (analysis_id,))]
+        data["suggestions"] = [dict(r) for r in db.execute(
+            "SELECT line, code, message FROM suggestions"
+            " WHERE analysis_id = ? ORDER BY line", (analysis_id,))]
+        return data
+
+    def trends(self, file_name, since=None, bucket=None):
+        """Metrics of ``file_name`` over time, oldest first. With ``bucket``
+        (seconds) the analyses in each time bucket are averaged."""
+        params = [file_name]
+        cond = "file_name = ?"
+        if since is not None:
+            cond += " AND created >= ?"
+            params.append(since)
+
+        if not bucket:
+            sql = (
+                "SELECT created, total_lines, functions, classes, avg_complexity,"
+                " maintainability, max_nesting, quality_percent"
+                f" FROM analyses WHERE {cond} ORDER BY created"
+            )
+        else:
+            sql = (
+                "SELECT CAST(created / ? AS INTEGER) * ? AS created, COUNT(*) AS analyses,"
+                " AVG(total_lines) AS total_lines, AVG(functions) AS functions,"
+                " AVG(classes) AS classes, AVG(avg_complexity) AS avg_complexity,"
+                " AVG(maintainability) AS maintainability, MAX(max_nesting) AS max_nesting,"
+                " AVG(quality_percent) AS quality_percent"
+                f" FROM analyses WHERE {cond}"
+                " GROUP BY CAST(created / ? AS INTEGER) ORDER BY 1"
+            )
+            params = [bucket, bucket] + params + [bucket]
+        return [dict(r) for r in self._connect().execute(sql, params)]
+
+    def top_functions(self, n=10, file_name=None):
+        """The ``n`` most complex functions across all recorded analyses,
+        or those of ``file_name``."""
+        sql = (
+            "SELECT f.name, f.line, f.end_line, f.loc, f.complexity,"
+            " a.id AS analysis_id, a.file_name, a.created"
+            " FROM functions f JOIN analyses a ON a.id = f.analysis_id"
+            " WHERE f.complexity IS NOT NULL"
+        )
+        params = []
+        if file_name is not None:
+            sql += " AND f.file_name = ?"
+            params.append(file_name)
+        sql += " ORDER BY f.complexity DESC LIMIT ?"
+        return [dict(r) for r in self._connect().execute(sql, params + [n])]
@@ -0,0 +1,234 @@
+import ast
+import os
+
+# Statement fields that hold nested statement lists; imports are statements,
+# so the expressions in between never need to be visited.
+_BODY_FIELDS = ("body", "orelse", "finalbody")
+
+
+def extract_imports(tree):
+    """Import statements of a module as JSON-friendly records
+    ``[level, module, names, line]``: ``names`` is None for ``import x``,
+    and ``module`` is "" for ``from . import x``."""
+    refs = []
+    stack = [tree.body]
+    while stack:
+        for node in stack.pop():
+            cls = type(node)
+            if cls is ast.Import:
+                for alias in node.names:
+                    refs.append([0, alias.name, None, node.lineno])
+            elif cls is ast.ImportFrom:
+                refs.append([node.level or 0, node.module or "",
+                             [alias.name for alias in node.names], node.lineno])
+            else:
+                for field in _BODY_FIELDS:
+                    body = getattr(node, field, None)
+                    if body:
+                        stack.append(body)
+                for handler in getattr(node, "handlers", ()):
+                    stack.append(handler.body)
+                for case in getattr(node, "cases", ()):
+                    stack.append(case.body)
+    refs.sort(key=lambda r: r[3])
+    return refs
+
+
+# -----------------------------------------------------
+# module names
+# -----------------------------------------------------
+
+def _split(file_name):
+    # "pkg/sub/mod.py" -> (["pkg", "sub"], "mod")
+    parts = file_name.replace(os.sep, "/").strip("/").split("/")
+    return parts[:-1], parts[-1][:-3] if parts[-1].endswith(".py") else parts[-1]
+
+
+def module_names(file_names):
+    """Dotted module name (and whether it is a package) for each file.
+
+    A file's name starts at the highest directory of its chain of packages
+    (directories with an __init__.py), so "src/pkg/mod.py" is "pkg.mod"
+    when only src/pkg has an __init__.py.
+    """
+    package_dirs = set()
+    for file_name in file_names:
+        dirs, stem = _split(file_name)
+        if stem == "__init__":
+            package_dirs.add("/".join(dirs))
+
+    names = {}
+    for file_name in file_names:
+        dirs, stem = _split(file_name)
+        start = len(dirs)
+        while start > 0 and "/".join(dirs[:start]) in package_dirs:
+            start -= 1
+        is_package = stem == "__init__"
+        parts = dirs[start:] + ([] if is_package else [stem])
+        names[file_name] = (".".join(parts) or stem, is_package)
+    return names
+
+
+# -----------------------------------------------------
+# project graph
+# -----------------------------------------------------
+
+class ImportGraph:
+    """Module dependency graph of a project built from per-file import
+    records (see extract_imports).
+
+    Building is linear in modules plus imports: targets are resolved with
+    dict lookups and cycles found with an iterative Tarjan SCC pass.
+    """
+
+    def __init__(self):
+        self._refs = {}
+
+    def add(self, file_name, refs):
+        self._refs[file_name] = refs
+
+    def __len__(self):
+        return len(self._refs)
+
+    def build(self):
+        """Return (names, adjacency, external): module names by id, the
+        sorted ids each module imports, and {package: importing modules}
+        for imports that resolve to no module of the project."""
+        file_names = sorted(self._refs)
+        info = module_names(file_names)
+        names = [info[f][0] for f in file_names]
+        index = {}
+        for i, name in enumerate(names):
+            index.setdefault(name, i)
+
+        def lookup(parts):
+            # longest prefix of parts that is a project module
+            for end in range(len(parts), 0, -1):
+                i = index.get(".".join(parts[:end]))
+                if i is not None:
+                    return i
+            return None
+
+        adjacency = []
+        external = {}
+        for i, file_name in enumerate(file_names):
+            name, is_package = info[file_name]
+            base = name.split(".") if is_package else name.split(".")[:-1]
+            targets = set()
+
+            for level, module, imported, _ in self._refs[file_name]:
+                if level:
+                    if level - 1 > len(base):
+                        continue
+                    parts = base[:len(base) - (level - 1)]
+                else:
+                    parts = []
+                if module:
+                    parts = parts + module.split(".")
+
+                found = []
+                for alias in imported or ():
+                    if alias != "*":
+                        j = index.get(".".join(parts + [alias]))
+                        if j is not None:
+                            found.append(j)
+                if not found and parts:
+                    j = lookup(parts)
+                    if j is not None:
+                        found.append(j)
+                    elif not level:
+                        external.setdefault(parts[0], set()).add(i)
+                targets.update(found)
+
+            targets.discard(i)
+            adjacency.append(sorted(targets))
+
+        return names, adjacency, external
+
+    def to_dict(self, top=10, per_module=True):
+        names, adjacency, external = self.build()
+        n = len(names)
+
+        fan_in = [0] * n
+        for targets in adjacency:
+            for j in targets:
+                fan_in[j] += 1
+
+        cycles = sorted(
+            (sorted(names[i] for i in component) for component in _strongly_connected(adjacency)
+             if len(component) > 1),
+            key=lambda c: (-len(c), c),
+        )
+
+        def ranked(values):
+            order = sorted(range(n), key=lambda i: (-values[i], names[i]))
+            return [{"module": names[i], "count": values[i]} for i in order[:top] if values[i]]
+
+        data = {
+            "modules": n,
+            "edges": sum(len(t) for t in adjacency),
+            "cycles": cycles,
+            "modules_in_cycles": sum(len(c) for c in cycles),
+            "top_fan_in": ranked(fan_in),
+            "top_fan_out": ranked([len(t) for t in adjacency]),
+            "external": sorted(
+                ({"package": k, "modules": len(v)} for k, v in external.items()),
+                key=lambda e: (-e["modules"], e["package"]),
+            )[:top],
+        }
+        if per_module:
+            data["per_module"] = {
+                names[i]: {
+                    "fan_in": fan_in[i],
+                    "fan_out": len(adjacency[i]),
+                    "imports": [names[j] for j in adjacency[i]],
+                }
+                for i in range(n)
+            }
+        return data
+
+
+def _strongly_connected(adjacency):
+    # iterative Tarjan: yields lists of node ids, one per component
+    n = len(adjacency)
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    stack = []
+    counter = 0
+
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        work = [(root, 0)]
+        while work:
+            node, child = work.pop()
+            if child == 0:
+                index[node] = low[node] = counter
+                counter += 1
+                stack.append(node)
+                on_stack[node] = True
+
+            targets = adjacency[node]
+            while child < len(targets):
+                nxt = targets[child]
+                child += 1
+                if index[nxt] == -1:
+                    work.append((node, child))
+                    work.append((nxt, 0))
+                    break
+                if on_stack[nxt]:
+                    low[node] = min(low[node], index[nxt])
+            else:
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        top = stack.pop()
+                        on_stack[top] = False
+                        component.append(top)
+                        if top == node:
+                            break
+                    yield component
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
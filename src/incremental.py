@@ -0,0 +1,137 @@
+import ast
+import collections
+import hashlib
+import threading
+
+from ast_engine import FusedVisitor, FUNCTION_TYPES
+
+_DEF_TYPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+
+class DefinitionSummary:
+    """Engine results for one definition, with line numbers stored relative
+    to the definition's first line so they can be reused after it moves."""
+
+    __slots__ = (
+        "node_counts", "functions", "classes", "imports", "max_nesting",
+        "function_details", "class_details", "function_blocks", "class_blocks",
+    )
+
+    @classmethod
+    def from_engine(cls, engine, start):
+        s = cls()
+        s.node_counts = engine.node_counts
+        s.functions = engine.functions
+        s.classes = engine.classes
+        s.imports = engine.imports
+        s.max_nesting = engine.max_nesting
+        s.function_details = [d.shifted(-start) for d in engine.function_details]
+        s.class_details = [d.shifted(-start) for d in engine.class_details]
+        s.function_blocks = [(n, line - start, c) for n, line, c in engine.function_blocks]
+        s.class_blocks = [
+            [(n, line - start, c) for n, line, c in group] for group in engine.class_blocks
+        ]
+        return s
+
+
+class Snapshot:
+    """Summaries of the top-level definitions and methods of one analyzed
+    version of a file, keyed by a hash of their source lines."""
+
+    __slots__ = ("definitions",)
+
+    def __init__(self):
+        self.definitions = {}
+
+
+def _segment_key(lines, node):
+    start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+    text = "\n".join(lines[start - 1:node.end_lineno])
+    return start, hashlib.sha1(text.encode("utf-8", "surrogatepass")).digest()
+
+
+def _summarize(node, start, reuse=None):
+    engine = FusedVisitor().run(node, reuse=reuse)
+    return DefinitionSummary.from_engine(engine, start)
+
+
+# -----------------------------------------------------
+
+def analyze_incremental(tree, code, previous=None):
+    """Run the fused engine over ``tree``, reusing unchanged definitions.
+
+    Top-level functions/classes, and the methods of changed top-level
+    classes, whose source lines match a definition in ``previous`` (a
+    Snapshot) are not walked again: their counts, details and complexity are
+    merged in and shifted to the new position. Only module-level glue and
+    changed definitions are traversed.
+
+    Returns (engine, snapshot of the new version); ``engine.reused`` and
+    ``engine.recomputed`` count definitions.
+    """
+    lines = code.split("\n")
+    old = previous.definitions if previous is not None else {}
+    snapshot = Snapshot()
+    reuse = {}
+    reused = recomputed = 0
+
+    for stmt in tree.body:
+        if not isinstance(stmt, _DEF_TYPES):
+            continue
+
+        start, key = _segment_key(lines, stmt)
+        summary = old.get(key)
+
+        if summary is not None:
+            reused += 1
+        else:
+            members = {}
+            if isinstance(stmt, ast.ClassDef):
+                for member in stmt.body:
+                    if not isinstance(member, FUNCTION_TYPES):
+                        continue
+                    m_start, m_key = _segment_key(lines, member)
+                    m_summary = old.get(m_key)
+                    if m_summary is not None:
+                        reused += 1
+                    else:
+                        m_summary = _summarize(member, m_start)
+                        recomputed += 1
+                    snapshot.definitions[m_key] = m_summary
+                    members[member] = (m_summary, m_start)
+
+            summary = _summarize(stmt, start, members)
+            recomputed += 1
+
+        snapshot.definitions[key] = summary
+        reuse[stmt] = (summary, start)
+
+    engine = FusedVisitor().run(tree, reuse=reuse)
+    engine.reused = reused
+    engine.recomputed = recomputed
+    return engine, snapshot
+
+
+# -----------------------------------------------------
+
+class SnapshotStore:
+    """LRU of the latest Snapshot per file identity (e.g. upload name)."""
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, identity):
+        with self._lock:
+            snapshot = self._entries.get(identity)
+            if snapshot is not None:
+                self._entries.move_to_end(identity)
+            return snapshot
+
+    def put(self, identity, snapshot):
+        with self._lock:
+            self._entries[identity] = snapshot
+            self._entries.move_to_end(identity)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,83 @@
+import hashlib
+import os
+import uuid
+
+from werkzeug.utils import secure_filename
+
+# Largest accepted upload; UPLOAD_MAX_BYTES=0 removes the limit.
+MAX_UPLOAD_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", 5 * 1024 * 1024))
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class SpooledUpload:
+    """An upload copied to a path of its own, with the SHA-256 of its bytes."""
+
+    def __init__(self, path, file_name, size, sha256):
+        self.path = path
+        self.file_name = file_name
+        self.size = size
+        self.sha256 = sha256
+
+    def remove(self):
+        remove_spooled(self.path)
+
+
+def remove_spooled(path):
+    """Remove a spooled upload and the directory of its own it sits in."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    try:
+        os.rmdir(os.path.dirname(path))
+    except OSError:
+        pass
+
+
+def copy_limited(stream, out, max_bytes=MAX_UPLOAD_BYTES, digest=None):
+    """Copy ``stream`` to the file ``out`` chunk by chunk (feeding ``digest``
+    on the way) and return the number of bytes copied.
+
+    Raises UploadTooLarge past ``max_bytes``.
+    """
+    size = 0
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            return size
+        size += len(chunk)
+        if max_bytes and size > max_bytes:
+            raise UploadTooLarge(
+                f"File is larger than the {max_bytes // 1024} KB upload limit."
+            )
+        if digest is not None:
+            digest.update(chunk)
+        out.write(chunk)
+
+
+def spool_upload(stream, file_name, directory, max_bytes=MAX_UPLOAD_BYTES):
+    """Copy ``stream`` to a new file in ``directory`` chunk by chunk, hashing
+    it on the way. Each upload gets a fresh subdirectory, so concurrent
+    uploads of the same name never share a path and the file keeps its own
+    name (pylint derives the module name from it).
+
+    Raises UploadTooLarge (and leaves nothing behind) past ``max_bytes``.
+    """
+    safe_name = secure_filename(file_name) or "upload.py"
+    private_dir = os.path.join(directory, uuid.uuid4().hex)
+    os.mkdir(private_dir)
+    path = os.path.join(private_dir, safe_name)
+    digest = hashlib.sha256()
+
+    try:
+        with open(path, "xb") as f:
+            size = copy_limited(stream, f, max_bytes, digest)
+    except BaseException:
+        remove_spooled(path)
+        raise
+
+    return SpooledUpload(path, file_name, size, digest.hexdigest())
@@ -0,0 +1,265 @@
+import collections
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from ingest import remove_spooled
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFull(Exception):
+    pass
+
+
+# -----------------------------------------------------
+# worker side (runs inside the pool processes)
+# -----------------------------------------------------
+
+_worker_cache = None
+_worker_reports = None
+
+
+def _init_worker(cache_dir, report_dir=None):
+    # import the heavy modules and build the pylint linter once per process
+    global _worker_cache, _worker_reports
+    from guard import limit_memory
+    limit_memory()
+
+    from pipeline import analyze_file  # noqa: F401
+    from report_generator import generate_report  # noqa: F401
+    from result_cache import ResultCache
+    from pylint_runner import default_runner
+
+    _worker_cache = ResultCache(max_entries=64, disk_dir=cache_dir)
+    if report_dir:
+        from report_store import ReportStore
+        # the parent process prunes the store
+        _worker_reports = ReportStore(report_dir, prune_interval=0)
+
+    runner = default_runner()
+    if runner.available:
+        runner._get_linter()
+
+
+def run_job(file_path, file_name, report_name, source_hash=None):
+    from pipeline import analyze_file
+    from profiling import StageProfile
+    from report_generator import generate_report, report_key
+
+    profile = StageProfile()
+    started = time.time()
+
+    try:
+        results = analyze_file(file_path, file_name, cache=_worker_cache, profile=profile,
+                               source_hash=source_hash)
+
+        report_file = None
+        if _worker_reports is not None:
+            with profile.stage("report"):
+                report_file = _worker_reports.write(
+                    lambda path: generate_report(results, output_path=path), report_name,
+                    report_key(results),
+                )
+        results["profile"] = profile.to_dict()
+    finally:
+        # the spooled upload is private to this job
+        remove_spooled(file_path)
+
+    return {
+        "results": results,
+        "report_file": report_file,
+        "timings": {**profile.timings, **profile.info},
+        "started": started,
+        "finished": time.time(),
+    }
+
+
+# -----------------------------------------------------
+# parent side
+# -----------------------------------------------------
+
+class Job:
+    def __init__(self, job_id, file_name):
+        self.id = job_id
+        self.file_name = file_name
+        # the stored report ("<key>/<name>"), once the job is done
+        self.report_name = None
+        self.status = QUEUED
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.timings = {}
+        self.results = None
+        self.error = None
+        # a failure to record a finished job (metrics, history, pruning)
+        self.record_error = None
+        self.future = None
+        self.executor = None
+        self.file_path = None
+        self.source_hash = None
+
+    def to_dict(self):
+        status = self.status
+        if status == QUEUED and self.future is not None and self.future.running():
+            status = RUNNING
+
+        data = {
+            "job_id": self.id,
+            "file_name": self.file_name,
+            "status": status,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+            "timings": self.timings,
+        }
+        if self.started is not None:
+            data["queue_wait"] = self.started - self.submitted
+        if self.status == DONE:
+            data["report_file"] = self.report_name
+        if self.error:
+            data["error"] = self.error
+        if self.record_error:
+            data["record_error"] = self.record_error
+        return data
+
+
+class JobQueue:
+    """Bounded process pool running uploads in the background.
+
+    ``max_pending`` caps queued + running jobs; ``submit`` raises QueueFull
+    beyond that so the web layer can push back instead of piling up work.
+    Finished jobs are kept (newest ``keep_finished``) for status polling.
+    Stage profiles of finished jobs are fed to ``metrics`` (a StageMetrics)
+    and their results recorded in ``history`` (a HistoryStore). Reports
+    are written to ``reports`` (a ReportStore).
+    """
+
+    def __init__(self, workers=None, max_pending=None, keep_finished=1000,
+                 cache_dir=None, mp_context="spawn", metrics=None, history=None, reports=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 4
+        self.keep_finished = keep_finished
+        self.cache_dir = cache_dir
+        self.mp_context = mp_context
+        self.metrics = metrics
+        self.history = history
+        self.reports = reports
+
+        self._jobs = {}
+        self._finished = collections.deque()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(self.mp_context),
+                initializer=_init_worker,
+                initargs=(self.cache_dir, self.reports.root if self.reports else None),
+            )
+        return self._executor
+
+    def _discard_executor(self, executor):
+        # a worker died (e.g. killed at the memory cap) and took the pool with
+        # it; the next submit starts a new one. Call with self._lock held.
+        if self._executor is executor:
+            self._executor = None
+        executor.shutdown(wait=False)
+
+    # -----------------------------------------------------
+
+    def submit(self, file_path, file_name, report_name, source_hash=None):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFull(f"{self._pending} jobs pending")
+
+            job = Job(uuid.uuid4().hex, file_name)
+            job.file_path = file_path
+            job.source_hash = source_hash
+            self._jobs[job.id] = job
+            self._pending += 1
+
+            args = (run_job, file_path, file_name, report_name, source_hash)
+            try:
+                job.executor = self._get_executor()
+                try:
+                    job.future = job.executor.submit(*args)
+                except BrokenProcessPool:
+                    # the pool died since the last job: start a new one
+                    self._discard_executor(job.executor)
+                    job.executor = self._get_executor()
+                    job.future = job.executor.submit(*args)
+            except Exception:
+                del self._jobs[job.id]
+                self._pending -= 1
+                raise
+
+        job.future.add_done_callback(lambda f, job=job: self._complete(job, f))
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "tracked": len(self._jobs),
+            }
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    # -----------------------------------------------------
+
+    def _complete(self, job, future):
+        try:
+            try:
+                out = future.result()
+            except Exception as e:
+                job.error = f"{type(e).__name__}: {e}"
+                job.status = FAILED
+                job.finished = time.time()
+                if isinstance(e, BrokenProcessPool):
+                    with self._lock:
+                        self._discard_executor(job.executor)
+                # run_job removes the upload, unless its worker died first
+                remove_spooled(job.file_path)
+            else:
+                job.results = out["results"]
+                job.report_name = out["report_file"]
+                job.timings = out["timings"]
+                job.started = out["started"]
+                job.finished = out["finished"]
+                job.status = DONE
+                if self.metrics is not None:
+                    self.metrics.observe(job.results.get("profile"))
+                if self.history is not None:
+                    self.history.record(job.results, content_hash=job.source_hash)
+                if self.reports is not None:
+                    self.reports.maybe_prune()
+        except Exception as e:
+            # e.g. a locked history database; the job's own outcome stands
+            job.record_error = f"{type(e).__name__}: {e}"
+        finally:
+            # always free the slot, or the queue fills up for good
+            with self._lock:
+                self._pending -= 1
+                self._finished.append(job.id)
+                while len(self._finished) > self.keep_finished:
+                    self._jobs.pop(self._finished.popleft(), None)
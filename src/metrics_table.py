@@ -0,0 +1,189 @@
+import numpy as np
+
+# -----------------------------------------------------
+# QUALITY SCORE SYSTEM
+# -----------------------------------------------------
+# Points per band. The bands are the digitize() bins: maintainability is
+# better when higher, complexity and nesting when lower.
+MI_BINS, MI_POINTS = (40, 60, 80), (10, 20, 30, 40)
+COMPLEXITY_BINS, COMPLEXITY_POINTS = (3, 6, 10), (40, 30, 20, 10)
+NESTING_BINS, NESTING_POINTS = (2, 4, 6), (20, 15, 10, 5)
+
+# (lowest percent, label, color), worst first
+QUALITY_LEVELS = (
+    (0, "Needs Improvement", "red"),
+    (50, "Moderate Code Quality", "yellow"),
+    (80, "Excellent Code Quality", "green"),
+)
+_LEVEL_BINS = [level[0] for level in QUALITY_LEVELS[1:]]
+
+
+def _band_points(values, bins, points, right):
+    values = np.asarray(values, dtype=float)
+    return np.asarray(points)[np.digitize(values, bins, right=right)]
+
+
+def score_quality(maintainability, avg_complexity, max_nesting):
+    """Quality percent (0-100) of any number of analyses at once.
+
+    Takes equal-length arrays; a missing (NaN) or zero maintainability or
+    complexity adds no points, as for a file without functions.
+    """
+    mi = np.asarray(maintainability, dtype=float)
+    cc = np.asarray(avg_complexity, dtype=float)
+
+    score = np.where(np.nan_to_num(mi) != 0, _band_points(mi, MI_BINS, MI_POINTS, False), 0)
+    score += np.where(np.nan_to_num(cc) != 0,
+                      _band_points(cc, COMPLEXITY_BINS, COMPLEXITY_POINTS, True), 0)
+    score += _band_points(max_nesting, NESTING_BINS, NESTING_POINTS, True)
+    return np.minimum(score, 100)
+
+
+def quality_levels(percent):
+    """Index into QUALITY_LEVELS for each quality percent."""
+    return np.digitize(np.asarray(percent), _LEVEL_BINS)
+
+
+def rate_quality(maintainability, avg_complexity, max_nesting):
+    # one analysis: (percent, label, color)
+    percent = int(score_quality([_nan(maintainability)], [_nan(avg_complexity)],
+                                [max_nesting])[0])
+    _, label, color = QUALITY_LEVELS[int(quality_levels(percent))]
+    return percent, label, color
+
+
+def _nan(value):
+    return np.nan if value is None else value
+
+
+def _missing(array):
+    return np.nan if array.dtype.kind == "f" else 0
+
+
+# -----------------------------------------------------
+# COLUMNAR STORE
+# -----------------------------------------------------
+
+# One row per analyzed file; None is stored as NaN (0 in integer columns).
+FILE_COLUMNS = {
+    "total_lines": np.int64,
+    "functions": np.int64,
+    "classes": np.int64,
+    "imports": np.int64,
+    "avg_complexity": np.float64,
+    "maintainability": np.float64,
+    "max_nesting": np.int64,
+    "syntax_error": np.bool_,
+}
+
+# One row per function.
+FUNCTION_COLUMNS = {
+    "complexity": np.float64,
+    "loc": np.int64,
+}
+
+# Columns summarized by MetricsTable.distribution().
+DISTRIBUTION_COLUMNS = ("avg_complexity", "maintainability", "max_nesting")
+PERCENTILES = (50, 75, 90, 95, 99)
+
+
+class MetricsTable:
+    """Metrics of many analyses as one NumPy array per column.
+
+    Rows are appended one at a time (arrays grow by doubling) or in bulk;
+    scoring and the statistics below run over whole columns at once.
+    """
+
+    def __init__(self, columns=FILE_COLUMNS, capacity=256):
+        self.dtypes = dict(columns)
+        self._data = {name: np.empty(capacity, dtype) for name, dtype in self.dtypes.items()}
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, n):
+        capacity = len(next(iter(self._data.values())))
+        if self.size + n <= capacity:
+            return
+        capacity = max(capacity * 2, self.size + n)
+        for name, array in self._data.items():
+            grown = np.empty(capacity, array.dtype)
+            grown[:self.size] = array[:self.size]
+            self._data[name] = grown
+
+    def append(self, row):
+        self._reserve(1)
+        i = self.size
+        for name, array in self._data.items():
+            value = row.get(name)
+            array[i] = _missing(array) if value is None else value
+        self.size += 1
+
+    def extend(self, rows):
+        rows = list(rows)
+        self._reserve(len(rows))
+        end = self.size + len(rows)
+        for name, array in self._data.items():
+            missing = _missing(array)
+            values = (r.get(name) for r in rows)
+            array[self.size:end] = [missing if v is None else v for v in values]
+        self.size = end
+
+    def column(self, name):
+        # a view; valid until the next append
+        return self._data[name][:self.size]
+
+    # -----------------------------------------------------
+
+    def scores(self):
+        return score_quality(self.column("maintainability"), self.column("avg_complexity"),
+                             self.column("max_nesting"))
+
+    def _valid(self, name):
+        values = self.column(name).astype(float)
+        return values[~np.isnan(values)]
+
+    def mean(self, name):
+        values = self._valid(name)
+        return float(values.mean()) if values.size else None
+
+    def percentiles(self, name, q=PERCENTILES):
+        values = self._valid(name)
+        if not values.size:
+            return {}
+        return {f"p{p}": float(v) for p, v in zip(q, np.percentile(values, q))}
+
+    def histogram(self, name, bins=10):
+        values = self._valid(name)
+        if not values.size:
+            return {"counts": [], "edges": []}
+        counts, edges = np.histogram(values, bins=bins)
+        return {"counts": counts.tolist(), "edges": edges.tolist()}
+
+    def outliers(self, name, k=1.5, high=True):
+        """Row indices outside Tukey's fences (k times the interquartile
+        range past the quartiles), most extreme first. ``high`` keeps only
+        those above the upper fence; pass False for maintainability, where
+        low values are the bad ones."""
+        values = self.column(name).astype(float)
+        valid = ~np.isnan(values)
+        if not valid.any():
+            return np.empty(0, dtype=np.int64)
+        q1, q3 = np.percentile(values[valid], (25, 75))
+        spread = k * (q3 - q1)
+        if high:
+            rows = np.flatnonzero(valid & (values > q3 + spread))
+            return rows[np.argsort(-values[rows], kind="stable")]
+        rows = np.flatnonzero(valid & (values < q1 - spread))
+        return rows[np.argsort(values[rows], kind="stable")]
+
+    def distribution(self, columns=DISTRIBUTION_COLUMNS, bins=10):
+        return {
+            name: {
+                "mean": self.mean(name),
+                "percentiles": self.percentiles(name),
+                "histogram": self.histogram(name, bins),
+            }
+            for name in columns
+        }
@@ -0,0 +1,513 @@
+import ast
+
+# high: quadratic by construction; medium: repeated linear work, usually
+# worth fixing; low: cheap but avoidable overhead
+SEVERITIES = ("high", "medium", "low")
+
+# Looked-up attribute chains (a.b.c) repeated this often in one loop
+# iteration are reported.
+REPEATED_LOOKUPS = 3
+
+_SCOPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)
+_COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+# builtins that walk their whole argument
+_LINEAR_BUILTINS = {"sorted", "set", "frozenset", "list", "tuple", "dict", "sum", "max", "min"}
+
+# builtins known not to change their arguments
+_PURE_BUILTINS = _LINEAR_BUILTINS | {
+    "len", "isinstance", "str", "repr", "int", "float", "bool", "abs", "round",
+    "range", "enumerate", "zip", "reversed", "hash", "id", "type", "any", "all",
+    "format", "print",
+}
+
+
+def find_smells(tree):
+    """Performance anti-patterns in ``tree``, each a dict with the ``line``
+    it is on, a ``rule`` name, a ``severity`` (see SEVERITIES) and a
+    ``message`` explaining the cost and the usual fix. Findings about a
+    loop also give the ``loop_line`` of the loop. Sorted by line.
+
+    Only what the tree shows is used: a name counts as a list, a str or a
+    deque when every binding of it in its scope says so.
+    """
+    finder = _Finder()
+    finder.scope(tree)
+    order = {s: i for i, s in enumerate(SEVERITIES)}
+    return sorted(finder.findings, key=lambda f: (f["line"], order[f["severity"]], f["rule"]))
+
+
+# -----------------------------------------------------
+# helpers
+# -----------------------------------------------------
+
+def _local_nodes(nodes):
+    # every node under ``nodes`` that runs in the same scope
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        yield node
+        if not isinstance(node, _SCOPES):
+            stack.extend(ast.iter_child_nodes(node))
+
+
+def _dotted(node):
+    # "a.b.c" for a plain name / attribute chain, else None
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+def _base_name(node):
+    # the name an expression like a.b[0].c() hangs off
+    while True:
+        if isinstance(node, (ast.Attribute, ast.Subscript)):
+            node = node.value
+        elif isinstance(node, ast.Call):
+            node = node.func
+        elif isinstance(node, ast.Name):
+            return node.id
+        else:
+            return None
+
+
+def _iterated(node):
+    # the sequence a for loop walks: xs for xs, xs[1:], enumerate(xs), ...
+    while True:
+        if isinstance(node, ast.Subscript):
+            node = node.value
+        elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+              and node.func.id in ("enumerate", "reversed") and len(node.args) == 1):
+            node = node.args[0]
+        else:
+            return _dotted(node)
+
+
+def _changed_names(nodes):
+    """Names that may be rebound or mutated by ``nodes``. Conservative: a
+    method call counts as a change of its object, and so does passing a name
+    to anything but a known builtin."""
+    names = set()
+    for node in _local_nodes(nodes):
+        if isinstance(node, ast.Name):
+            if not isinstance(node.ctx, ast.Load):
+                names.add(node.id)
+        elif isinstance(node, (ast.Attribute, ast.Subscript)):
+            if not isinstance(node.ctx, ast.Load):
+                names.add(_base_name(node))
+        elif isinstance(node, ast.Call):
+            func = node.func
+            if isinstance(func, ast.Attribute):
+                names.add(_base_name(func.value))
+            if not (isinstance(func, ast.Name) and func.id in _PURE_BUILTINS):
+                for arg in node.args + [k.value for k in node.keywords]:
+                    if isinstance(arg, ast.Starred):
+                        arg = arg.value
+                    names.add(_base_name(arg))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.update((a.asname or a.name).split(".")[0] for a in node.names)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+    names.discard(None)
+    return names
+
+
+def _value_kind(node):
+    if isinstance(node, (ast.List, ast.ListComp)):
+        return "list"
+    if isinstance(node, ast.JoinedStr) or (
+        isinstance(node, ast.Constant) and isinstance(node.value, str)
+    ):
+        return "str"
+    if isinstance(node, ast.BinOp):
+        # [0] * n, "-" * width, prefix + name
+        return _value_kind(node.left)
+    if isinstance(node, ast.Call):
+        func = node.func
+        name = func.id if isinstance(func, ast.Name) else getattr(func, "attr", None)
+        if name in ("list", "sorted"):
+            return "list"
+        if name == "str" or (
+            isinstance(func, ast.Attribute) and name in ("join", "format")
+            and _value_kind(func.value) == "str"
+        ):
+            return "str"
+        if name == "deque":
+            return "deque"
+        if name == "iter":
+            return "iterator"
+    return "other"
+
+
+def _annotation_kind(node):
+    if isinstance(node, ast.Subscript):
+        node = node.value
+    name = _dotted(node) or ""
+    name = name.rsplit(".", 1)[-1]
+    if name in ("list", "List"):
+        return "list"
+    if name == "str":
+        return "str"
+    if name in ("deque", "Deque"):
+        return "deque"
+    return "other"
+
+
+def _binding_kinds(scope):
+    # name -> kinds of everything bound to it in this scope
+    kinds = {}
+    bound = set()
+
+    def bind(target, kind):
+        if isinstance(target, ast.Name):
+            kinds.setdefault(target.id, set()).add(kind)
+            bound.add(id(target))
+
+    if isinstance(scope, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+        args = scope.args
+        for arg in args.posonlyargs + args.args + args.kwonlyargs:
+            kind = _annotation_kind(arg.annotation) if arg.annotation else "other"
+            kinds.setdefault(arg.arg, set()).add(kind)
+        for arg in (args.vararg, args.kwarg):
+            if arg is not None:
+                kinds.setdefault(arg.arg, set()).add("other")
+        body = [scope.body] if isinstance(scope, ast.Lambda) else scope.body
+    else:
+        body = scope.body
+
+    nodes = list(_local_nodes(body))
+    for node in nodes:
+        if isinstance(node, ast.Assign):
+            for target in node.targets:
+                bind(target, _value_kind(node.value))
+        elif isinstance(node, ast.AnnAssign):
+            bind(node.target, _annotation_kind(node.annotation))
+        elif isinstance(node, ast.NamedExpr):
+            bind(node.target, _value_kind(node.value))
+        elif isinstance(node, ast.AugAssign):
+            # x += ... keeps the kind x already has
+            bound.add(id(node.target))
+    for node in nodes:
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load) and id(node) not in bound:
+            kinds.setdefault(node.id, set()).add("other")
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            kinds.setdefault(node.name, set()).add("other")
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for a in node.names:
+                kinds.setdefault((a.asname or a.name).split(".")[0], set()).add("other")
+    return kinds
+
+
+class _Loop:
+    # one loop level: a for/while statement or one comprehension generator
+
+    def __init__(self, node, parts, iterable=None):
+        self.line = node.lineno
+        self.parts = parts  # the nodes that run on every iteration
+        self.iterable = iterable
+        self.lookups = {}  # attribute chain -> [count, first node]
+        self._changed = None
+        self._rebound = None
+
+    @property
+    def changed(self):
+        if self._changed is None:
+            self._changed = _changed_names(self.parts)
+        return self._changed
+
+    @property
+    def rebound(self):
+        # names given a new value on every iteration (augmented assignment
+        # keeps building on the old one); includes the loop target
+        if self._rebound is None:
+            nodes = list(_local_nodes(self.parts))
+            augmented = {id(n.target) for n in nodes if isinstance(n, ast.AugAssign)}
+            self._rebound = {
+                n.id for n in nodes
+                if isinstance(n, ast.Name) and not isinstance(n.ctx, ast.Load)
+                and id(n) not in augmented
+            }
+        return self._rebound
+
+
+# -----------------------------------------------------
+# detector
+# -----------------------------------------------------
+
+class _Finder:
+
+    def __init__(self):
+        self.findings = []
+        self._scope = None
+        self._kinds = None
+        # list(x) / dict(x) / set(x) assigned to a name: a working copy
+        self.copies = set()
+
+    def add(self, node, rule, severity, message, loop=None):
+        finding = {"line": node.lineno, "rule": rule, "severity": severity, "message": message}
+        if loop is not None:
+            finding["loop_line"] = loop.line
+        self.findings.append(finding)
+
+    @property
+    def kinds(self):
+        # most scopes have no loop, so their bindings are only read on demand
+        if self._kinds is None:
+            self._kinds = _binding_kinds(self._scope)
+        return self._kinds
+
+    def kind(self, name):
+        # "list", "str", "deque" when every binding agrees, else None
+        kinds = self.kinds.get(name)
+        if kinds and len(kinds) == 1:
+            kind = next(iter(kinds))
+            return None if kind == "other" else kind
+        return None
+
+    def scope(self, node):
+        outer = self._scope, self._kinds
+        self._scope, self._kinds = node, None
+        body = [node.body] if isinstance(node, ast.Lambda) else node.body
+        for child in body:
+            self.walk(child, ())
+        self._scope, self._kinds = outer
+
+    # -----------------------------------------------------
+
+    def walk(self, node, loops):
+        if isinstance(node, _SCOPES):
+            self.scope(node)
+            return
+
+        if isinstance(node, (ast.For, ast.AsyncFor)):
+            self.walk(node.iter, loops)
+            self.check_range_len(node)
+            loop = _Loop(node, [node.target] + node.body, node.iter)
+            self.check_nested_iterable(node, loop, loops)
+            for child in node.body:
+                self.walk(child, loops + (loop,))
+            self.end_loop(loop)
+            for child in node.orelse:
+                self.walk(child, loops)
+            return
+
+        if isinstance(node, ast.While):
+            loop = _Loop(node, [node.test] + node.body)
+            for child in [node.test] + node.body:
+                self.walk(child, loops + (loop,))
+            self.end_loop(loop)
+            for child in node.orelse:
+                self.walk(child, loops)
+            return
+
+        if isinstance(node, _COMPREHENSIONS):
+            self.walk_comprehension(node, loops)
+            return
+
+        if loops:
+            self.check(node, loops)
+            if isinstance(node, ast.Attribute) and isinstance(node.ctx, ast.Load):
+                chain = _dotted(node)
+                if chain is not None:
+                    if chain.count(".") >= 2:
+                        entry = loops[-1].lookups.setdefault(chain, [0, node])
+                        entry[0] += 1
+                    return
+
+        for child in ast.iter_child_nodes(node):
+            self.walk(child, loops)
+
+    def walk_comprehension(self, node, loops):
+        if isinstance(node, ast.DictComp):
+            results = [node.key, node.value]
+        else:
+            results = [node.elt]
+        generators = node.generators
+
+        self.walk(generators[0].iter, loops)
+        opened = []
+        for i, gen in enumerate(generators):
+            later = generators[i:]
+            parts = (
+                [g.target for g in later] + [c for g in later for c in g.ifs]
+                + [g.iter for g in later[1:]] + results
+            )
+            loop = _Loop(node, parts, gen.iter)
+            self.check_nested_iterable(node, loop, loops)
+            loops = loops + (loop,)
+            opened.append(loop)
+            for condition in gen.ifs:
+                self.walk(condition, loops)
+            if i + 1 < len(generators):
+                self.walk(generators[i + 1].iter, loops)
+        for child in results:
+            self.walk(child, loops)
+        for loop in reversed(opened):
+            self.end_loop(loop)
+
+    def end_loop(self, loop):
+        for chain, (count, node) in loop.lookups.items():
+            if count >= REPEATED_LOOKUPS and chain.split(".", 1)[0] not in loop.changed:
+                self.add(
+                    node, "repeated-lookup", "low",
+                    f"`{chain}` is looked up {count} times on every iteration of the loop, "
+                    f"though it does not change there. Bind it to a local name before the loop.",
+                    loop,
+                )
+
+    # -----------------------------------------------------
+    # rules
+    # -----------------------------------------------------
+
+    def check(self, node, loops):
+        if isinstance(node, ast.Compare):
+            self.check_membership(node, loops)
+        elif isinstance(node, ast.AugAssign):
+            self.check_string_concat(node, loops)
+        elif isinstance(node, ast.Assign):
+            value = node.value
+            if (isinstance(value, ast.Call) and isinstance(value.func, ast.Name)
+                    and value.func.id in ("list", "dict", "set")):
+                self.copies.add(id(value))
+        elif isinstance(node, ast.Call):
+            self.check_front_ops(node, loops)
+            self.check_invariant_call(node, loops)
+
+    def check_membership(self, node, loops):
+        for op, right in zip(node.ops, node.comparators):
+            if (isinstance(op, (ast.In, ast.NotIn)) and isinstance(right, ast.Name)
+                    and self.kind(right.id) == "list"):
+                self.add(
+                    node, "list-membership", "high",
+                    f"`in {right.id}` scans the list `{right.id}` item by item on every "
+                    f"iteration of the loop (O(n) per test). Keep a set for membership tests.",
+                    loops[-1],
+                )
+
+    def check_string_concat(self, node, loops):
+        if not isinstance(node.op, ast.Add):
+            return
+        # only an accumulator bound before the loop builds up across
+        # iterations; the loop target or a name reset in the loop does not
+        target = node.target
+        if not isinstance(target, ast.Name) or target.id in loops[-1].rebound:
+            return
+        name = target.id
+        kind = self.kind(name)
+        if kind is None and "list" not in self.kinds.get(name, ()):
+            kind = _value_kind(node.value)
+        if kind != "str":
+            return
+        self.add(
+            node, "string-concat", "medium",
+            f"`{name} +=` builds a string inside a loop; each step may copy everything "
+            f"built so far (O(n²) overall). Collect the parts in a list and \"\".join() them.",
+            loops[-1],
+        )
+
+    def check_front_ops(self, node, loops):
+        func = node.func
+        if not isinstance(func, ast.Attribute) or node.keywords:
+            return
+        args = node.args
+        if func.attr == "pop" and len(args) == 1:
+            call = "pop(0)"
+        elif func.attr == "insert" and len(args) == 2:
+            call = "insert(0, ...)"
+        else:
+            return
+        if not (isinstance(args[0], ast.Constant) and args[0].value == 0
+                and type(args[0].value) is int):
+            return
+        # dicts, deques and unknown objects have pop(0) / insert(0, x) of
+        # their own; only lists shift their items
+        name = _dotted(func.value)
+        if name is None or self.kind(name) != "list":
+            return
+        self.add(
+            node, "list-front", "high",
+            f"`{name}.{call}` shifts every other item of the list, so it costs O(n) on each "
+            f"iteration of the loop. Use collections.deque with popleft() / appendleft().",
+            loops[-1],
+        )
+
+    def check_invariant_call(self, node, loops):
+        func = node.func
+        if (not isinstance(func, ast.Name) or func.id not in _LINEAR_BUILTINS
+                or func.id in self.kinds or id(node) in self.copies):
+            return
+        if len(node.args) != 1 or isinstance(node.args[0], ast.Starred):
+            return
+        arg = _dotted(node.args[0])
+        if arg is None:
+            return
+        used = {arg.split(".", 1)[0]}
+        for keyword in node.keywords:
+            if isinstance(keyword.value, ast.Constant):
+                continue
+            chain = _dotted(keyword.value)
+            if chain is None:
+                return
+            used.add(chain.split(".", 1)[0])
+
+        # the outermost loop it could be hoisted out of
+        for loop in loops:
+            if not used & loop.changed:
+                self.add(
+                    node, "loop-invariant-call", "medium",
+                    f"`{func.id}({arg})` walks all of `{arg}` on every iteration of the loop, "
+                    f"though `{arg}` does not change there. Compute it once before the loop.",
+                    loop,
+                )
+                return
+
+    def check_range_len(self, node):
+        it = node.iter
+        if not (isinstance(it, ast.Call) and isinstance(it.func, ast.Name)
+                and it.func.id == "range" and len(it.args) == 1 and not it.keywords):
+            return
+        inner = it.args[0]
+        if not (isinstance(inner, ast.Call) and isinstance(inner.func, ast.Name)
+                and inner.func.id == "len" and len(inner.args) == 1):
+            return
+        seq = _dotted(inner.args[0])
+        if seq is None or not isinstance(node.target, ast.Name):
+            return
+        index = node.target.id
+        for child in _local_nodes(node.body):
+            if (isinstance(child, ast.Subscript) and isinstance(child.ctx, ast.Load)
+                    and isinstance(child.slice, ast.Name) and child.slice.id == index
+                    and _dotted(child.value) == seq):
+                self.add(
+                    node, "range-len", "low",
+                    f"`for {index} in range(len({seq}))` indexes `{seq}[{index}]` on every "
+                    f"iteration. Iterate over `{seq}` directly, or over enumerate({seq}) "
+                    f"when the index is needed too.",
+                )
+                return
+
+    def check_nested_iterable(self, node, loop, loops):
+        seq = _iterated(loop.iterable)
+        if seq is None:
+            return
+        for outer in reversed(loops):
+            if outer.iterable is None or _iterated(outer.iterable) != seq:
+                continue
+            if seq.split(".", 1)[0] in outer.changed or self.kind(seq) == "iterator":
+                # a shared iterator is consumed once, by both loops together
+                return
+            self.add(
+                node, "nested-iteration", "medium",
+                f"Loops over `{seq}` again inside a loop over `{seq}`: len({seq})² "
+                f"iterations. To find matching items, index them in a dict or set "
+                f"first; for pairs, use itertools.combinations().",
+                outer,
+            )
+            return
@@ -0,0 +1,223 @@
+import hashlib
+
+from fileRead import read_file, clean_source
+from ast_parser import ParsedSource
+from analyzer import CodeAnalyzer, ANALYZER_VERSION, resolve_stages
+from metrics_table import rate_quality
+from profiling import StageProfile
+from pylint_runner import default_runner
+from result_cache import make_key
+
+
+def analyzer_config(use_radon=True, stages=None):
+    return {
+        "fused": True,
+        "radon": use_radon,
+        "stages": list(resolve_stages(stages)),
+        "pylint": default_runner().available,
+        "pylint_checkers": default_runner().config(),
+    }
+
+
+# -----------------------------------------------------
+# QUALITY SCORE SYSTEM
+# -----------------------------------------------------
+
+def quality_rating(metrics):
+    # (percent, label, color) of one file; the scoring rules, shared with
+    # the vectorized project rollups, live in metrics_table
+    return rate_quality(metrics["maintainability"], metrics["avg_complexity"],
+                        metrics["max_nesting"])
+
+
+# -----------------------------------------------------
+# RESULTS PACKAGE
+# -----------------------------------------------------
+
+def build_results(file_name, analyzer):
+    metrics = {
+        "total_lines": analyzer.lines,
+        "functions": analyzer.functions,
+        "classes": analyzer.classes,
+        "imports": analyzer.imports,
+        "avg_complexity": analyzer.avg_complexity,
+        "maintainability": analyzer.maintainability,
+        "max_nesting": analyzer.max_nesting,
+    }
+
+    syntax = {
+        "error": analyzer.error is not None,
+        "error_type": analyzer.error_type,
+        "line": analyzer.error_line,
+        "msg": analyzer.error_msg or "",
+    }
+
+    summary = (
+        f"This Python file contains {metrics['total_lines']} lines, "
+        f"{metrics['classes']} classes, {metrics['functions']} functions, "
+        f"and {metrics['imports']} imports."
+    )
+
+    quality_percent, quality_label, quality_color = quality_rating(metrics)
+
+    return {
+        "file_name": file_name,
+        "summary": summary,
+        "metrics": metrics,
+        "syntax": syntax,
+        "classes": [d.to_dict() for d in analyzer.class_details],
+        "functions": [d.to_dict() for d in analyzer.function_details],
+        "suggestions": analyzer.suggestions,
+        "nodes": dict(analyzer.node_counts),
+        # [level, module, names, line] per import, for batch.ProjectSummary's
+        # import graph
+        "import_refs": analyzer.import_refs,
+
+        # duplicated code within the file, and the subtree fingerprints
+        # batch.ProjectSummary matches across files
+        "clones": analyzer.clones,
+        "clone_fingerprints": analyzer.clone_fingerprints,
+
+        # performance anti-patterns, each with line, rule, severity, message
+        "performance_findings": analyzer.performance_findings,
+
+        # AST Node Summary + Insights
+        "top_nodes": analyzer.top_nodes,
+        "ast_insights": analyzer.ast_insights,
+
+        # Quality Score
+        "quality_percent": quality_percent,
+        "quality_label": quality_label,
+        "quality_color": quality_color,
+
+        # stages that ran; the others' fields keep their empty defaults
+        "stages": list(analyzer.completed),
+        # stages stopped early ({stage: reason}); their fields may be partial
+        "cut_off": dict(analyzer.cut_off),
+    }
+
+
+def remap_lines(results, line_map):
+    # results are built (and cached) on the cleaned code; report lines of
+    # the uploaded file instead
+    def original(line):
+        if not line or not line_map:
+            return line
+        if line <= len(line_map):
+            return line_map[line - 1]
+        return line_map[-1] + line - len(line_map)
+
+    for detail in results["functions"] + results["classes"]:
+        detail["line"] = original(detail["line"])
+        detail["end_line"] = original(detail["end_line"])
+        detail["loc"] = detail["end_line"] - detail["line"] + 1
+    for ref in results.get("import_refs") or ():
+        ref[3] = original(ref[3])
+    for row in results.get("clone_fingerprints") or ():
+        row[1] = original(row[1])
+        row[2] = original(row[2])
+    for group in results.get("clones") or ():
+        for instance in group["instances"]:
+            instance["line"] = original(instance["line"])
+            instance["end_line"] = original(instance["end_line"])
+    for finding in results.get("performance_findings") or ():
+        finding["line"] = original(finding["line"])
+        if "loop_line" in finding:
+            finding["loop_line"] = original(finding["loop_line"])
+    results["syntax"]["line"] = original(results["syntax"]["line"])
+    return results
+
+
+# -----------------------------------------------------
+
+def analyze_file(file_path, file_name, cache=None, timings=None, snapshots=None,
+                 profile=None, source_hash=None, stages=None):
+    # timings, when given, receives wall-clock seconds per stage; profile (a
+    # StageProfile) receives the full per-stage record; source_hash is the
+    # SHA-256 of the file's bytes if the caller already has it
+    if profile is None:
+        profile = StageProfile()
+
+    with profile.stage("read"):
+        original = read_file(file_path)
+
+    return analyze_source(original, file_name, file_path=file_path,
+                          cache=cache, timings=timings, snapshots=snapshots,
+                          profile=profile, source_hash=source_hash, stages=stages)
+
+
+def analyze_source(original_code, file_name, file_path=None, cache=None,
+                   timings=None, use_radon=True, snapshots=None, profile=None,
+                   source_hash=None, stages=None):
+    # file_path is only needed for pylint; without it pylint is skipped.
+    # snapshots (a SnapshotStore) enables incremental re-analysis against the
+    # previous version analyzed under the same file_name. stages is an
+    # analysis profile or stage list (analyzer.resolve_stages).
+    if profile is None:
+        profile = StageProfile()
+    stages = resolve_stages(stages)
+
+    with profile.stage("preprocess"):
+        code, line_map = clean_source(original_code)
+
+    key = None
+    if cache is not None:
+        with profile.stage("cache_lookup"):
+            # pylint lints the uploaded file itself, so its messages depend on
+            # comments/docstrings that cleaning removes
+            extra = None
+            if file_path and "pylint" in stages and default_runner().available:
+                extra = source_hash or hashlib.sha256(
+                    original_code.encode("utf-8", "surrogatepass")
+                ).hexdigest()
+            key = make_key(code, ANALYZER_VERSION, analyzer_config(use_radon, stages), extra)
+            results = cache.get(key)
+
+        if results is not None:
+            results["file_name"] = file_name
+            profile.info["cache_hit"] = True
+            return _finish(results, line_map, profile, timings)
+
+    # parsed once; the analyzer and radon share the tree (a syntax error is
+    # reported in the results)
+    with profile.stage("parse"):
+        parsed = ParsedSource(code)
+        parsed.parse()
+
+    analyzer = CodeAnalyzer(
+        code,
+        file_path=file_path,
+        use_radon=use_radon,
+        incremental=snapshots is not None,
+        previous=snapshots.get(file_name) if snapshots is not None else None,
+        release_tree=True,
+        profile=profile,
+        parsed=parsed,
+        stages=stages,
+    )
+    analyzer.analyze()
+
+    if analyzer.snapshot is not None:
+        snapshots.put(file_name, analyzer.snapshot)
+        profile.info["reused_definitions"] = analyzer.reused_definitions
+
+    with profile.stage("results"):
+        results = build_results(file_name, analyzer)
+
+    # a stage cut off (e.g. a pylint timeout) leaves the results incomplete;
+    # don't pin them
+    if cache is not None and not analyzer.cut_off:
+        with profile.stage("cache_store"):
+            cache.put(key, results)
+
+    return _finish(results, line_map, profile, timings)
+
+
+def _finish(results, line_map, profile, timings):
+    # per-request data is added after the results are cached
+    remap_lines(results, line_map)
+    results["profile"] = profile.to_dict()
+    if timings is not None:
+        timings.update(profile.timings)
+        timings.update(profile.info)
+    return results
@@ -0,0 +1,211 @@
+import bisect
+import contextlib
+import cProfile
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def peak_rss_kb():
+    # process-wide high-water mark; ru_maxrss is KB on Linux, bytes on macOS
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+# -----------------------------------------------------
+# per-analysis stage profile
+# -----------------------------------------------------
+
+class StageProfile:
+    """Wall/CPU time (and optionally peak traced memory) per pipeline stage.
+
+    Stages are flat and do not overlap, so their times add up to the whole
+    analysis. ``trace_memory`` uses tracemalloc, which slows the analysis
+    down noticeably and is process-wide: with concurrent analyses in one
+    process the per-stage peaks include the other requests' allocations.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.stages = []
+        # facts about the run that are not stages (cache hit, reuse counts)
+        self.info = {}
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self.add(
+                name,
+                time.perf_counter() - wall,
+                time.process_time() - cpu,
+                tracemalloc.get_traced_memory()[1] if self.trace_memory else None,
+            )
+
+    def add(self, name, wall, cpu=None, peak_bytes=None):
+        entry = {"name": name, "wall": wall, "cpu": cpu}
+        if peak_bytes is not None:
+            entry["peak_bytes"] = peak_bytes
+        self.stages.append(entry)
+
+    @property
+    def timings(self):
+        return {s["name"]: s["wall"] for s in self.stages}
+
+    def to_dict(self):
+        return {
+            "stages": list(self.stages),
+            "wall": sum(s["wall"] for s in self.stages),
+            "cpu": sum(s["cpu"] or 0.0 for s in self.stages),
+            "peak_rss_kb": peak_rss_kb(),
+            "memory_traced": self.trace_memory,
+            **self.info,
+        }
+
+
+class _NullProfile:
+    info = {}
+
+    def stage(self, name):
+        return contextlib.nullcontext()
+
+    def add(self, name, wall, cpu=None, peak_bytes=None):
+        pass
+
+
+NULL_PROFILE = _NullProfile()
+
+
+# -----------------------------------------------------
+# process-wide aggregation for the metrics endpoint
+# -----------------------------------------------------
+
+# upper bounds in seconds (the last bucket is +Inf)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0)
+
+
+class _Histogram:
+    __slots__ = ("counts", "count", "wall_sum", "cpu_sum", "wall_max")
+
+    def __init__(self, size):
+        self.counts = [0] * (size + 1)
+        self.count = 0
+        self.wall_sum = 0.0
+        self.cpu_sum = 0.0
+        self.wall_max = 0.0
+
+
+class StageMetrics:
+    """Histograms of stage wall times over every observed analysis."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._stages = {}
+        self._analyses = 0
+        self._peak_rss_kb = None
+        self._lock = threading.Lock()
+
+    def observe(self, profile):
+        # profile: StageProfile.to_dict() output
+        if not profile:
+            return
+        with self._lock:
+            self._analyses += 1
+            for s in profile["stages"] + [{"name": "total", "wall": profile["wall"],
+                                           "cpu": profile["cpu"]}]:
+                h = self._stages.get(s["name"])
+                if h is None:
+                    h = self._stages[s["name"]] = _Histogram(len(self.buckets))
+                h.counts[bisect.bisect_left(self.buckets, s["wall"])] += 1
+                h.count += 1
+                h.wall_sum += s["wall"]
+                h.cpu_sum += s["cpu"] or 0.0
+                h.wall_max = max(h.wall_max, s["wall"])
+            rss = profile.get("peak_rss_kb")
+            if rss is not None:
+                self._peak_rss_kb = max(self._peak_rss_kb or 0, rss)
+
+    def snapshot(self):
+        with self._lock:
+            stages = {}
+            for name, h in self._stages.items():
+                cumulative = 0
+                buckets = {}
+                for bound, n in zip(self.buckets + (float("inf"),), h.counts):
+                    cumulative += n
+                    buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+                stages[name] = {
+                    "count": h.count,
+                    "wall_sum": h.wall_sum,
+                    "wall_avg": h.wall_sum / h.count,
+                    "wall_max": h.wall_max,
+                    "cpu_sum": h.cpu_sum,
+                    "buckets": buckets,
+                }
+            return {
+                "analyses": self._analyses,
+                "peak_rss_kb": self._peak_rss_kb,
+                "stages": stages,
+            }
+
+    def prometheus(self):
+        data = self.snapshot()
+        out = [
+            "# TYPE analyzer_analyses_total counter",
+            f"analyzer_analyses_total {data['analyses']}",
+            "# TYPE analyzer_stage_seconds histogram",
+        ]
+        for name, s in sorted(data["stages"].items()):
+            for bound, n in s["buckets"].items():
+                out.append(f'analyzer_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {n}')
+            out.append(f'analyzer_stage_seconds_sum{{stage="{name}"}} {s["wall_sum"]}')
+            out.append(f'analyzer_stage_seconds_count{{stage="{name}"}} {s["count"]}')
+        out.append("# TYPE analyzer_stage_cpu_seconds_total counter")
+        for name, s in sorted(data["stages"].items()):
+            out.append(f'analyzer_stage_cpu_seconds_total{{stage="{name}"}} {s["cpu_sum"]}')
+        if data["peak_rss_kb"] is not None:
+            out.append("# TYPE analyzer_peak_rss_kilobytes gauge")
+            out.append(f"analyzer_peak_rss_kilobytes {data['peak_rss_kb']}")
+        return "\n".join(out) + "\n"
+
+
+# -----------------------------------------------------
+# one-off cProfile runs
+# -----------------------------------------------------
+
+def run_profiled(func, dump_path, top=25):
+    """Run ``func()`` under cProfile, write the stats to ``dump_path`` (for
+    pstats / snakeviz) and return (result, top functions by cumulative time).
+    """
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func)
+    profiler.dump_stats(dump_path)
+
+    rows = []
+    for (file, line, name), (cc, nc, tt, ct, _) in pstats.Stats(profiler).stats.items():
+        rows.append({
+            "function": f"{file}:{line}({name})",
+            "calls": nc,
+            "primitive_calls": cc,
+            "tottime": tt,
+            "cumtime": ct,
+        })
+    rows.sort(key=lambda r: r["cumtime"], reverse=True)
+    return result, rows[:top]
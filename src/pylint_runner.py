@@ -0,0 +1,141 @@
+import importlib.util
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+# pylint itself is only imported when the first check runs
+PYLINT_INSTALLED = importlib.util.find_spec("pylint") is not None
+
+
+class PylintTimeout(Exception):
+    pass
+
+
+class PylintRunner:
+    """Resident pylint backend.
+
+    pylint is imported and its checkers are registered once per process; every
+    ``run()`` reuses the same linter, so an upload only pays for the actual
+    checking. ``enable`` restricts the run to the given checkers / message ids
+    (everything else is disabled), ``disable`` turns individual ones off.
+
+    pylint cannot be interrupted from the outside, so ``timeout`` bounds how
+    long the caller waits: a run that overshoots raises PylintTimeout and its
+    messages are discarded when it eventually finishes.
+    """
+
+    def __init__(self, enable=None, disable=None, timeout=30.0):
+        self.enable = list(enable or [])
+        self.disable = list(disable or [])
+        self.timeout = timeout
+
+        self._linter = None
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def available(self):
+        return PYLINT_INSTALLED
+
+    def config(self):
+        return {"enable": self.enable, "disable": self.disable}
+
+    # -----------------------------------------------------
+
+    def run(self, file_path):
+        if not self.available:
+            return []
+
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=1, thread_name_prefix="pylint"
+                    )
+
+        future = self._executor.submit(self._check, os.path.abspath(file_path))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise PylintTimeout(f"pylint exceeded {self.timeout}s on {file_path}")
+
+    # -----------------------------------------------------
+    # everything below runs on the single pylint thread
+    # -----------------------------------------------------
+
+    def _get_linter(self):
+        if self._linter is None:
+            from pylint.lint import PyLinter
+
+            linter = PyLinter()
+            linter.load_default_plugins()
+
+            if self.enable:
+                linter.disable("all")
+                for name in self.enable:
+                    linter.enable(name)
+            for name in self.disable:
+                linter.disable(name)
+
+            self._linter = linter
+        return self._linter
+
+    def _check(self, file_path):
+        from pylint.reporters import CollectingReporter
+
+        linter = self._get_linter()
+        reporter = CollectingReporter()
+        linter.set_reporter(reporter)
+
+        try:
+            linter.check([file_path])
+        finally:
+            self._forget(file_path)
+
+        return [
+            {
+                "line": m.line,
+                "column": m.column,
+                "code": m.msg_id,
+                "symbol": m.symbol,
+                "category": m.category,
+                "message": m.msg,
+            }
+            for m in reporter.messages
+        ]
+
+    @staticmethod
+    def _forget(file_path):
+        # astroid caches modules by name; uploads reuse names with new content
+        import astroid
+
+        cache = astroid.MANAGER.astroid_cache
+        for name, module in list(cache.items()):
+            if getattr(module, "file", None) == file_path:
+                cache.pop(name, None)
+
+
+# -----------------------------------------------------
+
+_default_runner = None
+_default_lock = threading.Lock()
+
+
+def _env_list(name):
+    value = os.environ.get(name, "")
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def default_runner():
+    """Process-wide runner configured from PYLINT_ENABLE / PYLINT_DISABLE /
+    PYLINT_TIMEOUT."""
+    global _default_runner
+    if _default_runner is None:
+        with _default_lock:
+            if _default_runner is None:
+                _default_runner = PylintRunner(
+                    enable=_env_list("PYLINT_ENABLE"),
+                    disable=_env_list("PYLINT_DISABLE"),
+                    timeout=float(os.environ.get("PYLINT_TIMEOUT", 30)),
+                )
+    return _default_runner
@@ -1,17 +1,92 @@
-import os
-import json
-from jinja2 import Environment, FileSystemLoader
-
-base_dir = os.path.dirname(__file__)
-templates_dir = os.path.join(base_dir, "templates")
-
-env = Environment(loader=FileSystemLoader(templates_dir), autoescape=True)
-env.filters["tojson"] = lambda v, indent=2: json.dumps(v, indent=indent)
-
-
-def generate_report(results, output_path):
-    template = env.get_template("report_template.html")
-    html = template.render(**results)
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(html)
-    return output_path
\ No newline at end of file
+import os
+import hashlib
+import json
+import sys
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+base_dir = os.path.dirname(__file__)
+templates_dir = os.path.join(base_dir, "templates")
+
+# Compiled templates are kept on disk so a new worker process loads them
+# instead of compiling. TEMPLATE_CACHE_DIR= (empty) turns this off.
+TEMPLATE_CACHE_DIR = os.environ.get(
+    "TEMPLATE_CACHE_DIR", os.path.join(base_dir, "reports", ".cache", "templates")
+)
+
+
+def _bytecode_cache():
+    if not TEMPLATE_CACHE_DIR:
+        return None
+    try:
+        os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+    except OSError:
+        return None
+    return FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)
+
+
+# Options of every template environment in the app (this module's and
+# Flask's). They share the bytecode cache, so they must compile alike.
+JINJA_OPTIONS = {
+    "autoescape": True,
+    "bytecode_cache": _bytecode_cache(),
+}
+
+
+env = Environment(loader=FileSystemLoader(templates_dir), **JINJA_OPTIONS)
+env.filters["tojson"] = lambda v, indent=2: json.dumps(v, indent=indent)
+
+# Reports are rendered with generate() and written this many template
+# chunks at a time, so the full HTML is never held in memory at once.
+STREAM_BUFFER = 64
+
+
+def precompile_templates(environment=env):
+    """Load every template into ``environment`` (and the bytecode cache).
+
+    Returns the template names. Run it once before workers start, e.g.
+    ``python report_generator.py`` at deploy time, or at import time in a
+    preloading server, and requests never compile a template.
+    """
+    names = environment.list_templates(extensions=["html"])
+    for name in names:
+        environment.get_template(name)
+    return names
+
+
+def write_stream(template_name, context, output_path):
+    stream = env.get_template(template_name).stream(**context)
+    stream.enable_buffering(STREAM_BUFFER)
+    with open(output_path, "w", encoding="utf-8") as f:
+        stream.dump(f)
+    return output_path
+
+
+# Per-request entries of the results; they don't change what a report says
+# about the code, so they are left out of its key.
+PER_REQUEST = ("profile", "analysis_id", "report_url", "report_path")
+
+
+def report_key(results):
+    """Store key of the report generate_report() renders from ``results``:
+    the same analysis always gets the same key, whatever its timings."""
+    content = {k: v for k, v in results.items() if k not in PER_REQUEST}
+    digest = hashlib.sha256(b"report_template.html\0")
+    digest.update(json.dumps(content, sort_keys=True, default=str).encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()[:32]
+
+
+def generate_report(results, output_path):
+    return write_stream("report_template.html", results, output_path)
+
+
+def generate_project_report(summary, output_path):
+    return write_stream("project_report_template.html", summary, output_path)
+
+
+if __name__ == "__main__":
+    if JINJA_OPTIONS["bytecode_cache"] is None:
+        print("TEMPLATE_CACHE_DIR is not set or not writable", file=sys.stderr)
+        sys.exit(1)
+    for name in precompile_templates():
+        print(f"compiled {name}")
+    print(f"bytecode cache: {TEMPLATE_CACHE_DIR}")
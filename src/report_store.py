@@ -0,0 +1,200 @@
+import gzip
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+try:
+    import brotli
+except ImportError:  # optional: gzip alone covers every browser
+    brotli = None
+
+# Reports past either limit are removed, oldest first (0 turns a limit off).
+REPORT_STORE_MAX_BYTES = int(os.environ.get("REPORT_STORE_MAX_BYTES", 1024 * 1024 * 1024))
+REPORT_STORE_MAX_AGE = float(os.environ.get("REPORT_STORE_MAX_AGE_DAYS", 30)) * 86400
+
+CHUNK_SIZE = 64 * 1024
+
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = {"br": ".br", "gzip": ".gz"} if brotli is not None else {"gzip": ".gz"}
+
+_KEY = re.compile(r"^[0-9a-f]{32}$")
+
+
+class ReportStore:
+    """Content-addressed storage of rendered reports.
+
+    A report is stored once per distinct content, under the first 32 hex
+    digits of its SHA-256 (the key), next to gzip (and, if the brotli package
+    is installed, brotli) copies compressed once at write time. Report files
+    handed out are ``"<key>/<download name>"``; the key doubles as the ETag.
+
+    Several processes may write to the same root: every file is moved into
+    place atomically and the plain .html is moved last, so a report is only
+    visible once all of its variants exist.
+    """
+
+    def __init__(self, root, max_bytes=REPORT_STORE_MAX_BYTES, max_age=REPORT_STORE_MAX_AGE,
+                 prune_interval=300):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key, suffix=""):
+        return os.path.join(self.root, key[:2], f"{key}.html{suffix}")
+
+    def path(self, report_file):
+        """Plain .html path of a report file returned by write()."""
+        return self._path(report_file.partition("/")[0])
+
+    # -----------------------------------------------------
+
+    def write(self, render, name, key=None):
+        """Store the report ``render(path)`` writes and return its report
+        file, ``"<key>/<name>"``.
+
+        ``key`` (32 hex digits) names the report by what it was rendered
+        from, e.g. report_generator.report_key(); a report already stored
+        under it is reused without rendering. By default the key is the hash
+        of the rendered HTML.
+        """
+        if key is not None and self._touch(key):
+            return f"{key}/{name}"
+        fd, tmp = tempfile.mkstemp(suffix=".html", dir=self.root)
+        os.close(fd)
+        try:
+            render(tmp)
+            key = self.put_file(tmp, key)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return f"{key}/{name}"
+
+    def put_file(self, path, key=None):
+        """Move the finished report at ``path`` into the store; returns its
+        key (the hash of its content unless given)."""
+        if key is None:
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+            key = digest.hexdigest()[:32]
+
+        if self._touch(key):
+            # same report again: keep the stored copy
+            os.remove(path)
+            return key
+
+        dest = self._path(key)
+
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        for encoding, suffix in ENCODINGS.items():
+            self._compress(path, self._path(key, suffix), encoding)
+        os.replace(path, dest)
+        return key
+
+    def _touch(self, key):
+        # True if key is stored; its age restarts
+        if not os.path.exists(self._path(key)):
+            return False
+        for suffix in [""] + list(ENCODINGS.values()):
+            try:
+                os.utime(self._path(key, suffix))
+            except OSError:
+                pass
+        return True
+
+    def _compress(self, src, dest, encoding):
+        fd, tmp = tempfile.mkstemp(suffix=".part", dir=os.path.dirname(dest))
+        try:
+            with open(src, "rb") as f_in, os.fdopen(fd, "wb") as f_out:
+                if encoding == "gzip":
+                    # mtime=0: the same report always compresses to the same bytes
+                    with gzip.GzipFile(fileobj=f_out, mode="wb", compresslevel=9, mtime=0) as gz:
+                        shutil.copyfileobj(f_in, gz, CHUNK_SIZE)
+                else:
+                    compressor = brotli.Compressor(quality=11)
+                    for chunk in iter(lambda: f_in.read(CHUNK_SIZE), b""):
+                        f_out.write(compressor.process(chunk))
+                    f_out.write(compressor.finish())
+            os.replace(tmp, dest)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    # -----------------------------------------------------
+
+    def lookup(self, key, accept=()):
+        """(path, content encoding or None) of the best variant of ``key``
+        for the accepted encodings, or None for an unknown key."""
+        if not _KEY.match(key) or not os.path.exists(self._path(key)):
+            return None
+        for encoding, suffix in ENCODINGS.items():
+            if encoding in accept:
+                path = self._path(key, suffix)
+                if os.path.exists(path):
+                    return path, encoding
+        return self._path(key), None
+
+    # -----------------------------------------------------
+
+    def maybe_prune(self):
+        if not self.prune_interval:
+            return 0
+        now = time.time()
+        with self._lock:
+            if now - self._last_prune < self.prune_interval:
+                return 0
+            self._last_prune = now
+        return self.prune(now)
+
+    def prune(self, now=None):
+        """Remove reports older than ``max_age``, then the oldest ones until
+        the store fits in ``max_bytes``. Returns how many were removed."""
+        now = now if now is not None else time.time()
+        reports = {}  # key -> [newest mtime, total bytes]
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                key = filename.split(".", 1)[0]
+                if not _KEY.match(key):
+                    # a temporary file left by a writer that died
+                    if now - st.st_mtime > 3600:
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+                    continue
+                entry = reports.setdefault(key, [0.0, 0])
+                entry[0] = max(entry[0], st.st_mtime)
+                entry[1] += st.st_size
+
+        removed = 0
+        total = sum(size for _, size in reports.values())
+        for key, (mtime, size) in sorted(reports.items(), key=lambda kv: kv[1][0]):
+            expired = self.max_age and now - mtime > self.max_age
+            if not expired and not (self.max_bytes and total > self.max_bytes):
+                break
+            self._remove(key)
+            total -= size
+            removed += 1
+        return removed
+
+    def _remove(self, key):
+        # the plain .html first: the report disappears before its variants
+        for suffix in [""] + list(ENCODINGS.values()):
+            try:
+                os.remove(self._path(key, suffix))
+            except OSError:
+                pass
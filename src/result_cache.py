@@ -0,0 +1,270 @@
+import collections
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+# The disk tier's size is kept up to date as entries are written; the
+# directory (which other processes may share) is only listed again every
+# this many writes, or when the tier looks full.
+DISK_RESCAN_INTERVAL = 256
+
+# A full disk tier is trimmed to this fraction of its limit, so the next
+# writes don't each trigger another trim.
+DISK_LOW_WATER = 0.9
+
+
+def make_key(code, version, config=None, extra=None):
+    """Content address for one analysis: source + analyzer version + config."""
+    h = hashlib.sha256()
+    h.update(version.encode("utf-8"))
+    h.update(b"\0")
+    h.update(json.dumps(config or {}, sort_keys=True).encode("utf-8"))
+    h.update(b"\0")
+    h.update(code.encode("utf-8", "surrogatepass"))
+    if extra:
+        h.update(b"\0")
+        h.update(extra.encode("utf-8", "surrogatepass"))
+    return h.hexdigest()
+
+
+class ResultCache:
+    """Two-tier (memory LRU + optional disk) cache of analysis results.
+
+    Entries are stored as JSON text, so callers always get a fresh copy they
+    are free to modify, and the byte size used for eviction is exact.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024,
+                 disk_dir=None, disk_max_bytes=512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+        self._disk_bytes = 0
+        self._disk_entries = 0
+        self._disk_writes = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_evict()
+
+    # -----------------------------------------------------
+
+    def get(self, key):
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(text)
+
+        text = self._disk_get(key)
+        if text is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            self.disk_hits += 1
+            self._memory_put(key, text)
+        return json.loads(text)
+
+    def put(self, key, results):
+        text = json.dumps(results, separators=(",", ":"))
+        with self._lock:
+            self._memory_put(key, text)
+        self._disk_put(key, text)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".json"):
+                    try:
+                        os.remove(os.path.join(self.disk_dir, name))
+                    except OSError:
+                        pass
+            with self._lock:
+                self._disk_bytes = 0
+                self._disk_entries = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": (self.hits / total) if total else None,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "disk": bool(self.disk_dir),
+                "disk_entries": self._disk_entries,
+                "disk_bytes": self._disk_bytes,
+            }
+
+    # -----------------------------------------------------
+    # memory tier (caller holds the lock)
+    # -----------------------------------------------------
+
+    def _memory_put(self, key, text):
+        size = len(text)
+        if size > self.max_bytes:
+            return
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+
+        self._entries[key] = text
+        self._bytes += size
+
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    # -----------------------------------------------------
+    # disk tier
+    # -----------------------------------------------------
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except OSError:
+            return None
+
+        # mtime doubles as last-access time for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return text
+
+    def _disk_put(self, key, text):
+        if not self.disk_dir:
+            return
+
+        data = text.encode("utf-8")
+        path = self._disk_path(key)
+        try:
+            old_size = os.stat(path).st_size
+        except OSError:
+            old_size = None
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            return
+
+        with self._lock:
+            self._disk_bytes += len(data) - (old_size or 0)
+            if old_size is None:
+                self._disk_entries += 1
+            self._disk_writes += 1
+            rescan = (self._disk_writes % DISK_RESCAN_INTERVAL == 0
+                      or self._disk_bytes > self.disk_max_bytes)
+        if rescan:
+            self._disk_evict()
+
+    def _disk_evict(self):
+        # list the directory, trim it past disk_max_bytes (oldest first) and
+        # reset the running totals
+        files = []
+        total = 0
+        for entry in os.scandir(self.disk_dir):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, entry.path))
+            total += st.st_size
+
+        count = len(files)
+        if total > self.disk_max_bytes:
+            files.sort()
+            for _, size, path in files:
+                if total <= self.disk_max_bytes * DISK_LOW_WATER:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                count -= 1
+                with self._lock:
+                    self.evictions += 1
+
+        with self._lock:
+            self._disk_bytes = total
+            self._disk_entries = count
+
+
+# -----------------------------------------------------
+# table rows of recently rendered results
+# -----------------------------------------------------
+
+class PageStore:
+    """Bounded LRU of the large table sections of rendered results.
+
+    The results page only renders the first rows of each table and fetches
+    the rest from here page by page. Rows are kept as the (already JSON
+    friendly) lists they came in as and handed out as slices.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key, sections):
+        with self._lock:
+            self._entries[key] = sections
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def page(self, key, section, offset=0, limit=100):
+        # None when the entry was evicted or the section is unknown
+        with self._lock:
+            sections = self._entries.get(key)
+            if sections is None or section not in sections:
+                return None
+            self._entries.move_to_end(key)
+            rows = sections[section]
+        return {
+            "total": len(rows),
+            "offset": offset,
+            "items": rows[offset:offset + limit],
+        }
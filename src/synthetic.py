@@ -0,0 +1,134 @@
+import random
+
+# Generator for synthetic Python sources used by benchmark.py. The output is
+# deterministic for a given seed and always valid Python.
+
+_NAMES = ("value", "item", "total", "count", "result", "data", "key", "index",
+          "buffer", "node", "offset", "limit")
+_CALLS = ("len", "sum", "max", "min", "sorted", "str", "abs", "list")
+
+
+class _Writer:
+    def __init__(self, rng, max_depth, branchiness):
+        self.rng = rng
+        self.max_depth = max_depth
+        self.branchiness = branchiness
+        self.lines = []
+
+    def emit(self, depth, text):
+        self.lines.append("    " * depth + text)
+
+    def name(self):
+        return self.rng.choice(_NAMES)
+
+    def expr(self):
+        r = self.rng.random()
+        if r < 0.3:
+            return f"{self.name()} + {self.rng.randint(1, 99)}"
+        if r < 0.55:
+            return f"{self.rng.choice(_CALLS)}([{self.name()}, {self.name()}])"
+        if r < 0.75:
+            return f"self_obj.{self.name()}"
+        if r < 0.9:
+            return f'"{self.name()} # not a comment"'
+        return f"{self.name()} * ({self.name()} - {self.rng.randint(1, 9)})"
+
+    def simple(self, depth):
+        r = self.rng.random()
+        if r < 0.5:
+            self.emit(depth, f"{self.name()} = {self.expr()}")
+        elif r < 0.7:
+            self.emit(depth, f"{self.name()} += {self.rng.randint(1, 9)}")
+        elif r < 0.85:
+            self.emit(depth, f"{self.rng.choice(_CALLS)}({self.name()})")
+        else:
+            self.emit(depth, f"{self.name()} = {self.name()}  # trailing comment")
+
+    def block(self, depth, level, budget):
+        # writes statements at `depth` until `budget` lines are used;
+        # `level` is the current control-flow nesting inside the function
+        start = len(self.lines)
+        while len(self.lines) - start < budget:
+            remaining = budget - (len(self.lines) - start)
+            if (level < self.max_depth and remaining > 3
+                    and self.rng.random() < self.branchiness):
+                self.compound(depth, level, min(remaining - 1, self.rng.randint(2, 8)))
+            else:
+                self.simple(depth)
+
+    def compound(self, depth, level, budget):
+        kind = self.rng.choice(("if", "for", "while", "try", "with"))
+        inner = max(1, budget - 2)
+        if kind == "if":
+            self.emit(depth, f"if {self.name()} > {self.rng.randint(0, 9)}:")
+            self.block(depth + 1, level + 1, inner)
+            if self.rng.random() < 0.5:
+                self.emit(depth, f"elif {self.name()} and not {self.name()}:")
+                self.simple(depth + 1)
+            self.emit(depth, "else:")
+            self.simple(depth + 1)
+        elif kind == "for":
+            self.emit(depth, f"for {self.name()} in range({self.rng.randint(1, 50)}):")
+            self.block(depth + 1, level + 1, inner)
+        elif kind == "while":
+            self.emit(depth, f"while {self.name()} < {self.rng.randint(1, 50)}:")
+            self.block(depth + 1, level + 1, inner)
+            self.emit(depth + 1, "break")
+        elif kind == "try":
+            self.emit(depth, "try:")
+            self.block(depth + 1, level + 1, inner)
+            self.emit(depth, "except (ValueError, KeyError):")
+            self.emit(depth + 1, "pass")
+        else:
+            self.emit(depth, f"with open({self.name()}) as {self.name()}:")
+            self.block(depth + 1, level + 1, inner)
+
+    def function(self, depth, name, body_lines, method=False):
+        args = ["self"] if method else []
+        args += self.rng.sample(_NAMES, self.rng.randint(0, 3))
+        self.emit(depth, f"def {name}({', '.join(args)}):")
+        self.emit(depth + 1, f'"""Synthetic function {name}."""')
+        self.emit(depth + 1, f"{_NAMES[0]} = {_NAMES[1]} = 0")
+        self.block(depth + 1, 0, max(1, body_lines - 4))
+        self.emit(depth + 1, f"return {self.name()}")
+
+
+def generate_source(lines=1000, functions=None, nesting=3, branchiness=0.3,
+                    class_ratio=0.2, seed=0):
+    """Return a Python module of roughly ``lines`` lines.
+
+    ``functions`` is the number of functions/methods (default: one per ~25
+    lines), ``nesting`` the maximum control-flow depth inside a function,
+    ``branchiness`` the probability that a statement opens a new block, and
+    ``class_ratio`` the share of functions written as methods.
+    """
+    rng = random.Random(seed)
+    w = _Writer(rng, nesting, branchiness)
+    functions = functions or max(1, lines // 25)
+
+    w.emit(0, '"""Synthetic module generated for benchmarking."""')
+    w.emit(0, "import os")
+    w.emit(0, "from collections import defaultdict")
+    w.emit(0, "")
+    w.emit(0, "# module-level state")
+    w.emit(0, "self_obj = defaultdict(int)")
+    w.emit(0, "")
+
+    per_function = max(6, (lines - len(w.lines)) // functions - 2)
+    n = 0
+    while n < functions:
+        if rng.random() < class_ratio:
+            methods = min(functions - n, rng.randint(2, 5))
+            w.emit(0, f"class Synthetic{n}:")
+            w.emit(1, f'"""Synthetic class {n}."""')
+            for m in range(methods):
+                w.emit(0, "")
+                w.function(1, f"method_{n}_{m}", per_function, method=True)
+            n += methods
+        else:
+            w.function(0, f"function_{n}", per_function)
+            n += 1
+        w.emit(0, "")
+        w.emit(0, "")
+
+    return "\n".join(w.lines) + "\n"
@@ -0,0 +1,96 @@
+# Constructs the fused engine and the legacy stages must count alike.
+import asyncio
+import os.path as osp
+from collections import (
+    OrderedDict,
+    defaultdict as dd,
+)
+
+
+def decorator(func):
+    def wrapper(*args, **kwargs):
+        return func(*args, **kwargs)
+    return wrapper
+
+
+@decorator
+def branches(x, y=1, *rest, key=None, **options):
+    """Docstring."""
+    if x and y or not rest:
+        for i in range(x):
+            while i > 0:
+                i -= 1
+                if i % 2:
+                    continue
+                elif i % 3:
+                    break
+            else:
+                pass
+    elif key is None:
+        try:
+            y = 1 / x
+        except ZeroDivisionError:
+            y = 0
+        except (TypeError, ValueError) as e:
+            raise RuntimeError("bad") from e
+        else:
+            y += 1
+        finally:
+            x = None
+    return [a * b for a in range(3) if a for b in range(a) if b > 1] or {
+        k: v for k, v in options.items()
+    }
+
+
+async def fetch(urls):
+    async with asyncio.timeout(1):
+        async for url in urls:
+            await asyncio.sleep(0)
+    results = [await u async for u in urls]
+    return results
+
+
+def matcher(command):
+    match command.split():
+        case ["go", direction] if direction in ("north", "south"):
+            return direction
+        case ["take", *items]:
+            return items
+        case {"x": 0, **rest}:
+            return rest
+        case _:
+            return None
+
+
+class Outer:
+    attr = lambda self: self.attr
+
+    class Inner:
+        def method(self):
+            return (yield from range(3))
+
+    @property
+    def value(self):
+        return self.attr() if self else None
+
+    @staticmethod
+    def nested():
+        def deeper():
+            def deepest():
+                return lambda: [x for x in (y for y in range(2))]
+            return deepest
+        return deeper
+
+
+def groups():
+    try:
+        pass
+    except* ValueError:
+        pass
+    except* TypeError as eg:
+        raise eg
+    with open(osp.devnull) as f, open(osp.devnull) as g:
+        print(f, g, OrderedDict(), dd(list))
+    global_value = x if (x := 1) else 2
+    assert global_value, "never"
+    del global_value
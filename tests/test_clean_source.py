@@ -0,0 +1,107 @@
+import ast
+
+from fileRead import clean_code, clean_source
+
+
+def test_removes_comments_and_docstrings_only():
+    code = (
+        '"""Module docstring."""\n'
+        "import os  # trailing comment\n"
+        "\n"
+        "# a whole-line comment\n"
+        "def f():\n"
+        '    """Function docstring."""\n'
+        '    url = "http://example.com/#anchor"\n'
+        "    query = '''\n"
+        "    SELECT 1  # not a comment\n"
+        "    '''\n"
+        "    return url, query\n"
+    )
+    cleaned, line_map = clean_source(code)
+
+    assert cleaned.split("\n") == [
+        "import os",
+        "def f():",
+        '    url = "http://example.com/#anchor"',
+        "    query = '''",
+        "    SELECT 1  # not a comment",
+        "    '''",
+        "    return url, query",
+    ]
+    assert line_map == [2, 5, 7, 8, 9, 10, 11]
+
+
+def test_line_map_points_at_original_lines():
+    code = (
+        "# header\n"
+        "\n"
+        "class A:\n"
+        "    '''Doc\n"
+        "    spanning lines.'''\n"
+        "\n"
+        "    def m(self):  # comment\n"
+        "        return 1\n"
+    )
+    cleaned, line_map = clean_source(code)
+    original = code.split("\n")
+
+    for number, line in zip(line_map, cleaned.split("\n")):
+        assert line.strip() in original[number - 1]
+    tree = ast.parse(cleaned)
+    method = tree.body[0].body[0]
+    assert line_map[method.lineno - 1] == 7
+
+
+def test_docstring_only_body_becomes_pass():
+    code = (
+        "class Empty:\n"
+        '    """Nothing but a docstring."""\n'
+        "\n"
+        "def g():\n"
+        "    '''Same here.'''\n"
+    )
+    cleaned, line_map = clean_source(code)
+
+    assert cleaned.split("\n") == ["class Empty:", "    pass", "def g():", "    pass"]
+    assert line_map == [1, 2, 4, 5]
+    ast.parse(cleaned)
+
+
+def test_values_are_not_docstrings():
+    code = (
+        "x = (\n"
+        '    """inside brackets"""\n'
+        ")\n"
+        'y = """assigned""".strip()\n'
+        'f"""formatted"""\n'
+        "z = 1 + \\\n"
+        '    """continued"""\n'
+    )
+    cleaned, _ = clean_source(code)
+
+    for kept in ("inside brackets", "assigned", "formatted", "continued"):
+        assert kept in cleaned
+
+
+def test_clean_code_matches_clean_source():
+    code = 's = "#"  # comment\n"""doc"""\nt = \'\'\'value\'\'\'\n'
+    assert clean_code(code) == clean_source(code)[0] == 's = "#"\nt = \'\'\'value\'\'\''
+
+
+def test_reported_lines_are_those_of_the_uploaded_file():
+    from pipeline import analyze_source
+
+    code = (
+        "# comment\n"
+        '"""Module docstring."""\n'
+        "\n"
+        "def f(x):\n"
+        '    """Doc\n'
+        '    string."""\n'
+        "    # comment\n"
+        "    return x\n"
+    )
+    results = analyze_source(code, "m.py", stages="fast")
+    detail = results["functions"][0]
+
+    assert (detail["line"], detail["end_line"], detail["loc"]) == (4, 8, 5)
@@ -0,0 +1,44 @@
+import ast
+import glob
+import os
+
+import pytest
+
+from analyzer import CodeAnalyzer
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# fixed corpus: hand-picked constructs, this project and the sample uploads
+CORPUS = sorted(
+    glob.glob(os.path.join(os.path.dirname(__file__), "corpus", "*.py"))
+    + glob.glob(os.path.join(SRC, "*.py"))
+    + glob.glob(os.path.join(SRC, "uploads", "*.py"))
+)
+
+
+def _structure(code, fused):
+    analyzer = CodeAnalyzer(code, stages="fast", fused=fused)
+    analyzer.analyze()
+    return {
+        "functions": analyzer.functions,
+        "classes": analyzer.classes,
+        "imports": analyzer.imports,
+        "max_nesting": analyzer.max_nesting,
+        "node_counts": dict(analyzer.node_counts.items()),
+        "complexity_map": analyzer.complexity_map,
+        "avg_complexity": analyzer.avg_complexity,
+        "function_details": [d.to_dict() for d in analyzer.function_details],
+        "class_details": [d.to_dict() for d in analyzer.class_details],
+    }
+
+
+@pytest.mark.parametrize("path", CORPUS, ids=os.path.basename)
+def test_fused_engine_matches_legacy_stages(path):
+    with open(path, encoding="utf-8") as f:
+        code = f.read()
+    try:
+        ast.parse(code)
+    except SyntaxError:
+        pytest.skip("not valid Python")
+
+    assert _structure(code, fused=True) == _structure(code, fused=False)
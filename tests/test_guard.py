@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+from analyzer import CodeAnalyzer
+from guard import StageTimeout, watchdog
+
+CODE = "def f(x):\n    return x\n"
+
+
+def _spin(self):
+    while True:
+        pass
+
+
+def test_guard_interrupts_an_overrunning_block():
+    started = time.monotonic()
+    with pytest.raises(StageTimeout):
+        with watchdog.guard(0.05):
+            _spin(None)
+    assert time.monotonic() - started < 5
+
+
+def test_guard_lets_a_quick_block_finish():
+    with watchdog.guard(5):
+        total = sum(range(1000))
+    assert total == 499500
+
+
+def test_no_timeout_escapes_a_block_that_ends_at_its_deadline():
+    # blocks that end right around their deadline: a timeout may be raised
+    # inside the guard, never after it
+    for _ in range(500):
+        try:
+            with watchdog.guard(0.001):
+                end = time.perf_counter() + 0.001
+                while time.perf_counter() < end:
+                    pass
+        except StageTimeout:
+            pass
+        for _ in range(100):
+            pass
+
+
+def test_overrunning_stage_is_cut_off(monkeypatch):
+    monkeypatch.setattr(CodeAnalyzer, "_stage_clones", _spin)
+    analyzer = CodeAnalyzer(CODE, stages="complexity", stage_timeouts=0.05)
+    analyzer.analyze()
+
+    assert analyzer.cut_off == {"clones": "timeout"}
+    # the other stages still ran
+    assert analyzer.functions == 1
+    assert analyzer.performance_findings == []
+
+
+def test_stages_depending_on_a_cut_off_stage_are_skipped(monkeypatch):
+    monkeypatch.setattr(CodeAnalyzer, "_stage_structure", _spin)
+    analyzer = CodeAnalyzer(CODE, stages=["insights"], stage_timeouts=0.05)
+    analyzer.analyze()
+
+    assert analyzer.cut_off == {"structure": "timeout", "insights": "skipped"}
+
+
+def test_memory_error_is_cut_off(monkeypatch):
+    def exhaust(self):
+        raise MemoryError
+
+    monkeypatch.setattr(CodeAnalyzer, "_stage_performance", exhaust)
+    analyzer = CodeAnalyzer(CODE, stages=["performance"])
+    analyzer.analyze()
+
+    assert analyzer.cut_off == {"performance": "memory"}
+
+
+def test_cut_off_results_are_not_cached(monkeypatch):
+    from pipeline import analyze_source
+    from result_cache import ResultCache
+
+    monkeypatch.setattr(CodeAnalyzer, "_stage_clones", _spin)
+    monkeypatch.setattr("analyzer.STAGE_TIMEOUT", 0.05)
+    cache = ResultCache()
+    analyze_source(CODE, "m.py", cache=cache, stages="complexity")
+
+    assert cache.stats()["entries"] == 0
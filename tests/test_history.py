@@ -0,0 +1,53 @@
+import hashlib
+import sqlite3
+
+from batch import analyze_member
+from history import SCHEMA, HistoryStore
+
+SOURCE = b"def f(x):\n    if x:\n        return 1\n    return 2\n"
+
+
+def _functions(*complexities):
+    return [{"name": f"f{i}", "line": i, "end_line": i, "loc": 1, "args": [],
+             "complexity": c} for i, c in enumerate(complexities, 1)]
+
+
+def test_top_functions_by_file_uses_the_index(tmp_path):
+    store = HistoryStore(str(tmp_path / "h.sqlite3"))
+    store.record({"file_name": "a.py", "functions": _functions(3, 9)})
+    store.record({"file_name": "b.py", "functions": _functions(20)})
+
+    top = store.top_functions(n=5, file_name="a.py")
+    assert [f["complexity"] for f in top] == [9, 3]
+    assert [f["complexity"] for f in store.top_functions(n=1)] == [20]
+
+    plan = " ".join(str(tuple(r)) for r in store._connect().execute(
+        "EXPLAIN QUERY PLAN SELECT name FROM functions WHERE file_name = ?"
+        " AND complexity IS NOT NULL ORDER BY complexity DESC", ("a.py",)))
+    assert "functions_file_complexity" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_old_database_is_migrated(tmp_path):
+    path = str(tmp_path / "old.sqlite3")
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA.replace(",\n    file_name TEXT\n);", "\n);", 1))
+    db.execute("INSERT INTO analyses (file_name, created) VALUES ('a.py', 1)")
+    db.execute("INSERT INTO functions VALUES (1, 'f', 1, 2, 2, '[]', 7)")
+    db.commit()
+    db.close()
+
+    store = HistoryStore(path)
+    assert [f["name"] for f in store.top_functions(file_name="a.py")] == ["f"]
+
+
+def test_batch_members_carry_their_content_hash(tmp_path):
+    results = analyze_member("m.py", SOURCE, None, lint=False, use_radon=False)
+    assert results["content_hash"] == hashlib.sha256(SOURCE).hexdigest()
+
+    path = tmp_path / "m.py"
+    path.write_bytes(SOURCE)
+    results = analyze_member("m.py", None, str(path), lint=False, use_radon=False)
+    assert results["content_hash"] == hashlib.sha256(SOURCE).hexdigest()
+
+    assert "content_hash" not in analyze_member("big.py", None, None, lint=False)
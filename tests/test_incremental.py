@@ -0,0 +1,109 @@
+import tokenize
+
+from analyzer import CodeAnalyzer
+from ast_parser import ASTParser, ParsedSource
+from incremental import SnapshotStore
+from pipeline import analyze_source
+
+V1 = '''import os
+
+
+def unchanged(a, b):
+    if a:
+        for x in b:
+            if x:
+                return x
+    return None
+
+
+class Shape:
+    def area(self):
+        return 0
+
+    def name(self):
+        return type(self).__name__
+
+
+def edited(n):
+    return n * 2
+'''
+
+V2 = '''import os
+import sys
+
+CONSTANT = 1
+
+
+def unchanged(a, b):
+    if a:
+        for x in b:
+            if x:
+                return x
+    return None
+
+
+class Shape:
+    def area(self):
+        return 0
+
+    def name(self):
+        if self:
+            return type(self).__name__
+        return ""
+
+
+def edited(n):
+    while n > 0:
+        n -= 1
+    return n * 2
+
+
+def added():
+    return sys.argv
+'''
+
+
+def _analyze(code, snapshots=None, timings=None):
+    results = analyze_source(code, "module.py", stages="fast",
+                             snapshots=snapshots, timings=timings)
+    results.pop("profile")
+    return results
+
+
+def test_incremental_run_matches_a_full_run():
+    snapshots = SnapshotStore()
+    _analyze(V1, snapshots)
+    timings = {}
+    incremental = _analyze(V2, snapshots, timings)
+
+    assert timings["reused_definitions"] > 0
+    assert incremental == _analyze(V2)
+
+
+def test_unchanged_source_is_fully_reused():
+    snapshots = SnapshotStore()
+    _analyze(V1, snapshots)
+    timings = {}
+    again = _analyze(V1, snapshots, timings)
+
+    assert timings["reused_definitions"] >= 3
+    assert again == _analyze(V1)
+
+
+def test_parsed_source_is_shared_and_lazy():
+    parsed = ParsedSource("x = 1\ny = (\n    2)\n")
+    assert parsed._tokens is None and parsed._line_offsets is None
+
+    assert parsed.line_offsets == [0, 6, 12, 19]
+    assert parsed.tokens[0].type == tokenize.NAME
+    assert ASTParser(parsed).get_tree() is parsed.tree
+
+    analyzer = CodeAnalyzer(parsed.code, parsed=parsed, stages="fast")
+    analyzer.analyze()
+    assert analyzer.tree is parsed.tree
+
+
+def test_syntax_error_is_kept_not_raised():
+    parsed = ParsedSource("def f(:\n")
+    assert parsed.parse() is None
+    assert isinstance(parsed.error, SyntaxError)
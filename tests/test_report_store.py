@@ -0,0 +1,112 @@
+import gzip
+import os
+
+import pytest
+
+from report_store import ReportStore
+
+
+def _render(text):
+    def render(path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+    return render
+
+
+def test_same_content_is_stored_once(tmp_path):
+    store = ReportStore(str(tmp_path))
+    first = store.write(_render("<html>a</html>"), "a_report.html")
+    second = store.write(_render("<html>a</html>"), "b_report.html")
+    other = store.write(_render("<html>b</html>"), "a_report.html")
+
+    assert first.split("/")[0] == second.split("/")[0] != other.split("/")[0]
+    assert second.endswith("/b_report.html")
+    assert len(list(tmp_path.glob("*/*.html"))) == 2
+
+
+def test_given_key_skips_rendering(tmp_path):
+    store = ReportStore(str(tmp_path))
+    key = "0" * 32
+    store.write(_render("first"), "r.html", key)
+
+    def fail(path):
+        raise AssertionError("rendered again")
+
+    assert store.write(fail, "r.html", key) == f"{key}/r.html"
+    with open(store.path(f"{key}/r.html"), encoding="utf-8") as f:
+        assert f.read() == "first"
+
+
+def test_lookup_picks_an_accepted_encoding(tmp_path):
+    store = ReportStore(str(tmp_path))
+    key = store.write(_render("<html>x</html>"), "r.html").split("/")[0]
+
+    path, encoding = store.lookup(key, accept=("gzip",))
+    assert encoding == "gzip"
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        assert f.read() == "<html>x</html>"
+    assert store.lookup(key) == (store.path(key), None)
+    assert store.lookup("../../etc/passwd") is None
+    assert store.lookup("f" * 32) is None
+
+
+def test_prune_removes_old_reports_first(tmp_path):
+    store = ReportStore(str(tmp_path), max_age=100)
+    old = store.write(_render("old"), "r.html").split("/")[0]
+    new = store.write(_render("new"), "r.html").split("/")[0]
+    for name in os.listdir(tmp_path / old[:2]):
+        if name.startswith(old):
+            os.utime(tmp_path / old[:2] / name, (0, 0))
+
+    assert store.prune(now=150) == 1
+    assert store.lookup(old) is None
+    assert store.lookup(new) is not None
+
+
+# -----------------------------------------------------
+# the download route
+# -----------------------------------------------------
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    root = tmp_path_factory.mktemp("reports")
+    os.environ.update(RESULT_CACHE_DISK="0", HISTORY_DB="", REPORT_STORE_DIR=str(root))
+    from app import app
+    return app.test_client()
+
+
+def _report_url(client, source):
+    response = client.post("/api/analyze?report=1&lint=0&stages=fast&file_name=m.py",
+                           data=source)
+    assert response.status_code == 200
+    return response.get_json()["report_url"]
+
+
+def test_repeat_analyses_share_one_report(client):
+    source = b"def f(x):\n    return x\n"
+    urls = {_report_url(client, source) for _ in range(3)}
+    assert len(urls) == 1
+    assert _report_url(client, source + b"y = 1\n") not in urls
+
+
+def test_download_etag_and_not_modified(client):
+    url = _report_url(client, b"def g():\n    return 1\n")
+    key = url.split("/")[2]
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"{key}"'
+    assert client.get(url, headers={"If-None-Match": f'"{key}"'}).status_code == 304
+
+    # the gzip copy is a variant of its own
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert b"g" in gzip.decompress(response.data)
+    etag = response.headers["ETag"]
+    assert etag.startswith(f'"{key}')
+    response = client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert response.status_code == 304
+
+    assert client.get(f"/download-report/{'f' * 32}/m_report.html").status_code == 404
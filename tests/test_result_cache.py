@@ -0,0 +1,79 @@
+import os
+
+import result_cache
+from result_cache import ResultCache, make_key
+
+
+def test_hit_miss_and_lru_eviction():
+    cache = ResultCache(max_entries=2)
+    assert cache.get("a") is None
+
+    cache.put("a", {"n": 1})
+    cache.put("b", {"n": 2})
+    assert cache.get("a") == {"n": 1}  # a is now the most recently used
+    cache.put("c", {"n": 3})           # evicts b
+
+    assert cache.get("b") is None
+    assert cache.get("c") == {"n": 3}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (2, 2, 1, 2)
+
+
+def test_callers_get_their_own_copy():
+    cache = ResultCache()
+    cache.put("k", {"items": [1]})
+    cache.get("k")["items"].append(2)
+    assert cache.get("k") == {"items": [1]}
+
+
+def test_byte_limit_evicts_oldest():
+    cache = ResultCache(max_bytes=100)
+    cache.put("a", {"s": "x" * 60})
+    cache.put("b", {"s": "y" * 60})
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+    assert cache.stats()["bytes"] <= 100
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    cache = ResultCache(disk_dir=str(tmp_path))
+    cache.put("k", {"n": 1})
+
+    fresh = ResultCache(disk_dir=str(tmp_path))
+    assert fresh.get("k") == {"n": 1}
+    assert fresh.stats()["disk_hits"] == 1
+    assert fresh.stats()["disk_entries"] == 1
+
+
+def test_disk_tier_trims_oldest_past_its_limit(tmp_path):
+    cache = ResultCache(max_entries=1, disk_dir=str(tmp_path), disk_max_bytes=1000)
+    for i in range(20):
+        cache.put(f"k{i}", {"s": "x" * 90})
+        os.utime(tmp_path / f"k{i}.json", (i, i))  # distinct ages
+
+    stats = cache.stats()
+    on_disk = sum(p.stat().st_size for p in tmp_path.glob("*.json"))
+    assert stats["disk_bytes"] == on_disk <= 1000
+    assert stats["disk_entries"] == len(list(tmp_path.glob("*.json")))
+    assert (tmp_path / "k19.json").exists()
+    assert not (tmp_path / "k0.json").exists()
+
+
+def test_disk_totals_are_resynced_from_the_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, "DISK_RESCAN_INTERVAL", 2)
+    cache = ResultCache(disk_dir=str(tmp_path))
+    cache.put("a", {"n": 1})
+    # another process writes to the shared directory
+    (tmp_path / "other.json").write_text('{"n":2}')
+    cache.put("b", {"n": 3})
+
+    assert cache.stats()["disk_entries"] == 3
+
+
+def test_key_depends_on_code_version_config_and_extra():
+    base = make_key("x = 1", "1.0", {"radon": True})
+    assert base == make_key("x = 1", "1.0", {"radon": True})
+    assert base != make_key("x = 2", "1.0", {"radon": True})
+    assert base != make_key("x = 1", "1.1", {"radon": True})
+    assert base != make_key("x = 1", "1.0", {"radon": False})
+    assert base != make_key("x = 1", "1.0", {"radon": True}, extra="hash")